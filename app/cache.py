@@ -0,0 +1,51 @@
+import threading
+import time
+
+from .metrics import CACHE_REQUESTS_TOTAL
+
+
+class TTLCache:
+    """
+    Cache in-memory sederhana per proses dengan masa berlaku (TTL) per entri.
+    Aman dipakai dari banyak thread (endpoint sync FastAPI berjalan di threadpool).
+    Jika `name` diisi, hit/miss dicatat ke metrik cache_requests_total.
+    """
+
+    def __init__(self, ttl_seconds: float, maxsize: int = 1024, name: str = None):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self.name = name
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+        if self.name:
+            CACHE_REQUESTS_TOTAL.inc(cache=self.name, result="miss" if entry is None else "hit")
+        return default if entry is None else entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._evict()
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        """Buang entri kadaluarsa; jika masih penuh, buang entri tertua."""
+        now = time.monotonic()
+        for key in [k for k, (exp, _) in self._data.items() if exp < now]:
+            del self._data[key]
+        while len(self._data) >= self.maxsize:
+            self._data.pop(next(iter(self._data)))
@@ -8,6 +8,8 @@ import pytz
 import os
 import traceback
 
+from .metrics import SMTP_SECONDS, SMTP_FAILURES_TOTAL
+
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv()
 
@@ -22,6 +24,19 @@ SMTP_PORT = 587
 EMAIL_SENDER = os.getenv("EMAIL_SENDER", "youremail@gmail.com")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD", "your-app-password")
 
+
+def _smtp_send(to_email, msg, kind):
+    """Kirim pesan via SMTP; latensi & kegagalan dicatat per jenis email."""
+    try:
+        with SMTP_SECONDS.time(kind=kind):
+            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
+                server.starttls()
+                server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+                server.sendmail(EMAIL_SENDER, to_email, msg.as_string())
+    except Exception:
+        SMTP_FAILURES_TOTAL.inc(kind=kind)
+        raise
+
 # ======================================================================
 # 1. Email Notifikasi Login
 # ======================================================================
@@ -49,10 +64,7 @@ def send_notification_email(
         msg["To"] = to_email
         msg.attach(MIMEText(html_content, "html"))
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, to_email, msg.as_string())
+        _smtp_send(to_email, msg, "login")
 
         print(f"✅ Email notifikasi login terkirim ke {to_email}")
 
@@ -82,10 +94,7 @@ def send_register_email(to_email, username):
         msg["To"] = to_email
         msg.attach(MIMEText(html_content, "html"))
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, to_email, msg.as_string())
+        _smtp_send(to_email, msg, "register")
 
         print(f"✅ Email registrasi terkirim ke {to_email}")
 
@@ -114,10 +123,7 @@ def send_password_changed_email(to_email, username):
         msg["To"] = to_email
         msg.attach(MIMEText(html_content, "html")) 
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, to_email, msg.as_string())
+        _smtp_send(to_email, msg, "password_changed")
  
         print(f"✅ Email ubah password terkirim ke {to_email}")
 
@@ -147,10 +153,7 @@ def send_email_otp(to_email: str, otp_code: str):
         msg.attach(MIMEText(html_content, "html"))
 
         # Kirim email via SMTP
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_SENDER, to_email, msg.as_string())
+        _smtp_send(to_email, msg, "otp")
 
         print(f"[INFO] OTP terkirim ke {to_email}")
 
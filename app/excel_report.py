@@ -0,0 +1,245 @@
+import io
+import queue
+import re
+import threading
+import zipfile
+from io import RawIOBase
+from typing import Iterable, Iterator, List, NamedTuple
+from xml.sax.saxutils import escape
+
+# Laporan Excel ditulis langsung sebagai XML SpreadsheetML ke dalam zip yang
+# mengalir ke klien: setiap baris di-encode lalu dikompres ke entri sheet begitu
+# dibaca dari database, sehingga byte pertama terkirim tanpa menunggu seluruh
+# baris dan memori tetap konstan. Style (border, perataan, header tebal) cukup
+# didefinisikan sekali di styles.xml dan dirujuk per sel lewat indeksnya.
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class ReportLayout(NamedTuple):
+    title: str
+    headers: List[str]
+    widths: List[int]
+    aligns: List[str]
+
+
+CHECKLIST_LAYOUT = ReportLayout(
+    "Laporan Verifikasi",
+    ["NO", "ITEM YANG DIPERIKSA", "STATUS OK", "STATUS NOK", "KETERANGAN"],
+    [5, 50, 12, 12, 40],
+    ["center", "left", "center", "center", "left"],
+)
+REKAP_LAYOUT = ReportLayout(
+    "Rekap Verifikasi",
+    ["NO", "NAMA DOKUMEN", "TIPE", "TANGGAL", "STATUS", "SKOR",
+     "ITEM YANG DIPERIKSA", "STATUS OK", "STATUS NOK", "KETERANGAN"],
+    [7, 40, 20, 12, 12, 8, 50, 12, 12, 40],
+    ["center", "left", "left", "center", "center", "center", "left", "center", "center", "left"],
+)
+
+# Indeks cellXfs di styles.xml
+_STYLE_INDEX = {"header": 1, "center": 2, "left": 3}
+ROW_HEIGHT = 25
+
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+_BORDER = '<left style="thin"/><right style="thin"/><top style="thin"/><bottom style="thin"/><diagonal/>'
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    f'<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border><border>{_BORDER}</border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="1" xfId="0" applyFont="1" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center" wrapText="1"/></xf>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="center" vertical="center"/></xf>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="1" xfId="0" applyBorder="1" applyAlignment="1">'
+    '<alignment horizontal="left" vertical="center" wrapText="1"/></xf>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def _workbook_xml(title: str) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(title[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _cell(ref: str, value, style: int) -> str:
+    if value is None or value == "":
+        return f'<c r="{ref}" s="{style}"/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c r="{ref}" s="{style}"><v>{value}</v></c>'
+    text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+    return f'<c r="{ref}" s="{style}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def column_letter(idx: int) -> str:
+    """Huruf kolom Excel untuk indeks 0-based: 0 -> A, 25 -> Z, 26 -> AA, 702 -> AAA."""
+    letters = ""
+    idx += 1
+    while idx:
+        idx, rem = divmod(idx - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+def _row(number: int, values: Iterable, styles: List[int]) -> str:
+    cells = "".join(_cell(f"{column_letter(idx)}{number}", value, style)
+                    for idx, (value, style) in enumerate(zip(values, styles)))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def write_xlsx(stream, layout: ReportLayout, rows: Iterable[list]):
+    """
+    Menulis file .xlsx satu sheet ke `stream` (boleh tidak bisa di-seek). Baris
+    sheet ditulis ke entri zip satu per satu saat `rows` diiterasi.
+    """
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _ROOT_RELS)
+        archive.writestr("xl/workbook.xml", _workbook_xml(layout.title))
+        archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        archive.writestr("xl/styles.xml", _STYLES)
+        # Ukuran sheet tidak diketahui di awal: zip64 agar entri boleh melewati 2 GiB
+        with archive.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            cols = "".join(f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>' for i, w in enumerate(layout.widths, 1))
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                # Tinggi baris 25 untuk semua baris lewat default sheet, bukan per baris
+                f'<sheetFormatPr defaultRowHeight="{ROW_HEIGHT}" customHeight="1"/>'
+                f'<cols>{cols}</cols><sheetData>'
+            ).encode("utf-8"))
+            sheet.write(_row(1, layout.headers, [_STYLE_INDEX["header"]] * len(layout.headers)).encode("utf-8"))
+            styles = [_STYLE_INDEX[align] for align in layout.aligns]
+            for number, values in enumerate(rows, 2):
+                sheet.write(_row(number, values, styles).encode("utf-8"))
+            sheet.write(b'</sheetData></worksheet>')
+
+
+def _ticks(item: dict):
+    is_ok = item.get("status") == "OK"
+    return ("✔" if is_ok else "", "" if is_ok else "✔")
+
+
+def checklist_rows(results: List[dict]) -> Iterator[list]:
+    """Baris checklist hasil verifikasi (format /download-excel)."""
+    for i, item in enumerate(results, 1):
+        ok_tick, nok_tick = _ticks(item)
+        yield [i, item.get("name"), ok_tick, nok_tick, item.get("keterangan")]
+
+
+def rekap_rows(dokumen_rows: Iterable) -> Iterator[list]:
+    """
+    Rekap banyak dokumen: satu baris per item pemeriksaan per dokumen.
+    `dokumen_rows` boleh berupa iterator (mis. query dengan yield_per) agar
+    data dibaca dari database sedikit demi sedikit.
+    """
+    for no, dokumen in enumerate(dokumen_rows, 1):
+        tanggal = dokumen.timestamp.strftime('%Y-%m-%d') if dokumen.timestamp else ""
+        head = [no, dokumen.nama_dokumen, dokumen.tipe_dokumen, tanggal, dokumen.status, dokumen.skor]
+        items = dokumen.hasil_verifikasi or [{}]
+        for item in items:
+            ok_tick, nok_tick = _ticks(item) if item else ("", "")
+            yield head + [item.get("name"), ok_tick, nok_tick, item.get("keterangan")]
+
+
+class _QueueWriter(RawIOBase):
+    """File-like tulis-saja yang meneruskan setiap potongan byte ke sebuah queue."""
+
+    def __init__(self, chunks: "queue.Queue", cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        while True:
+            if self._cancelled.is_set():
+                raise IOError("Klien berhenti mengunduh laporan.")
+            try:
+                self._chunks.put(data, timeout=1)
+                return len(data)
+            except queue.Full:
+                continue
+
+
+_DONE = object()
+
+
+def stream_report(layout: ReportLayout, rows: Iterable[list], max_buffered_chunks: int = 64,
+                  chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Menulis .xlsx di thread terpisah dan menghasilkan byte-nya sepotong demi
+    sepotong (±chunk_size) untuk StreamingResponse, selagi baris masih dibaca.
+    `rows` diiterasi di thread tersebut (generator dengan sesi DB sendiri aman).
+    Queue dibatasi sehingga penulisan menunggu klien (backpressure).
+    """
+    chunks = queue.Queue(maxsize=max_buffered_chunks)
+    cancelled = threading.Event()
+    errors = []
+
+    def worker():
+        try:
+            with io.BufferedWriter(_QueueWriter(chunks, cancelled), buffer_size=chunk_size) as out:
+                write_xlsx(out, layout, rows)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if hasattr(rows, "close"):
+                rows.close()  # menjalankan finally generator baris (mis. menutup sesi DB)
+            while not cancelled.is_set():
+                try:
+                    chunks.put(_DONE, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    threading.Thread(target=worker, daemon=True).start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        # Dipanggil juga saat klien memutus koneksi (generator ditutup).
+        cancelled.set()
+    if errors:
+        raise errors[0]
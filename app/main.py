@@ -2,6 +2,11 @@
 # BAGIAN 1: IMPORT
 # ==============================================================================
 import os
+# --- Env thread OpenMP/BLAS dibaca saat numpy/cv2/fitz dimuat, jadi diisi paling awal ---
+from .thread_budget import apply_thread_env
+apply_thread_env()
+
+import base64
 import shutil
 import tempfile
 import fitz 
@@ -13,53 +18,58 @@ import json
 import time
 import requests
 from datetime import datetime, timedelta
-from io import BytesIO
-from typing import List, Dict, Any
+from typing import List, Dict, Any, NamedTuple, Optional
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
 # --- Import untuk FastAPI & Web ---
 from fastapi import FastAPI, Request, Form, Depends, HTTPException, status, UploadFile, File, Body
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
+from starlette.concurrency import run_in_threadpool
 from werkzeug.utils import secure_filename
 
 # --- Import untuk Database & Autentikasi ---
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import func, tuple_, type_coerce, String, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from passlib.context import CryptContext
 from . import models
-from .database import engine, SessionLocal
+from .database import engine, SessionLocal, AsyncSessionLocal, IS_SQLITE
+from .cache import TTLCache
+from .storage import STORAGE_DIR, release, start_gc, store_upload
+from .metrics import METRICS_ENABLED, span, render_latest, DOCUMENTS_TOTAL, PAGES_TOTAL, PAGES_SKIPPED_TOTAL, PAGE_DECISIONS_TOTAL, OCR_FALLBACK_TOTAL, IN_PROGRESS
+from .search import init_search_index, index_dokumen, remove_dokumen, search_dokumen
+from .excel_report import CHECKLIST_LAYOUT, EXCEL_MEDIA_TYPE, REKAP_LAYOUT, checklist_rows, rekap_rows, stream_report
 from .email_utils import send_notification_email, send_register_email, send_password_changed_email, send_email_otp
 
+# --- Anggaran thread CPU: harus diterapkan sebelum TF/torch membuat thread pool ---
+# Sesudah import database: sqlite3 harus dimuat sebelum TF, karena TF membawa
+# libsqlite3 sendiri tanpa FTS5 yang bisa menggantikan milik Python.
+from .thread_budget import apply_thread_budget
+THREAD_BUDGET = apply_thread_budget()
+
 # --- Import dari Modul AI & Logika Verifikasi Anda ---
 from .Verifikasi_Fuzzy_Fix import VERIFICATION_TEMPLATES
-from .modules.dl_classifier import predict_page_class
+from .modules.dl_classifier import predict_page_image, acquire_model, needs_ocr_fallback
 from .modules.page_classifier import classify_page_by_keywords
-from .modules.summarizer import generate_summary
+from .modules.text_classifier import predict_text_class, usable_text
+from .modules.summarizer import generate_summary, extract_summary_fields, summary_fallback_pages, summary_page_indices
 from .modules.signature_detector import check_signatures_in_pdf 
+from .modules.page_filter import plan_pages, render_thumbnail, BLANK
+from .modules.section_segmenter import plan_sections, sample_pages, section_map
+from .modules.table_extractor import extract_document_tables
+from .modules.ocr_engine import get_engine
+from .modules.warmup import start_warmup, readiness
 
 
 # --- Import Pustaka Tambahan dari ai-fx ---
 from user_agents import parse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Border, Side, Alignment
 from dotenv import load_dotenv
 from captcha.image import ImageCaptcha
 
-# Pustaka Opsional untuk OCR diperiksa di sini
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
-
 # Muat environment variables
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv()
@@ -68,11 +78,20 @@ load_dotenv()
 # BAGIAN 2: SETUP APLIKASI, DIREKTORI, DATABASE, & TEMPLATE
 # ==============================================================================
 
-# Buat tabel di database (jika belum ada)
-models.Base.metadata.create_all(bind=engine)
+# Buat tabel & index di database (jika belum ada)
+models.init_db()
+init_search_index()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Muat & panaskan model/OCR di latar; /ready baru 200 setelah selesai
+    start_warmup()
+    # Sweeper GC object dokumen yang tidak dirujuk lagi (lihat app/storage.py)
+    start_gc()
+    yield
 
 # Inisialisasi aplikasi FastAPI
-app = FastAPI(title="Document Verification AI")
+app = FastAPI(title="Document Verification AI", lifespan=lifespan)
 
 # Tambahkan middleware untuk manajemen sesi (login, dll)
 app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY", "rahasia12345"))
@@ -88,10 +107,8 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
 # Setup direktori upload
 UPLOAD_DIR_FOTO = os.path.join(ASSETS_DIR, "uploads")
-UPLOAD_DIR_DOKUMEN = os.path.join(BASE_APP_DIR, "dokumen_tersimpan") # Disimpan di luar assets
 TEMP_UPLOADS_DIR = os.path.join(BASE_APP_DIR, "temp_uploads")
 os.makedirs(UPLOAD_DIR_FOTO, exist_ok=True)
-os.makedirs(UPLOAD_DIR_DOKUMEN, exist_ok=True)
 os.makedirs(TEMP_UPLOADS_DIR, exist_ok=True)
 
 
@@ -124,35 +141,155 @@ def get_db():
     finally:
         db.close()
 
+# --- User yang sedang login (di-cache per proses) ---
+class CurrentUser(NamedTuple):
+    """Snapshot kolom user untuk halaman & API (tanpa password); aman dibagi antar request/thread."""
+    id: int
+    email: str
+    username: str
+    phone: Optional[str]
+    name: Optional[str]
+    photo: Optional[str]
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CurrentUser":
+        return cls(user.id, user.email, user.username, user.phone, user.name, user.photo)
+
+# Request terautentikasi yang cache-nya hit tidak menyentuh database sama sekali.
+# Di-invalidate saat profil, foto, atau password berubah; TTL membatasi data basi
+# di worker lain (cache-nya per proses).
+user_cache = TTLCache(ttl_seconds=float(os.getenv("USER_CACHE_TTL", "60")), name="user")
+
+def _cache_user(user: Optional[models.User]) -> Optional[CurrentUser]:
+    if user is None:
+        return None
+    current = CurrentUser.from_model(user)
+    user_cache.set(user.id, current)
+    return current
+
 # Dependency untuk mendapatkan user yang sedang login dari sesi
-def get_current_user(request: Request, db: Session = Depends(get_db)):
+def get_current_user(request: Request, db: Session = Depends(get_db)) -> Optional[CurrentUser]:
+    user_id = request.session.get("user_id")
+    if not user_id:
+        return None
+    return user_cache.get(user_id) or _cache_user(db.query(models.User).filter(models.User.id == user_id).first())
+
+# Versi async untuk endpoint `async def`: query tidak menahan event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_current_user_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> Optional[CurrentUser]:
     user_id = request.session.get("user_id")
     if not user_id:
         return None
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return user_cache.get(user_id) or _cache_user(await db.get(models.User, user_id))
+
+async def get_current_user_model_async(request: Request, db: AsyncSession = Depends(get_async_db)) -> Optional[models.User]:
+    """User sebagai objek ORM di sesi request, untuk endpoint yang mengubah data user."""
+    user_id = request.session.get("user_id")
+    if not user_id:
+        return None
+    return await db.get(models.User, user_id)
+
+# --- Helper riwayat (keyset pagination) ---
+RIWAYAT_PAGE_SIZE = 25
+RIWAYAT_MAX_PAGE_SIZE = 100
+# Kolom yang ditampilkan di tabel riwayat. hasil_verifikasi (JSON) dan
+# ringkasan (HTML) sengaja tidak dimuat; keduanya diambil lewat /api/riwayat/{id}.
+RIWAYAT_LIST_COLUMNS = (
+    models.Dokumen.id, models.Dokumen.nama_dokumen, models.Dokumen.tipe_dokumen,
+    models.Dokumen.status, models.Dokumen.skor, models.Dokumen.timestamp,
+)
+
+def _encode_riwayat_cursor(dokumen: models.Dokumen) -> str:
+    # isoformat() menghasilkan format yang sama dengan yang disimpan SQLite
+    # (tanpa mikrodetik untuk server_default CURRENT_TIMESTAMP).
+    raw = f"{dokumen.timestamp.isoformat(sep=' ')}|{dokumen.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_riwayat_cursor(cursor: str):
+    try:
+        ts, dokumen_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return ts, int(dokumen_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid.")
+
+def query_riwayat_page(db: Session, user_id: int, cursor: str = None, limit: int = RIWAYAT_PAGE_SIZE):
+    """Mengambil satu halaman riwayat (terbaru dulu) beserta cursor halaman berikutnya."""
+    query = db.query(models.Dokumen).options(load_only(*RIWAYAT_LIST_COLUMNS)).filter(models.Dokumen.user_id == user_id)
+    if cursor:
+        ts, last_id = _decode_riwayat_cursor(cursor)
+        if IS_SQLITE:
+            # SQLite menyimpan DateTime sebagai teks; bandingkan teks mentahnya
+            # agar baris server_default (tanpa mikrodetik) tidak terulang.
+            ts_col, ts_val = type_coerce(models.Dokumen.timestamp, String), ts
+        else:
+            ts_col, ts_val = models.Dokumen.timestamp, datetime.fromisoformat(ts)
+        query = query.filter(tuple_(ts_col, models.Dokumen.id) < tuple_(ts_val, last_id))
+
+    rows = query.order_by(models.Dokumen.timestamp.desc(), models.Dokumen.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_riwayat_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def serialize_riwayat_item(dokumen: models.Dokumen) -> dict:
+    return {
+        "id": dokumen.id,
+        "nama_dokumen": dokumen.nama_dokumen,
+        "tipe_dokumen": dokumen.tipe_dokumen,
+        "status": dokumen.status,
+        "skor": dokumen.skor,
+        "tanggal": dokumen.timestamp.strftime('%Y-%m-%d') if dokumen.timestamp else None,
+    }
+
+# --- Helper dashboard /home ---
+# Cache per user dengan TTL pendek; di-invalidate saat Dokumen ditambah/dihapus.
+dashboard_cache = TTLCache(ttl_seconds=float(os.getenv("DASHBOARD_CACHE_TTL", "30")), name="dashboard")
+
+def get_dashboard_stats(db: Session, user_id: int) -> dict:
+    """5 riwayat terbaru + jumlah DITERIMA/DITOLAK dalam satu query agregat."""
+    stats = dashboard_cache.get(user_id)
+    if stats is not None:
+        return stats
+
+    riwayat_terbaru, _ = query_riwayat_page(db, user_id, limit=5)
+    counts = dict(
+        db.query(models.Dokumen.status, func.count(models.Dokumen.id))
+        .filter(models.Dokumen.user_id == user_id)
+        .group_by(models.Dokumen.status)
+        .all()
+    )
+    stats = {
+        "riwayat_terbaru": [serialize_riwayat_item(d) for d in riwayat_terbaru],
+        "jumlah_berhasil": counts.get("DITERIMA", 0),
+        "jumlah_gagal": counts.get("DITOLAK", 0),
+    }
+    dashboard_cache.set(user_id, stats)
+    return stats
 
 
 # ==============================================================================
 # BAGIAN 3: FUNGSI HELPER UNTUK LOGIKA AI (OCR & VERIFIKASI)
 # ==============================================================================
-_easy_reader = None
-def get_easyocr_reader(langs: List[str] = ['id', 'en'], force_gpu: bool = None):
-    if not EASYOCR_AVAILABLE: raise RuntimeError("EasyOCR tidak tersedia.")
-    global _easy_reader
-    if _easy_reader is not None: return _easy_reader
-    
-    use_gpu = (TORCH_AVAILABLE and torch.cuda.is_available()) if force_gpu is None else force_gpu
-    _easy_reader = easyocr.Reader(langs, gpu=use_gpu, verbose=False)
-    print(f"✅ GPU={'Aktif' if use_gpu else 'Tidak Aktif (CPU Mode)'}")
-    return _easy_reader
-
-def easyocr_extract_text(image_path: str, min_conf: float = 0.25) -> str:
+# Bagian atas halaman (proporsi tinggi) yang di-OCR untuk fallback klasifikasi;
+# 1.0 = seluruh halaman. Judul/heading biasanya cukup, dan jauh lebih cepat di-OCR.
+OCR_HEADING_CROP = float(os.getenv("OCR_HEADING_CROP", "1.0"))
+# Maksimum halaman cadangan per dokumen yang di-OCR saat field ringkasan belum ditemukan
+SUMMARY_FALLBACK_OCR_PAGES = int(os.getenv("SUMMARY_FALLBACK_OCR_PAGES", "4"))
+
+def ocr_extract_text(image_path: str, site: str = "page", min_conf: float = 0.25, crop_top: float = 1.0, skip_top: float = 0.0) -> str:
+    """
+    OCR satu gambar halaman dengan engine yang dikonfigurasi untuk call-site tsb. (lihat ocr_engine).
+    Hanya pita tinggi [skip_top, crop_top) (proporsi) yang di-OCR.
+    """
     try:
-        reader = get_easyocr_reader()
-        img_bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
-        if img_bgr is None: return ""
-        results = reader.readtext(img_bgr)
-        return " ".join([t.strip() for (_, t, conf) in results if t and conf >= min_conf])
+        with span("ocr"):
+            img_bgr = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if img_bgr is None: return ""
+            if crop_top < 1.0 or skip_top > 0.0:
+                height = img_bgr.shape[0]
+                img_bgr = img_bgr[int(height * skip_top):max(int(height * skip_top) + 1, int(height * crop_top))]
+            return get_engine(site).read_text(img_bgr, min_conf=min_conf)
     except Exception as e:
         print(f"Error saat menjalankan OCR pada {image_path}: {e}")
         return ""
@@ -196,38 +333,129 @@ def compare_with_template_smart(pages_data: List[Dict[str, Any]], doc_type: str,
     results.append({"name": signature_item_name, "kategori": "Validasi Akhir", "status": ttd_status, "keterangan": ttd_ket})
     return results
 
+# Resolusi render untuk OCR; klasifikasi cukup memakai thumbnail seukuran input model
+OCR_RENDER_DPI = int(os.getenv("OCR_RENDER_DPI", "200"))
+
 def process_verification_stream(pdf_path: str, doc_type: str):
     if not os.path.exists(pdf_path):
         yield {"status": "error", "message": "File tidak ditemukan"}
         return
 
     temp_dir = tempfile.mkdtemp()
+    doc = None
     try:
         yield {"status": "processing", "message": "🚀 Membuka PDF...", "progress": 0}
         doc = fitz.open(pdf_path)
         total_pages = len(doc)
         yield {"status": "processing", "message": f"📄 Total halaman: {total_pages}", "progress": 5}
-
-        signature_results = check_signatures_in_pdf(pdf_path)
-
-        temp_paths = [os.path.join(temp_dir, f"page_{i}.jpg") for i in range(total_pages)]
-        for i, path in enumerate(temp_paths):
-            doc.load_page(i).get_pixmap(dpi=200).save(path)
-        doc.close()
+        PAGES_TOTAL.inc(total_pages, doc_type=doc_type if doc_type in VERIFICATION_TEMPLATES else "other")
+
+        with span("signature"):
+            signature_results = check_signatures_in_pdf(pdf_path)
+
+        # Thumbnail grayscale seukuran input model untuk pra-filter & klasifikasi,
+        # plus lapisan teks PDF (kosong untuk halaman hasil scan)
+        with span("render"):
+            thumbnails = [render_thumbnail(doc.load_page(i)) for i in range(total_pages)]
+            page_texts = [doc.load_page(i).get_text("text") for i in range(total_pages)]
+
+        # Halaman kosong & duplikat berurutan tidak diklasifikasi/di-OCR ulang
+        with span("prefilter"):
+            page_plan = plan_pages(doc, thumbnails, page_texts)
+        for skip in page_plan:
+            if skip:
+                PAGES_SKIPPED_TOTAL.inc(reason=skip[0])
+        # Halaman berurutan dengan layout/header serupa dikelompokkan per seksi
+        with span("segment"):
+            section_of = section_map(plan_sections(doc, thumbnails, page_texts, page_plan))
         yield {"status": "processing", "message": "✅ PDF selesai dikonversi.", "progress": 10}
 
-        def _classify_hybrid(path, index):
-            p_class_dl, confidence = predict_page_class(path)
-            text, p_class, p_class_kw = "", p_class_dl, "-"
-            if confidence <= 0.80:
-                text = easyocr_extract_text(path)
-                p_class_kw = classify_page_by_keywords(text)
-                if p_class_kw != "UNKNOWN": p_class = p_class_kw
-            return {"class": p_class, "ai_class": p_class_dl, "keyword_class": p_class_kw, "path": path, "page_num": index + 1, "text": text}
+        full_res_paths = {}
+        def _full_res_path(index):
+            """Render resolusi penuh hanya untuk halaman yang benar-benar perlu di-OCR."""
+            if index not in full_res_paths:
+                path = os.path.join(temp_dir, f"page_{index}.jpg")
+                with span("render_full"):
+                    doc.load_page(index).get_pixmap(dpi=OCR_RENDER_DPI).save(path)
+                full_res_paths[index] = path
+            return full_res_paths[index]
+
+        # Satu snapshot model untuk seluruh halaman, walau terjadi hot-reload di tengah proses
+        loaded_model = acquire_model()
+        model_version = loaded_model.version if loaded_model else None
+
+        def _classify_text(text):
+            with span("text_classify"):
+                return predict_text_class(text)
+
+        def _classify_hybrid(index):
+            # 1) Lapisan teks PDF cukup → classifier teks; CNN dilewati jika prediksinya yakin
+            text = page_texts[index] if usable_text(page_texts[index]) else ""
+            text_pred = _classify_text(text) if text else None
+            p_class_text = text_pred[0] if text_pred else "-"
+            if text_pred and text_pred[2]:
+                PAGE_DECISIONS_TOTAL.inc(source="text")
+                return {"class": p_class_text, "ai_class": "-", "text_class": p_class_text, "keyword_class": "-", "page_num": index + 1, "text": text}
+
+            # 2) Halaman gambar / prediksi teks ragu → CNN
+            with span("classify"):
+                p_class_dl, confidence = predict_page_image(thumbnails[index], loaded=loaded_model)
+            p_class, p_class_kw, source = p_class_dl, "-", "cnn"
+            ocr_top = 0.0
+            if needs_ocr_fallback(p_class_dl, confidence, loaded_model):
+                # 3) CNN ragu → OCR (jika belum ada teks), lalu classifier teks / kata kunci
+                if not text:
+                    OCR_FALLBACK_TOTAL.inc()
+                    text = ocr_extract_text(_full_res_path(index), site="page", crop_top=OCR_HEADING_CROP)
+                    # Teks heading tetap dipakai; ringkasan cukup meng-OCR sisa halamannya
+                    ocr_top = OCR_HEADING_CROP
+                    text_pred = _classify_text(text)
+                    p_class_text = text_pred[0] if text_pred else "-"
+                if text_pred and text_pred[2]:
+                    p_class, source = p_class_text, "ocr_text"
+                else:
+                    p_class_kw = classify_page_by_keywords(text)
+                    if p_class_kw != "UNKNOWN": p_class, source = p_class_kw, "keyword"
+            PAGE_DECISIONS_TOTAL.inc(source=source)
+            page = {"class": p_class, "ai_class": p_class_dl, "text_class": p_class_text, "keyword_class": p_class_kw, "page_num": index + 1, "text": text}
+            if ocr_top:
+                page["ocr_top"] = ocr_top  # proporsi atas halaman yang sudah di-OCR
+            return page
+
+        classified = {}
+        def _classify_section(section):
+            """Klasifikasi halaman sampel seksi; kelasnya diteruskan ke halaman lain jika seragam."""
+            sampled = {i: _classify_hybrid(i) for i in sample_pages(section)}
+            classified.update(sampled)
+            if len({p['class'] for p in sampled.values()}) > 1:
+                # Halaman sampel berbeda kelas → ada batas seksi yang terlewat, klasifikasi semua halaman
+                for i in section:
+                    if i not in classified:
+                        classified[i] = _classify_hybrid(i)
+                return
+            head = sampled[section[0]]
+            for i in section:
+                if i not in classified:
+                    PAGE_DECISIONS_TOTAL.inc(source="section")
+                    text = page_texts[i] if usable_text(page_texts[i]) else ""
+                    classified[i] = {**head, "page_num": i + 1, "text": text, "section_head": section[0]}
+                    classified[i].pop("ocr_top", None)
+
+        def _skipped_page(skip, index):
+            reason, source = skip
+            if reason == BLANK:
+                return {"class": "BLANK", "ai_class": "BLANK", "keyword_class": "-", "page_num": index + 1, "text": "", "skipped": reason}
+            # Duplikat mewarisi hasil halaman sumbernya
+            return {**pages_data[source], "page_num": index + 1, "skipped": reason, "source": source}
 
         pages_data = []
-        for i, path in enumerate(temp_paths):
-            page_info = _classify_hybrid(path, i)
+        for i in range(total_pages):
+            if page_plan[i] is not None:
+                page_info = _skipped_page(page_plan[i], i)
+            else:
+                if i not in classified:
+                    _classify_section(section_of[i])
+                page_info = classified[i]
             pages_data.append(page_info)
             progress = int((((i + 1) / total_pages) * 70) + 20)
             
@@ -241,7 +469,16 @@ def process_verification_stream(pdf_path: str, doc_type: str):
             separator = "=" * len(header)
             
             print(f"\n{header}\n{separator}")
-            print(f"{'AI Prediction':<16}: {ai_prediction}")
+            if page_info.get('skipped') == BLANK:
+                print(f"{'Dilewati':<16}: halaman kosong")
+            elif page_info.get('skipped'):
+                print(f"{'Dilewati':<16}: duplikat halaman {page_info['source'] + 1}")
+            elif 'section_head' in page_info:
+                print(f"{'Seksi':<16}: mengikuti halaman {page_info['section_head'] + 1}")
+            if page_info.get('text_class', '-') != "-":
+                print(f"{'Text Model':<16}: {page_info['text_class']}")
+            if ai_prediction != "-":
+                print(f"{'AI Prediction':<16}: {ai_prediction}")
 
             # Hanya tampilkan baris Keyword Result jika memang ada hasilnya
             if keyword_prediction != "-":
@@ -255,16 +492,60 @@ def process_verification_stream(pdf_path: str, doc_type: str):
         yield {"status": "processing", "message": "🔍 Menyusun hasil akhir...", "progress": 95}
         
         results = compare_with_template_smart(pages_data, doc_type, signature_results)
+
+        # Tabel BoQ/OPM langsung dari vektor PDF; OCR hanya untuk area gambar di halaman tsb.
+        with span("table"):
+            tables = extract_document_tables(doc, [None if p.get('skipped') else p['class'] for p in pages_data])
         
-        all_texts = [p['text'] or easyocr_extract_text(p['path']) for p in pages_data]
-        summary = generate_summary(all_texts, [p['class'] for p in pages_data])
+        # Teks halaman = lapisan teks PDF atau teks OCR fallback klasifikasi. OCR ringkasan
+        # hanya untuk halaman yang dibaca extract_summary_fields: target tetap (BAUT/BACT/
+        # laporan, OPM, grounding), lalu halaman cadangan satu per satu selama masih ada
+        # field yang belum ditemukan (mis. kontrak di halaman 2 BAUT, redaman di OTDR).
+        page_classes = [None if p.get('skipped') else p['class'] for p in pages_data]
+        all_texts = [p['text'] if not p.get('skipped') else "" for p in pages_data]
+        summary_ocr_done = set()
+
+        def _needs_summary_ocr(i):
+            p = pages_data[i]
+            if i in summary_ocr_done or p.get('skipped') or p.get('ocr_top', 0.0) >= 1.0:
+                return False
+            # Halaman berteks hanya perlu OCR jika teksnya baru heading hasil fallback
+            return not p['text'] or bool(p.get('ocr_top'))
+
+        def _summary_ocr(i):
+            # Bagian atas yang sudah di-OCR saat fallback tidak di-OCR ulang
+            summary_ocr_done.add(i)
+            rest = ocr_extract_text(_full_res_path(i), site="summary", skip_top=pages_data[i].get('ocr_top', 0.0))
+            all_texts[i] = " ".join(t for t in (pages_data[i]['text'], rest) if t)
+
+        for i in sorted(summary_page_indices(page_classes)):
+            if _needs_summary_ocr(i):
+                _summary_ocr(i)
+        with span("summary"):
+            fields = extract_summary_fields(all_texts, page_classes)
+        for _ in range(SUMMARY_FALLBACK_OCR_PAGES):
+            candidate = next((i for i in summary_fallback_pages(page_classes, fields) if _needs_summary_ocr(i)), None)
+            if candidate is None:
+                break
+            _summary_ocr(candidate)
+            with span("summary"):
+                fields = extract_summary_fields(all_texts, page_classes)
+        # Duplikat memakai teks sumbernya (untuk indeks pencarian)
+        for i, p in enumerate(pages_data):
+            if p.get('skipped') and p.get('skipped') != BLANK:
+                all_texts[i] = all_texts[p['source']]
+        with span("summary"):
+            summary = generate_summary(all_texts, page_classes, fields)
         ok = sum(1 for r in results if r["status"] == "OK")
         score = round(100 * ok / (len(results) or 1), 2)
         
-        final_data = {"results": results, "score": score, "level": "Good" if score >= 70 else "Perlu Diperiksa", "summary": summary}
-        yield {"status": "done", "data": final_data}
+        final_data = {"results": results, "score": score, "level": "Good" if score >= 70 else "Perlu Diperiksa", "summary": summary, "fields": fields, "tables": tables, "model_version": model_version}
+        # pages_text hanya untuk indeks pencarian, tidak dikirim ke klien
+        yield {"status": "done", "data": final_data, "pages_text": all_texts}
  
     finally:
+        if doc is not None:
+            doc.close()
         shutil.rmtree(temp_dir, ignore_errors=True)
         
 # ==============================================================================
@@ -294,7 +575,7 @@ def login_form(request: Request):
     return templates.TemplateResponse("login.html", {"request": request, "message": message})
 
 @app.post("/login", response_class=HTMLResponse)
-async def login_post(request: Request, identifier: str = Form(...), password: str = Form(...), captcha_input: str = Form(...), db: Session = Depends(get_db)):
+async def login_post(request: Request, identifier: str = Form(...), password: str = Form(...), captcha_input: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     identifier = identifier.strip().lower()
     email_error, password_error, captcha_error = "", "", ""
 
@@ -303,10 +584,10 @@ async def login_post(request: Request, identifier: str = Form(...), password: st
     
     user = None
     if "@" in identifier:
-        user = db.query(models.User).filter(func.lower(models.User.email) == identifier).first()
+        user = await db.scalar(select(models.User).where(func.lower(models.User.email) == identifier).limit(1))
         if not user: email_error = "Email tidak ditemukan."
     elif identifier.isdigit():
-        user = db.query(models.User).filter(models.User.phone == identifier).first()
+        user = await db.scalar(select(models.User).where(models.User.phone == identifier).limit(1))
         if not user: email_error = "Nomor HP tidak ditemukan."
     else:
         email_error = "Format email atau nomor HP tidak valid."
@@ -396,14 +677,14 @@ async def forgot_password_form(request: Request):
     return templates.TemplateResponse("forgotpw.html", {"request": request})
 
 @app.post("/forgot-password")
-async def process_forgot_password_email(request: Request, email: str = Form(...), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == email.strip().lower()).first()
+async def process_forgot_password_email(request: Request, email: str = Form(...), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == email.strip().lower()).limit(1))
     if not user:
         return templates.TemplateResponse("forgotpw.html", {"request": request, "error": "Email tidak ditemukan"})
     
     otp_code, expiry = str(random.randint(100000, 999999)), datetime.utcnow() + timedelta(minutes=5)
     user.otp_code, user.otp_expiry = otp_code, expiry
-    db.commit()
+    await db.commit()
     send_email_otp(user.email, otp_code)
     request.session["otp_user_id"] = user.id
     return RedirectResponse(url="/verify-otp", status_code=302)
@@ -413,10 +694,10 @@ async def show_verify_otp(request: Request):
     return templates.TemplateResponse("verifyotp.html", {"request": request})
 
 @app.post("/verify-otp")
-async def process_verify_otp(request: Request, otp_code: str = Form(...), db: Session = Depends(get_db)):
+async def process_verify_otp(request: Request, otp_code: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     user_id = request.session.get("otp_user_id")
     if not user_id: return RedirectResponse(url="/forgot-password")
-    user = db.query(models.User).get(user_id)
+    user = await db.get(models.User, user_id)
 
     if not user or otp_code.strip() != user.otp_code:
         return templates.TemplateResponse("verifyotp.html", {"request": request, "error": "Kode OTP salah."})
@@ -425,20 +706,20 @@ async def process_verify_otp(request: Request, otp_code: str = Form(...), db: Se
     
     request.session["otp_verified"], request.session["user_id_for_reset"] = True, user.id
     user.otp_code, user.otp_expiry = None, None
-    db.commit()
+    await db.commit()
     return RedirectResponse(url="/reset-password", status_code=302)
 
 # --- Kirim Ulang OTP  ---
 @app.get("/resend-otp")
-async def resend_otp(request: Request, db: Session = Depends(get_db)):
+async def resend_otp(request: Request, db: AsyncSession = Depends(get_async_db)):
     user_id = request.session.get("otp_user_id")
     if not user_id: return RedirectResponse("/forgot-password")
-    user = db.query(models.User).get(user_id)
+    user = await db.get(models.User, user_id)
     if not user: return RedirectResponse("/forgot-password")
     
     otp_code, expiry = str(random.randint(100000, 999999)), datetime.utcnow() + timedelta(minutes=5)
     user.otp_code, user.otp_expiry = otp_code, expiry
-    db.commit()
+    await db.commit()
     send_email_otp(user.email, otp_code)
     return RedirectResponse("/verify-otp", status_code=302)
 
@@ -450,7 +731,7 @@ async def show_reset_password(request: Request):
     return templates.TemplateResponse("resetpw.html", {"request": request})
 
 @app.post("/reset-password")
-async def process_reset_password(request: Request, new_password: str = Form(...), confirm_password: str = Form(...), db: Session = Depends(get_db)):
+async def process_reset_password(request: Request, new_password: str = Form(...), confirm_password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     if not (request.session.get("otp_verified") or request.session.get("password_verified")):
         return RedirectResponse(url="/", status_code=302)
     
@@ -460,11 +741,12 @@ async def process_reset_password(request: Request, new_password: str = Form(...)
         return templates.TemplateResponse("resetpw.html", {"request": request, "message": "Password konfirmasi tidak cocok."})
     
     user_id = request.session.get("user_id_for_reset") or request.session.get("user_id")
-    user = db.query(models.User).get(user_id)
+    user = await db.get(models.User, user_id)
     if not user: return RedirectResponse(url="/", status_code=302)
     
     user.password = pwd_context.hash(new_password)
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(user.id)
     send_password_changed_email(user.email, user.username)
     
     request.session.pop("otp_verified", None)
@@ -478,25 +760,12 @@ async def process_reset_password(request: Request, new_password: str = Form(...)
 # ==============================================================================
 
 @app.get("/home", response_class=HTMLResponse)
-def home(request: Request, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+def home(request: Request, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
     if not user: 
         return RedirectResponse(url="/", status_code=302)
 
-    # Mengambil 5 riwayat terbaru (
-    riwayat_terbaru = db.query(models.Dokumen).filter(
-        models.Dokumen.user_id == user.id
-    ).order_by(models.Dokumen.timestamp.desc()).limit(5).all()
-
-    # Hitung jumlah dokumen dengan status DITERIMA dan DITOLAK
-    jumlah_berhasil = db.query(models.Dokumen).filter(
-        models.Dokumen.user_id == user.id,
-        models.Dokumen.status == "DITERIMA"
-    ).count()
-
-    jumlah_gagal = db.query(models.Dokumen).filter(
-        models.Dokumen.user_id == user.id,
-        models.Dokumen.status == "DITOLAK"
-    ).count()
+    # 5 riwayat terbaru & jumlah DITERIMA/DITOLAK (di-cache per user)
+    stats = get_dashboard_stats(db, user.id)
 
     return templates.TemplateResponse(
         "home.html", 
@@ -504,34 +773,48 @@ def home(request: Request, db: Session = Depends(get_db), user: models.User = De
             "request": request, 
             "user": user, 
             "now": datetime.now(),
-            "riwayat_terbaru": riwayat_terbaru,
-            "jumlah_berhasil": jumlah_berhasil,  # <-- Kirim data hitungan
-            "jumlah_gagal": jumlah_gagal         # <-- Kirim data hitungan
+            "riwayat_terbaru": stats["riwayat_terbaru"],
+            "jumlah_berhasil": stats["jumlah_berhasil"],  # <-- Kirim data hitungan
+            "jumlah_gagal": stats["jumlah_gagal"]         # <-- Kirim data hitungan
         }
     )
 
 @app.get("/riwayat", response_class=HTMLResponse)
-def riwayat_page(request: Request, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+def riwayat_page(request: Request, db: Session = Depends(get_db), user: CurrentUser = Depends(get_current_user)):
     if not user: return RedirectResponse(url="/", status_code=302)
     
-    # Ambil data riwayat dari database
-    riwayat_dokumen = db.query(models.Dokumen).filter(models.Dokumen.user_id == user.id).order_by(models.Dokumen.timestamp.desc()).all()
+    # Ambil halaman pertama riwayat; halaman berikutnya dimuat lewat /api/riwayat
+    riwayat_dokumen, next_cursor = query_riwayat_page(db, user.id)
     
-    return templates.TemplateResponse("riwayat.html", {"request": request, "user": user, "riwayat_list": riwayat_dokumen})
+    return templates.TemplateResponse("riwayat.html", {"request": request, "user": user, "riwayat_list": riwayat_dokumen, "next_cursor": next_cursor})
+
+@app.get("/api/riwayat")
+def list_riwayat_api(
+    cursor: str = None,
+    limit: int = RIWAYAT_PAGE_SIZE,
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_user)
+):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    limit = max(1, min(limit, RIWAYAT_MAX_PAGE_SIZE))
+    rows, next_cursor = query_riwayat_page(db, user.id, cursor, limit)
+    return {"items": [serialize_riwayat_item(d) for d in rows], "next_cursor": next_cursor}
 
 @app.get("/api/riwayat/{dokumen_id}")
 async def get_detail_riwayat_api(
     dokumen_id: int,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    user: CurrentUser = Depends(get_current_user_async)
 ):
     if not user:
         raise HTTPException(status_code=401, detail="Not authenticated")
 
-    dokumen = db.query(models.Dokumen).filter(
+    dokumen = await db.scalar(select(models.Dokumen).where(
         models.Dokumen.id == dokumen_id,
         models.Dokumen.user_id == user.id
-    ).first()
+    ).limit(1))
 
     if not dokumen:
         raise HTTPException(status_code=404, detail="Dokumen tidak ditemukan")
@@ -554,29 +837,45 @@ async def get_detail_riwayat_api(
     }
     return JSONResponse(content=dokumen_data)
 
+@app.get("/api/search")
+def search_riwayat_api(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    user: CurrentUser = Depends(get_current_user)
+):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    limit = max(1, min(limit, RIWAYAT_MAX_PAGE_SIZE))
+    hits, has_more = search_dokumen(db, user.id, q, limit, max(0, offset))
+    items = [{**serialize_riwayat_item(d), "snippet": snippet} for d, snippet in hits]
+    return {"items": items, "has_more": has_more, "next_offset": offset + len(items) if has_more else None}
+
 # ======================== PROFILE (SESUAI AI-FX ASLI) ========================
 @app.get("/profile", response_class=HTMLResponse)
-def profile_page(request: Request, user: models.User = Depends(get_current_user)):
+def profile_page(request: Request, user: CurrentUser = Depends(get_current_user)):
     if not user: return RedirectResponse(url="/", status_code=302)
     message = request.session.pop("temp_message", None)
     return templates.TemplateResponse("profile.html", {"request": request, "user": user, "message": message})
 
 @app.get("/edit-profile", response_class=HTMLResponse)
-def edit_profile_page(request: Request, user: models.User = Depends(get_current_user)):
+def edit_profile_page(request: Request, user: CurrentUser = Depends(get_current_user)):
     if not user: return RedirectResponse(url="/", status_code=302)
     message = request.session.pop("temp_message", None)
     return templates.TemplateResponse("edit-profile.html", {"request": request, "user": user, "message": message})
 
 @app.post("/update-profile", response_class=HTMLResponse)
-async def update_profile(request: Request, db: Session = Depends(get_db), user: models.User = Depends(get_current_user), username: str = Form(...), email: str = Form(...), photo: UploadFile = File(None)):
+async def update_profile(request: Request, db: AsyncSession = Depends(get_async_db), user: models.User = Depends(get_current_user_model_async), username: str = Form(...), email: str = Form(...), photo: UploadFile = File(None)):
     if not user: return RedirectResponse("/login")
     
     email = email.strip().lower()
     if not username[0].isupper():
         return templates.TemplateResponse("edit-profile.html", {"request": request, "user": user, "message": "Huruf pertama username harus kapital"})
-    if db.query(models.User).filter(models.User.username == username, models.User.id != user.id).first():
+    if await db.scalar(select(models.User.id).where(models.User.username == username, models.User.id != user.id).limit(1)):
         return templates.TemplateResponse("edit-profile.html", {"request": request, "user": user, "message": "Username sudah digunakan."})
-    if db.query(models.User).filter(models.User.email == email, models.User.id != user.id).first():
+    if await db.scalar(select(models.User.id).where(models.User.email == email, models.User.id != user.id).limit(1)):
         return templates.TemplateResponse("edit-profile.html", {"request": request, "user": user, "message": "Email sudah digunakan."})
 
     user.username, user.email = username, email
@@ -590,19 +889,21 @@ async def update_profile(request: Request, db: Session = Depends(get_db), user:
         with open(save_path, "wb") as f: f.write(await photo.read())
         user.photo = new_filename
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.id)
     request.session["user_email"], request.session["username"], request.session["photo"] = user.email, user.username, user.photo
     return templates.TemplateResponse("profile.html", {"request": request, "user": user, "message": "Profil berhasil diperbarui."})
 
 @app.post("/delete-photo")
-async def delete_profile_photo(request: Request, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+async def delete_profile_photo(request: Request, db: AsyncSession = Depends(get_async_db), user: models.User = Depends(get_current_user_model_async)):
     if not user: return RedirectResponse(url="/")
     if user.photo and user.photo != "default.png":
         file_path = os.path.join(UPLOAD_DIR_FOTO, user.photo)
         if os.path.exists(file_path): os.remove(file_path)
         user.photo, request.session["photo"] = "default.png", "default.png"
-        db.commit()
+        await db.commit()
+        user_cache.invalidate(user.id)
         request.session["temp_message"] = "Foto profil berhasil dihapus."
     else:
         request.session["temp_message"] = "Tidak ada foto untuk dihapus."
@@ -610,15 +911,15 @@ async def delete_profile_photo(request: Request, db: Session = Depends(get_db),
 
 # ======================== VERIFY PASSWORD ========================
 @app.get("/verifypw", response_class=HTMLResponse)
-async def show_verify_password(request: Request, user: models.User = Depends(get_current_user)):
+async def show_verify_password(request: Request, user: CurrentUser = Depends(get_current_user_async)):
     if not user: return RedirectResponse("/", status_code=302)
     return templates.TemplateResponse("verifypw.html", {"request": request})
 
 @app.post("/verifypw", response_class=HTMLResponse)
-async def verify_password(request: Request, current_password: str = Form(...), db: Session = Depends(get_db)):
+async def verify_password(request: Request, current_password: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     user_id = request.session.get("user_id")
     if not user_id: return RedirectResponse("/", status_code=302)
-    user = db.query(models.User).get(user_id)
+    user = await db.get(models.User, user_id)
     if not user or not pwd_context.verify(current_password, user.password):
         return templates.TemplateResponse("verifypw.html", {"request": request, "error_message": "Password salah. Coba lagi."})
     
@@ -630,7 +931,7 @@ async def verify_password(request: Request, current_password: str = Form(...), d
 # BAGIAN 6: RUTE (ENDPOINT) UNTUK PROSES VERIFIKASI AI
 # ==============================================================================
 @app.get("/verifikasi", response_class=HTMLResponse)
-def verifikasi_page(request: Request, user: models.User = Depends(get_current_user)):
+def verifikasi_page(request: Request, user: CurrentUser = Depends(get_current_user)):
     if not user: return RedirectResponse(url="/", status_code=302)
     return templates.TemplateResponse("verifikasi.html", {"request": request, "user": user})
 
@@ -639,18 +940,22 @@ async def verify_document_stream_endpoint(
     request: Request,
     doc_type: str = Form(...),
     file: UploadFile = File(...),
-    unique_filename: str = Form(...),
-    user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    # Id unggahan dari klien, hanya untuk log; file disimpan per isi (content_hash)
+    unique_filename: Optional[str] = Form(None),
+    user: CurrentUser = Depends(get_current_user_async)
 ):
     if not user: raise HTTPException(status_code=401, detail="Not authenticated")
+    # doc_type juga dipakai sebagai label metrik: hanya tipe yang punya template yang diterima
+    if doc_type not in VERIFICATION_TEMPLATES:
+        raise HTTPException(status_code=422, detail=f"Tipe dokumen tidak dikenal: {doc_type}")
 
-    save_path = os.path.join(UPLOAD_DIR_DOKUMEN, unique_filename)
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Disimpan per isi (SHA-256): PDF yang sama diunggah berkali-kali hanya ada satu di disk
+    # Salin + SHA-256 di threadpool agar PDF besar tidak menahan event loop
+    content_hash, save_path = await run_in_threadpool(store_upload, file.file)
 
     async def event_generator():
-        final_result_data = None
+        final_result_data, pages_text = None, []
+        IN_PROGRESS.inc()
         try:
             gen = process_verification_stream(save_path, doc_type)
             for update in gen:
@@ -660,6 +965,7 @@ async def verify_document_stream_endpoint(
 
                 if update.get("status") == "done":
                     final_result_data = update.get("data")
+                    pages_text = update.pop("pages_text", [])
 
                 yield f"data: {json.dumps(update)}\n\n"
                 await asyncio.sleep(0.02)
@@ -670,161 +976,162 @@ async def verify_document_stream_endpoint(
                 status_dokumen = "DITERIMA" if score >= 70 else "DITOLAK"
                 dokumen_baru = models.Dokumen(
                     nama_dokumen=file.filename,
-                    nama_file_unik=unique_filename,
+                    content_hash=content_hash,
                     tipe_dokumen=doc_type,
                     status=status_dokumen,
                     skor=int(score),
                     hasil_verifikasi=final_result_data.get("results"),
                     ringkasan=final_result_data.get("summary"),
+                    model_version=final_result_data.get("model_version"),
                     user_id=user.id
                 )
-                db.add(dokumen_baru)
-                db.commit()
-                print(f"✅ Hasil verifikasi untuk {unique_filename} berhasil disimpan ke DB.")
-
+                # Sesi sendiri: sesi dependency request sudah ditutup saat stream berjalan
+                with span("db_commit"):
+                    async with AsyncSessionLocal() as db:
+                        db.add(dokumen_baru)
+                        await db.flush()
+                        await db.run_sync(lambda session: index_dokumen(session, dokumen_baru, final_result_data.get("fields"), pages_text))
+                        await db.commit()
+                dashboard_cache.invalidate(user.id)
+                DOCUMENTS_TOTAL.inc(doc_type=doc_type, status=status_dokumen)
+                print(f"✅ Hasil verifikasi untuk {file.filename} ({content_hash[:12]}) berhasil disimpan ke DB.")
+
+        # Object tidak dihapus di sini: bisa jadi dipakai dokumen lain dengan isi sama.
+        # Tanpa baris Dokumen yang merujuk, object dibuang GC setelah masa tenggang.
         except asyncio.CancelledError:
-            # >> BLOK PEMBERSIHAN FILE <<
-            # Berjalan HANYA jika proses dibatalkan.
-            print(f"⚠️ Proses dibatalkan untuk {unique_filename}. File akan dihapus.")
-            if os.path.exists(save_path):
-                os.remove(save_path)
-                print(f"🗑️ File terhapus karena proses dibatalkan: {save_path}")
+            print(f"⚠️ Proses dibatalkan untuk {file.filename} ({unique_filename or content_hash[:12]}). File diserahkan ke GC.")
+            DOCUMENTS_TOTAL.inc(doc_type=doc_type, status="DIBATALKAN")
         
         except Exception as e:
             print(f"Error dalam event_generator: {e}")
-            if os.path.exists(save_path):
-                os.remove(save_path)
-                print(f"🗑️ File terhapus karena error: {save_path}")
+            DOCUMENTS_TOTAL.inc(doc_type=doc_type, status="ERROR")
+
+        finally:
+            IN_PROGRESS.dec()
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 @app.post("/cancel-verification")
 async def cancel_verification(request: Request, data: dict = Body(...)):
-    """Menerima permintaan dari klien untuk menghapus file yang prosesnya dibatalkan."""
+    """
+    Menerima pemberitahuan pembatalan dari klien. File disimpan per isi dan bisa
+    dipakai bersama dokumen lain, jadi tidak dihapus langsung: object tanpa baris
+    Dokumen dibersihkan GC penyimpanan setelah masa tenggang.
+    """
     filename = data.get("filename")
     if not filename:
         raise HTTPException(status_code=400, detail="Nama file tidak disertakan.")
-
-    file_path = os.path.join(UPLOAD_DIR_DOKUMEN, os.path.basename(filename))
-
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"🗑️ File yang dibatalkan telah dihapus: {file_path}")
-            return JSONResponse(content={"status": "success", "message": "File berhasil dihapus."}, status_code=200)
-        else:
-            # Ini bisa terjadi jika pembatalan sangat cepat.
-            print(f"⚠️ File yang akan dibatalkan tidak ditemukan (mungkin sudah dihapus): {file_path}")
-            return JSONResponse(content={"status": "not_found", "message": "File tidak ditemukan."}, status_code=404)
-    except Exception as e:
-        print(f"❌ Gagal menghapus file yang dibatalkan: {e}")
-        raise HTTPException(status_code=500, detail=f"Gagal menghapus file: {e}")
+    print(f"⚠️ Verifikasi dibatalkan oleh klien: {os.path.basename(filename)}. File diserahkan ke GC.")
+    return JSONResponse(content={"status": "success", "message": "File akan dibersihkan otomatis."}, status_code=200)
 
 @app.post("/hapus-dokumen/{dokumen_id}")
-async def hapus_dokumen(request: Request, dokumen_id: int, db: Session = Depends(get_db), user: models.User = Depends(get_current_user)):
+async def hapus_dokumen(request: Request, dokumen_id: int, db: AsyncSession = Depends(get_async_db), user: CurrentUser = Depends(get_current_user_async)):
     if not user:
         return RedirectResponse(url="/", status_code=302)
 
     # 1. Cari dokumen di database berdasarkan ID uniknya
-    dokumen_to_delete = db.query(models.Dokumen).filter(
+    dokumen_to_delete = await db.scalar(select(models.Dokumen).where(
         models.Dokumen.id == dokumen_id, 
         models.Dokumen.user_id == user.id # Pastikan user hanya bisa hapus miliknya
-    ).first()
+    ).limit(1))
 
     if not dokumen_to_delete:
         # Jika dokumen tidak ditemukan, kembali saja
         return RedirectResponse(url="/riwayat", status_code=302)
     
-    # 2. Ambil nama file unik dari database
-    nama_file_di_server = dokumen_to_delete.nama_file_unik
-    file_path = os.path.join(UPLOAD_DIR_DOKUMEN, nama_file_di_server)
+    content_hash = dokumen_to_delete.content_hash
+    # 2. File lama (sebelum penyimpanan per isi) ada langsung di root: hapus seperti dulu
+    if not content_hash:
+        file_path = os.path.join(STORAGE_DIR, os.path.basename(dokumen_to_delete.nama_file_unik or ""))
+        try:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                print(f"🗑️ File fisik dihapus: {file_path}")
+        except Exception as e:
+            print(f"⚠️ Gagal menghapus file fisik {file_path}: {e}")
 
-    # 3. Hapus file fisik dari server
-    try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            print(f"🗑️ File fisik dihapus: {file_path}")
-    except Exception as e:
-        print(f"⚠️ Gagal menghapus file fisik {file_path}: {e}")
-        # Anda bisa menambahkan pesan error untuk pengguna di sini jika perlu
+    # 3. Hapus catatan dari database
+    await db.run_sync(lambda session: remove_dokumen(session, dokumen_to_delete.id))
+    await db.delete(dokumen_to_delete)
+    await db.commit()
+    dashboard_cache.invalidate(user.id)
 
-    # 4. Hapus catatan dari database
-    db.delete(dokumen_to_delete)
-    db.commit()
+    # 4. Object per isi dihapus hanya jika tidak ada dokumen lain yang merujuk
+    if content_hash:
+        try:
+            await db.run_sync(lambda session: release(session, content_hash))
+        except Exception as e:
+            print(f"⚠️ Gagal melepas object dokumen {content_hash}: {e}")
 
     # 5. Kembalikan pengguna ke halaman riwayat
     return RedirectResponse(url="/riwayat", status_code=302)
 
 @app.post("/download-excel")
 async def download_excel_report(results: List[dict] = Body(...)):
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "Laporan Verifikasi"
-
-    headers = ["NO", "ITEM YANG DIPERIKSA", "STATUS OK", "STATUS NOK", "KETERANGAN"]
-    sheet.append(headers)
-
-    # --- STYLING LEBAR KOLOM & TINGGI HEADER ---
-    sheet.column_dimensions['A'].width = 5
-    sheet.column_dimensions['B'].width = 50
-    sheet.column_dimensions['C'].width = 12
-    sheet.column_dimensions['D'].width = 12
-    sheet.column_dimensions['E'].width = 40
-
-    # BARU: Atur tinggi baris header agar lebih lega
-    sheet.row_dimensions[1].height = 25
-
-    # Atur header menjadi tebal dan rata tengah (vertikal & horizontal)
-    bold_font = Font(bold=True)
-    center_alignment_header = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    for cell in sheet[1]:
-        cell.font = bold_font
-        cell.alignment = center_alignment_header
-    
-    # --- Mengisi data ke dalam baris ---
-    for i, item in enumerate(results, 1):
-        ok_tick = "✔" if item.get("status") == "OK" else ""
-        nok_tick = "✔" if item.get("status") != "OK" else ""
-        sheet.append([
-            i, 
-            item.get("name"), 
-            ok_tick, 
-            nok_tick, 
-            item.get("keterangan")
-        ])
-    
-    # --- STYLING BORDER & ALIGNMENT UNTUK SEMUA DATA ---
-    thin_border = Border(
-        left=Side(style='thin'), 
-        right=Side(style='thin'), 
-        top=Side(style='thin'), 
-        bottom=Side(style='thin')
-    )
-    # BARU: Definisikan alignment untuk sel data
-    center_alignment_data = Alignment(horizontal='center', vertical='center')
-    left_alignment_data = Alignment(horizontal='left', vertical='center', wrap_text=True)
-
-    max_row = sheet.max_row
-    for row_index in range(2, max_row + 1): # Mulai dari baris 2 (data)
-        sheet.row_dimensions[row_index].height = 25 # Atur tinggi standar untuk baris data
-
-    for row in sheet.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=5):
-        for cell in row:
-            cell.border = thin_border
-            # Terapkan alignment berbeda untuk header dan data
-            if cell.row > 1: # Jika bukan baris header
-                if cell.column_letter in ['A', 'C', 'D']:
-                    cell.alignment = center_alignment_data
-                else:
-                    cell.alignment = left_alignment_data
-    
-    # --- Proses untuk membuat dan mengirim file Excel ---
-    buffer = BytesIO()
-    workbook.save(buffer)
-    buffer.seek(0)
-    
     return StreamingResponse(
-        buffer, 
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
+        stream_report(CHECKLIST_LAYOUT, checklist_rows(results)),
+        media_type=EXCEL_MEDIA_TYPE, 
         headers={"Content-Disposition": "attachment; filename=laporan_verifikasi.xlsx"}
-    )
\ No newline at end of file
+    )
+
+@app.get("/export-excel")
+def export_excel_rekap(
+    start: str,
+    end: str,
+    user: CurrentUser = Depends(get_current_user)
+):
+    """Rekap seluruh hasil verifikasi user pada rentang tanggal [start, end] (format YYYY-MM-DD)."""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        start_date = datetime.strptime(start, "%Y-%m-%d")
+        end_date = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format tanggal harus YYYY-MM-DD.")
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="Tanggal akhir harus setelah tanggal awal.")
+
+    if IS_SQLITE:
+        # Bandingkan teks mentah (lihat query_riwayat_page); 'YYYY-MM-DD' aman secara leksikografis.
+        ts_col, lower, upper = type_coerce(models.Dokumen.timestamp, String), start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    else:
+        ts_col, lower, upper = models.Dokumen.timestamp, start_date, end_date
+    user_id = user.id
+
+    def rows():
+        # Sesi sendiri karena baris dibaca di thread streaming, setelah
+        # dependency get_db selesai.
+        db = SessionLocal()
+        try:
+            yield from rekap_rows(
+                db.query(models.Dokumen)
+                .options(load_only(*RIWAYAT_LIST_COLUMNS, models.Dokumen.hasil_verifikasi))
+                .filter(models.Dokumen.user_id == user_id, ts_col >= lower, ts_col < upper)
+                .order_by(models.Dokumen.timestamp, models.Dokumen.id)
+                .yield_per(500)
+            )
+        finally:
+            db.close()
+
+    filename = f"rekap_verifikasi_{start}_{end}.xlsx"
+    return StreamingResponse(
+        stream_report(REKAP_LAYOUT, rows()),
+        media_type=EXCEL_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+# ==============================================================================
+# BAGIAN 7: OBSERVABILITAS
+# ==============================================================================
+@app.get("/ready")
+def readiness_endpoint():
+    """Readiness probe: 503 selama warm-up berjalan atau jika classifier/engine OCR terpasang gagal dimuat, 200 jika siap."""
+    state = readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Metrik dalam format teks Prometheus (durasi per tahap, halaman, OCR fallback, cache, SMTP)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics dinonaktifkan.")
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4; charset=utf-8")
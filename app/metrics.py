@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Iterable, Sequence, Tuple
+
+# Instrumentasi ringan tanpa dependensi tambahan: counter, gauge, histogram,
+# dan span waktu per tahap, diekspor dalam format teks Prometheus lewat /metrics.
+# Dengan METRICS_ENABLED=false semua pencatatan langsung return dan span()
+# memberikan context manager kosong yang sama, sehingga overhead-nya praktis nol.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Cetak durasi setiap span ke terminal (untuk debugging latensi satu dokumen)
+TRACE_SPANS = os.getenv("TRACE_SPANS", "false").lower() in ("1", "true", "yes")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_number(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}  # key -> [counts per bucket..., sum]
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-1] += value
+
+    def time(self, **labels):
+        """Context manager yang mencatat durasi blok ke histogram ini."""
+        if not METRICS_ENABLED:
+            return _NOOP
+        return _Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                le = 'le="' + _format_number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {entry[-1]!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.histogram.observe(elapsed, **self.labels)
+        if TRACE_SPANS:
+            print(f"⏱️ {self.histogram.name}{_format_labels(self.histogram.labelnames, self.histogram._key(self.labels))}: {elapsed * 1000:.1f} ms")
+        return False
+
+
+_NOOP = nullcontext()
+
+
+# --- Metrik aplikasi ---
+STAGE_SECONDS = Histogram(
+    "verifikasi_stage_seconds", "Durasi tiap tahap pipeline verifikasi dalam detik.", ["stage"])
+DOCUMENTS_TOTAL = Counter(
+    "verifikasi_documents_total", "Jumlah dokumen yang selesai diverifikasi per hasil.", ["doc_type", "status"])
+PAGES_TOTAL = Counter(
+    "verifikasi_pages_total", "Jumlah halaman PDF yang diproses.", ["doc_type"])
+PAGES_SKIPPED_TOTAL = Counter(
+    "verifikasi_pages_skipped_total", "Halaman yang dilewati pra-filter (kosong/duplikat).", ["reason"])
+PAGE_DECISIONS_TOTAL = Counter(
+    "verifikasi_page_decisions_total", "Sumber keputusan kelas halaman (text/cnn/ocr_text/keyword/section).", ["source"])
+CLASSIFIER_MODEL_TOTAL = Counter(
+    "verifikasi_classifier_model_total", "Model CNN yang memberi keputusan akhir per halaman (student/teacher).", ["model"])
+OCR_FALLBACK_TOTAL = Counter(
+    "verifikasi_ocr_fallback_total", "Halaman yang di-OCR karena confidence model di bawah ambang.")
+IN_PROGRESS = Gauge(
+    "verifikasi_in_progress", "Verifikasi yang sedang berjalan atau menunggu diproses.")
+CACHE_REQUESTS_TOTAL = Counter(
+    "cache_requests_total", "Akses cache in-memory per hasil (hit/miss).", ["cache", "result"])
+STORAGE_UPLOADS_TOTAL = Counter(
+    "storage_uploads_total", "Unggahan dokumen per hasil penyimpanan (stored/deduplicated).", ["result"])
+STORAGE_GC_DELETED_TOTAL = Counter(
+    "storage_gc_deleted_total", "File penyimpanan dokumen yang dihapus GC (object/tmp).", ["kind"])
+SMTP_SECONDS = Histogram(
+    "smtp_send_seconds", "Latensi pengiriman email via SMTP dalam detik.", ["kind"])
+SMTP_FAILURES_TOTAL = Counter(
+    "smtp_failures_total", "Pengiriman email yang gagal.", ["kind"])
+
+
+def span(stage: str):
+    """Span waktu untuk satu tahap pipeline: `with span("render"): ...`."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Timer(STAGE_SECONDS, {"stage": stage})
+
+
+def render_latest() -> str:
+    """Seluruh metrik dalam format teks eksposisi Prometheus 0.0.4."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, func, JSON, Text, Enum as PyEnum
+from sqlalchemy import create_engine, inspect, text, Column, Integer, String, ForeignKey, DateTime, func, JSON, Text, Index, Enum as PyEnum
 from sqlalchemy.orm import sessionmaker, relationship, validates
 from sqlalchemy.ext.declarative import declarative_base
 from .database import Base, engine
@@ -31,18 +31,46 @@ class User(Base):
 
 class Dokumen(Base):
     __tablename__ = "dokumen"
+    __table_args__ = (
+        # Index komposit untuk keyset pagination riwayat per user (terbaru dulu)
+        Index("ix_dokumen_user_timestamp", "user_id", "timestamp"),
+        # Index penutup (covering) untuk hitungan status di dashboard /home
+        Index("ix_dokumen_user_status", "user_id", "status"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     nama_dokumen = Column(String, index=True)
+    # Nama file lama di root dokumen_tersimpan; NULL untuk dokumen baru (lihat content_hash)
     nama_file_unik = Column(String, index=True)
+    # SHA-256 isi PDF = kunci object di app/storage.py; NULL untuk file lama (flat)
+    content_hash = Column(String(64), nullable=True, index=True)
     tipe_dokumen = Column(String, nullable=True)
     tanggal = Column(DateTime, default=datetime.datetime.utcnow)
     status = Column(String, default="DALAM PROSES")
     skor = Column(Integer, default=0)
     hasil_verifikasi = Column(JSON, nullable=True)
     ringkasan = Column(Text, nullable=True)
+    # Versi model klasifikasi (registry) yang dipakai saat verifikasi
+    model_version = Column(String, nullable=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(Integer, ForeignKey("users.id"))
     pemilik = relationship("User", back_populates="dokumen")
 
+def _add_missing_columns():
+    """Migrasi ringan: tambahkan kolom nullable baru ke tabel lama (create_all tidak melakukannya)."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all tidak menambahkan index baru ke tabel yang sudah ada,
+    # jadi index dibuat terpisah untuk database lama.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -2,7 +2,14 @@ import tensorflow as tf
 import numpy as np
 import json
 import os
+import time
+import threading
 import keras
+from typing import NamedTuple, List, Optional, Dict
+
+from . import model_registry
+from .ocr_policy import load_thresholds, needs_ocr, thresholds_path_for, STUDENT_THRESHOLDS_FILENAME
+from ..metrics import CLASSIFIER_MODEL_TOTAL
 
 # --- Daftarkan fungsi kustom agar bisa dibaca saat memuat model ---
 @keras.saving.register_keras_serializable()
@@ -11,63 +18,216 @@ def grayscale_to_rgb(x):
     return tf.image.grayscale_to_rgb(x)
 
 # --- Konfigurasi Path ---
+# Lokasi lama (di luar registry), dipakai jika registry belum berisi versi aktif.
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 MODEL_PATH = os.path.join(BASE_DIR, 'document_classifier_model.keras')
 CLASS_NAMES_PATH = os.path.join(BASE_DIR, 'class_names.json')
+LEGACY_VERSION = "legacy"
+# Interval (detik) pengecekan manifest registry untuk hot-reload; 0 = nonaktif
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+# Student hasil distilasi (train_model.py --mode distill) sebagai jalur cepat;
+# teacher hanya dipanggil untuk halaman yang confidence student-nya rendah
+USE_STUDENT_MODEL = os.getenv("USE_STUDENT_MODEL", "true").lower() in ("1", "true", "yes")
+
+class LoadedModel(NamedTuple):
+    version: str
+    model: object
+    class_names: List[str]
+    # Ambang fallback OCR per kelas (kosong = ambang default untuk semua kelas)
+    thresholds: Dict[str, float] = {}
+    # Student opsional; None = semua halaman lewat teacher
+    student: object = None
+    student_thresholds: Dict[str, float] = {}
+
+# --- Pointer ke model aktif ---
+# Diganti dengan satu assignment (atomik di Python), sehingga request yang sedang
+# berjalan tetap memakai snapshot lamanya sampai selesai.
+_active: Optional[LoadedModel] = None
+_reload_lock = threading.Lock()
+_watcher_started = False
+
+def _resolve_model_paths():
+    entry = model_registry.active_version_paths()
+    if entry is not None:
+        return entry
+    return LEGACY_VERSION, MODEL_PATH, CLASS_NAMES_PATH
+
+def _load_version(version: str, model_path: str, class_names_path: str) -> LoadedModel:
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"File model tidak ditemukan di: {model_path}")
+    if not os.path.exists(class_names_path):
+        raise FileNotFoundError(f"File class_names.json tidak ditemukan di: {class_names_path}")
 
-# --- Variabel Global untuk Model & Class ---
-_model = None
-_class_names = None
+    model = tf.keras.models.load_model(model_path)
+    with open(class_names_path, 'r') as f:
+        class_names = json.load(f)
+    thresholds = load_thresholds(thresholds_path_for(class_names_path))
+    student, student_thresholds = _load_student(os.path.dirname(os.path.abspath(model_path)), class_names_path, len(class_names))
+    return LoadedModel(version, model, class_names, thresholds, student, student_thresholds)
+
+def _load_student(model_dir: str, class_names_path: str, num_classes: int):
+    """Student di direktori yang sama dengan teacher; diabaikan jika tidak ada atau kelasnya tidak cocok."""
+    student_path = os.path.join(model_dir, model_registry.STUDENT_MODEL_FILENAME)
+    if not USE_STUDENT_MODEL or not os.path.exists(student_path):
+        return None, {}
+    try:
+        student = tf.keras.models.load_model(student_path)
+    except Exception as e:
+        print(f"⚠️ Gagal memuat student, semua halaman memakai teacher: {e}")
+        return None, {}
+    if student.output_shape[-1] != num_classes:
+        print(f"⚠️ Student punya {student.output_shape[-1]} kelas, teacher {num_classes}; student diabaikan.")
+        return None, {}
+    return student, load_thresholds(thresholds_path_for(class_names_path, STUDENT_THRESHOLDS_FILENAME))
 
 def _load_model_and_classes():
-    """Memuat model dan nama kelas ke memori, hanya jika belum ada."""
-    global _model, _class_names
-    if _model is None:
+    """Memuat versi model aktif ke memori, hanya jika belum ada."""
+    global _active
+    if _active is not None:
+        return
+    with _reload_lock:
+        if _active is not None:
+            return
         try:
-            if not os.path.exists(MODEL_PATH):
-                raise FileNotFoundError(f"File model tidak ditemukan di: {MODEL_PATH}")
-            if not os.path.exists(CLASS_NAMES_PATH):
-                raise FileNotFoundError(f"File class_names.json tidak ditemukan di: {CLASS_NAMES_PATH}")
-
-            # Memuat model
-            _model = tf.keras.models.load_model(MODEL_PATH) 
-            
-            with open(CLASS_NAMES_PATH, 'r') as f:
-                _class_names = json.load(f)
-            print(f"✅ Model dan {len(_class_names)} kelas berhasil dimuat.")
+            _active = _load_version(*_resolve_model_paths())
+            print(f"✅ Model versi '{_active.version}' dan {len(_active.class_names)} kelas berhasil dimuat "
+                  f"({'ambang OCR terkalibrasi' if _active.thresholds else 'ambang OCR default'}"
+                  f"{', dengan student' if _active.student is not None else ''}).")
         except Exception as e:
             print(f"❌ Gagal memuat model atau kelas: {e}")
-            _model = None
-            _class_names = None
+            _active = None
+    _start_watcher()
 
-def predict_page_class(image_path: str, img_size=(224, 224)):
+def reload_model(background: bool = True):
     """
-    Memprediksi kelas halaman dari path gambar.
+    Memuat versi aktif di manifest registry lalu menukar pointer model.
+    Jika gagal, model lama tetap dipakai. Dengan background=True pemuatan
+    berjalan di thread terpisah sehingga request tidak ikut menunggu.
     """
-    global _model, _class_names
-    if _model is None:
+    def _do_reload():
+        global _active
+        if not _reload_lock.acquire(blocking=False):
+            return  # reload lain sedang berjalan
+        try:
+            version, model_path, class_names_path = _resolve_model_paths()
+            if _active is not None and _active.version == version:
+                return
+            loaded = _load_version(version, model_path, class_names_path)
+            previous = _active.version if _active else None
+            _active = loaded
+            print(f"🔄 Model diganti: '{previous}' → '{version}'")
+        except Exception as e:
+            print(f"❌ Gagal hot-reload model, tetap memakai versi lama: {e}")
+        finally:
+            _reload_lock.release()
+
+    if background:
+        threading.Thread(target=_do_reload, name="model-reload", daemon=True).start()
+    else:
+        _do_reload()
+
+def _start_watcher():
+    """Thread pemantau manifest: reload otomatis saat versi aktif berubah."""
+    global _watcher_started
+    if _watcher_started or MODEL_RELOAD_INTERVAL <= 0:
+        return
+    _watcher_started = True
+
+    def _watch():
+        last_mtime = model_registry.manifest_mtime()
+        while True:
+            time.sleep(MODEL_RELOAD_INTERVAL)
+            mtime = model_registry.manifest_mtime()
+            if mtime != last_mtime:
+                last_mtime = mtime
+                reload_model(background=False)
+
+    threading.Thread(target=_watch, name="model-registry-watcher", daemon=True).start()
+
+def acquire_model() -> Optional[LoadedModel]:
+    """Snapshot model aktif; pakai untuk seluruh halaman satu dokumen agar versinya konsisten."""
+    if _active is None:
         _load_model_and_classes()
+    return _active
+
+def get_active_model_version() -> Optional[str]:
+    loaded = acquire_model()
+    return loaded.version if loaded else None
+
+def _predict_with(model, img_array, class_names):
+    # Layer output model sudah softmax; jangan di-softmax lagi (skor jadi datar)
+    score = model(img_array, training=False).numpy()[0]
+    predicted_class_index = int(np.argmax(score))
+    return class_names[predicted_class_index], float(score[predicted_class_index])
 
-    if _model is None or _class_names is None:
+def _student_accepts(class_name: str, confidence: float, loaded: LoadedModel) -> bool:
+    # Harus lolos ambang student (presisi setara teacher) dan ambang OCR teacher,
+    # agar student tidak pernah meloloskan halaman yang oleh teacher akan di-OCR
+    return (not needs_ocr(class_name, confidence, loaded.student_thresholds)
+            and not needs_ocr(class_name, confidence, loaded.thresholds))
+
+def _predict_array(img_array, loaded: LoadedModel):
+    """img_array: batch (1, 224, 224, 1) float32. Student dicoba dulu jika tersedia."""
+    if loaded.student is not None:
+        student_size = loaded.student.input_shape[1:3]
+        class_name, confidence = _predict_with(
+            loaded.student, tf.image.resize(img_array, student_size, method='area'), loaded.class_names)
+        if _student_accepts(class_name, confidence, loaded):
+            CLASSIFIER_MODEL_TOTAL.inc(model="student")
+            return class_name, confidence
+    CLASSIFIER_MODEL_TOTAL.inc(model="teacher")
+    return _predict_with(loaded.model, img_array, loaded.class_names)
+
+def warmup(loaded: Optional[LoadedModel] = None) -> Optional[str]:
+    """
+    Forward pass dummy teacher (dan student jika ada) dengan bentuk batch produksi
+    (1, 224, 224, 1), agar tracing graph TF tidak dibayar oleh request pertama.
+    """
+    loaded = loaded or acquire_model()
+    if loaded is None:
+        return None
+    dummy = np.full((1, 224, 224, 1), 255.0, dtype=np.float32)
+    _predict_with(loaded.model, dummy, loaded.class_names)
+    if loaded.student is not None:
+        _predict_with(loaded.student, tf.image.resize(dummy, loaded.student.input_shape[1:3], method='area'), loaded.class_names)
+    return loaded.version
+
+def predict_page_class(image_path: str, img_size=(224, 224), loaded: Optional[LoadedModel] = None):
+    """
+    Memprediksi kelas halaman dari path gambar.
+    """
+    loaded = loaded or acquire_model()
+    if loaded is None:
         return "UNKNOWN", 0.0
 
     try:
         img = tf.keras.utils.load_img(image_path, target_size=img_size, color_mode='grayscale')
         img_array = tf.keras.utils.img_to_array(img)
-        img_array = tf.expand_dims(img_array, 0)
-
-        predictions = _model.predict(img_array, verbose=0)
-        score = tf.nn.softmax(predictions[0])
+        return _predict_array(tf.expand_dims(img_array, 0), loaded)
 
-        predicted_class_index = np.argmax(score)
-        confidence = np.max(score)
-        predicted_class_name = _class_names[predicted_class_index]
+    except Exception as e:
+        print(f"Error saat memprediksi gambar {image_path}: {e}")
+        return "UNKNOWN", 0.0
 
-        return predicted_class_name, float(confidence)
+def predict_page_image(gray: np.ndarray, loaded: Optional[LoadedModel] = None):
+    """
+    Memprediksi kelas halaman dari thumbnail grayscale uint8 (H, W) yang sudah
+    seukuran input model (lihat page_filter.render_thumbnail), tanpa file perantara.
+    """
+    loaded = loaded or acquire_model()
+    if loaded is None:
+        return "UNKNOWN", 0.0
 
+    try:
+        return _predict_array(gray.astype(np.float32)[np.newaxis, :, :, np.newaxis], loaded)
     except Exception as e:
-        print(f"Error saat memprediksi gambar {image_path}: {e}")
+        print(f"Error saat memprediksi thumbnail halaman: {e}")
         return "UNKNOWN", 0.0
 
+def needs_ocr_fallback(class_name: str, confidence: float, loaded: Optional[LoadedModel] = None) -> bool:
+    """True jika confidence di bawah ambang kelas tsb. sehingga halaman perlu di-OCR."""
+    loaded = loaded or _active
+    return needs_ocr(class_name, confidence, loaded.thresholds if loaded else None)
+
 # Panggil fungsi load saat modul ini diimpor pertama kali
-_load_model_and_classes()
\ No newline at end of file
+_load_model_and_classes()
@@ -0,0 +1,128 @@
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+
+# --- Konfigurasi Path ---
+# Struktur registry:
+#   model_registry/
+#     manifest.json            -> {"active": "v20250101-120000", "versions": {...}}
+#     v20250101-120000/
+#       document_classifier_model.keras
+#       class_names.json
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY_DIR", os.path.join(BASE_DIR, "model_registry"))
+MANIFEST_NAME = "manifest.json"
+MODEL_FILENAME = "document_classifier_model.keras"
+CLASS_NAMES_FILENAME = "class_names.json"
+# Opsional: student hasil distilasi (jalur cepat dl_classifier), di direktori yang sama
+STUDENT_MODEL_FILENAME = "document_classifier_student.keras"
+
+
+def manifest_path(registry_dir: str = REGISTRY_DIR) -> str:
+    return os.path.join(registry_dir, MANIFEST_NAME)
+
+
+def read_manifest(registry_dir: str = REGISTRY_DIR) -> dict:
+    try:
+        with open(manifest_path(registry_dir), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"active": None, "versions": {}}
+
+
+def manifest_mtime(registry_dir: str = REGISTRY_DIR):
+    try:
+        return os.stat(manifest_path(registry_dir)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(manifest: dict, registry_dir: str):
+    """Tulis ke file sementara lalu os.replace agar pembaca tidak melihat manifest setengah jadi."""
+    os.makedirs(registry_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=registry_dir, prefix=".manifest.")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path(registry_dir))
+
+
+def version_dir(version: str, registry_dir: str = REGISTRY_DIR) -> str:
+    return os.path.join(registry_dir, version)
+
+
+def active_version_paths(registry_dir: str = REGISTRY_DIR):
+    """(versi, path model, path class_names) untuk versi aktif, atau None jika registry kosong."""
+    version = read_manifest(registry_dir).get("active")
+    if not version:
+        return None
+    directory = version_dir(version, registry_dir)
+    return version, os.path.join(directory, MODEL_FILENAME), os.path.join(directory, CLASS_NAMES_FILENAME)
+
+
+def register_model(model_path: str, class_names_path: str, version: str = None, activate: bool = True,
+                   extra_files=(), metadata: dict = None, registry_dir: str = REGISTRY_DIR) -> str:
+    """
+    Menyalin artefak hasil training ke direktori versi baru di registry dan
+    (opsional) menjadikannya versi aktif. Mengembalikan nama versi.
+    """
+    version = version or datetime.now().strftime("v%Y%m%d-%H%M%S")
+    target = version_dir(version, registry_dir)
+    if os.path.exists(target):
+        raise FileExistsError(f"Versi model '{version}' sudah ada di registry.")
+
+    # Salin ke direktori sementara lalu rename, agar versi tidak pernah terlihat setengah tersalin
+    os.makedirs(registry_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=registry_dir, prefix=f".{version}.")
+    shutil.copy2(model_path, os.path.join(staging, MODEL_FILENAME))
+    shutil.copy2(class_names_path, os.path.join(staging, CLASS_NAMES_FILENAME))
+    for path in extra_files:
+        shutil.copy2(path, os.path.join(staging, os.path.basename(path)))
+    os.replace(staging, target)
+
+    manifest = read_manifest(registry_dir)
+    manifest.setdefault("versions", {})[version] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        **(metadata or {}),
+    }
+    if activate:
+        manifest["active"] = version
+    _write_manifest(manifest, registry_dir)
+    return version
+
+
+def activate_version(version: str, registry_dir: str = REGISTRY_DIR):
+    """Mengganti versi aktif (dipakai juga untuk rollback)."""
+    manifest = read_manifest(registry_dir)
+    if version not in manifest.get("versions", {}):
+        raise KeyError(f"Versi model '{version}' tidak ada di registry.")
+    manifest["active"] = version
+    _write_manifest(manifest, registry_dir)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Kelola registry model klasifikasi dokumen.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Tampilkan versi yang terdaftar")
+    p_register = sub.add_parser("register", help="Daftarkan model baru")
+    p_register.add_argument("model_path")
+    p_register.add_argument("class_names_path")
+    p_register.add_argument("--version")
+    p_register.add_argument("--no-activate", action="store_true")
+    p_register.add_argument("--extra-file", action="append", default=[], help="Artefak tambahan, mis. class_thresholds.json")
+    p_activate = sub.add_parser("activate", help="Jadikan versi tertentu aktif")
+    p_activate.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        manifest = read_manifest()
+        for name, info in sorted(manifest.get("versions", {}).items()):
+            marker = "*" if name == manifest.get("active") else " "
+            print(f"{marker} {name}  {info.get('created_at', '')}")
+    elif args.command == "register":
+        print(f"✅ Terdaftar sebagai versi {register_model(args.model_path, args.class_names_path, args.version, not args.no_activate, args.extra_file)}")
+    elif args.command == "activate":
+        activate_version(args.version)
+        print(f"✅ Versi aktif sekarang {args.version}")
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+from rapidfuzz import fuzz
+
+# Satu antarmuka OCR dengan beberapa backend (EasyOCR, Tesseract). Engine dipilih
+# per call-site lewat env OCR_ENGINE_<SITE> (mis. OCR_ENGINE_PAGE=tesseract), lalu
+# OCR_ENGINE, default "easyocr". Nilai "auto" memakai hasil benchmark
+# (benchmarks/bench_ocr.py) yang tersimpan di OCR_ENGINE_CHOICE_PATH.
+try:
+    import easyocr
+    EASYOCR_AVAILABLE = True
+except ImportError:
+    EASYOCR_AVAILABLE = False
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+try:
+    import pytesseract
+    TESSERACT_AVAILABLE = True
+except ImportError:
+    TESSERACT_AVAILABLE = False
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_ENGINE = os.getenv("OCR_ENGINE", "easyocr").lower()
+OCR_ENGINE_CHOICE_PATH = os.getenv("OCR_ENGINE_CHOICE_PATH", os.path.join(BASE_DIR, "ocr_engine_choice.json"))
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "ind")
+MIN_CONFIDENCE = 0.25
+# Call-site: "page" (fallback klasifikasi), "summary" (teks ringkasan), "table" (area gambar tabel)
+CALL_SITES = ("page", "summary", "table")
+
+Image = Union[str, np.ndarray]
+
+
+class OcrBox(NamedTuple):
+    box: Tuple[float, float, float, float]  # x0, y0, x1, y1
+    text: str
+    confidence: float
+
+
+def load_image(image: Image) -> Optional[np.ndarray]:
+    return cv2.imread(image, cv2.IMREAD_COLOR) if isinstance(image, str) else image
+
+
+def group_lines(boxes, tolerance: Optional[float] = None) -> List[str]:
+    """
+    boxes: [((x0, y0, x1, y1), teks), ...] dari kata PDF atau hasil OCR.
+    Kotak yang pusat vertikalnya berdekatan (< setengah tinggi median) digabung jadi satu baris.
+    """
+    if not boxes:
+        return []
+    if tolerance is None:
+        tolerance = max(1.0, float(np.median([b[3] - b[1] for b, _ in boxes])) / 2)
+    lines, current, current_y = [], [], None
+    for box, text in sorted(boxes, key=lambda b: (b[0][1] + b[0][3]) / 2):
+        y = (box[1] + box[3]) / 2
+        if current and abs(y - current_y) > tolerance:
+            lines.append(current)
+            current = []
+        current.append((box, text))
+        current_y = y if len(current) == 1 else current_y
+    lines.append(current)
+    return [" ".join(t for _, t in sorted(line, key=lambda b: b[0][0])) for line in lines]
+
+
+class OcrEngine:
+    name = "base"
+
+    @staticmethod
+    def available() -> bool:
+        return False
+
+    def read(self, image: np.ndarray) -> List[OcrBox]:
+        raise NotImplementedError
+
+    def read_text(self, image: Image, min_conf: float = MIN_CONFIDENCE) -> str:
+        img = load_image(image)
+        if img is None:
+            return ""
+        return " ".join(b.text for b in self.read(img) if b.text and b.confidence >= min_conf)
+
+    def read_lines(self, image: Image, min_conf: float = MIN_CONFIDENCE) -> List[str]:
+        img = load_image(image)
+        if img is None:
+            return []
+        return group_lines([(b.box, b.text) for b in self.read(img) if b.text and b.confidence >= min_conf])
+
+
+class EasyOcrEngine(OcrEngine):
+    name = "easyocr"
+
+    def __init__(self, langs: Sequence[str] = ('id', 'en'), force_gpu: Optional[bool] = None):
+        self.langs = list(langs)
+        self.force_gpu = force_gpu
+        self._reader = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return EASYOCR_AVAILABLE
+
+    def _get_reader(self):
+        if self._reader is None:
+            with self._lock:
+                if self._reader is None:
+                    use_gpu = (TORCH_AVAILABLE and torch.cuda.is_available()) if self.force_gpu is None else self.force_gpu
+                    self._reader = easyocr.Reader(self.langs, gpu=use_gpu, verbose=False)
+                    print(f"✅ GPU={'Aktif' if use_gpu else 'Tidak Aktif (CPU Mode)'}")
+        return self._reader
+
+    def read(self, image: np.ndarray) -> List[OcrBox]:
+        boxes = []
+        for points, text, conf in self._get_reader().readtext(image):
+            xs, ys = [p[0] for p in points], [p[1] for p in points]
+            boxes.append(OcrBox((min(xs), min(ys), max(xs), max(ys)), text.strip(), float(conf)))
+        return boxes
+
+
+class TesseractEngine(OcrEngine):
+    """Tesseract pada gambar biner (Otsu); jauh lebih cepat dari EasyOCR di CPU untuk teks cetak."""
+    name = "tesseract"
+
+    def __init__(self, lang: str = TESSERACT_LANG):
+        self.lang = lang
+
+    @staticmethod
+    def available() -> bool:
+        return TESSERACT_AVAILABLE
+
+    def read(self, image: np.ndarray) -> List[OcrBox]:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        data = pytesseract.image_to_data(binary, lang=self.lang, output_type=pytesseract.Output.DICT)
+        boxes = []
+        for text, conf, x, y, w, h in zip(data["text"], data["conf"], data["left"], data["top"], data["width"], data["height"]):
+            conf = float(conf)
+            if text.strip() and conf >= 0:  # conf -1 = baris/blok, bukan kata
+                boxes.append(OcrBox((x, y, x + w, y + h), text.strip(), conf / 100))
+        return boxes
+
+
+ENGINES: Dict[str, Callable[[], OcrEngine]] = {
+    EasyOcrEngine.name: EasyOcrEngine,
+    TesseractEngine.name: TesseractEngine,
+}
+
+_instances: Dict[str, OcrEngine] = {}
+_instances_lock = threading.Lock()
+
+
+def _instance(name: str) -> OcrEngine:
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = ENGINES[name]()
+        return _instances[name]
+
+
+def load_auto_choice(path: str = OCR_ENGINE_CHOICE_PATH) -> Dict[str, str]:
+    """Pilihan engine hasil benchmark per call-site ({"default": ..., "page": ...})."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f).get("choice", {})
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def configured_engine_name(site: str) -> str:
+    name = os.getenv(f"OCR_ENGINE_{site.upper()}", DEFAULT_ENGINE).lower()
+    if name == "auto":
+        choice = load_auto_choice()
+        name = choice.get(site) or choice.get("default") or "easyocr"
+    return name
+
+
+def get_engine(site: str = "page") -> OcrEngine:
+    """Engine OCR untuk call-site tertentu; jatuh ke engine lain yang tersedia jika pilihan tidak terpasang."""
+    name = configured_engine_name(site)
+    if name in ENGINES and ENGINES[name].available():
+        return _instance(name)
+    for fallback, engine_cls in ENGINES.items():
+        if engine_cls.available():
+            print(f"⚠️ Engine OCR '{name}' untuk '{site}' tidak tersedia, memakai '{fallback}'.")
+            return _instance(fallback)
+    raise RuntimeError("Tidak ada engine OCR yang tersedia (pasang easyocr atau pytesseract).")
+
+
+def ocr_available() -> bool:
+    return any(engine_cls.available() for engine_cls in ENGINES.values())
+
+
+def text_accuracy(predicted: str, expected: str) -> float:
+    """Kemiripan 0-1 antara hasil OCR dan teks acuan (urutan kata diabaikan)."""
+    return fuzz.token_sort_ratio(predicted.lower(), expected.lower()) / 100
+
+
+def benchmark_engines(samples: List[Tuple[Image, str]], accuracy_floor: float,
+                      engines: Optional[Sequence[str]] = None, warmup: bool = True) -> dict:
+    """
+    Mengukur latensi rata-rata dan akurasi tiap engine pada sampel berlabel
+    [(gambar, teks acuan), ...], lalu memilih engine tercepat yang akurasinya >= floor.
+    Jika tidak ada yang memenuhi, dipilih engine paling akurat.
+    """
+    images = [(load_image(image), expected) for image, expected in samples]
+    images = [(img, expected) for img, expected in images if img is not None]
+    results = {}
+    for name in engines or list(ENGINES):
+        if name not in ENGINES or not ENGINES[name].available():
+            continue
+        engine = _instance(name)
+        if warmup and images:
+            engine.read_text(images[0][0])  # muat model sebelum diukur
+        latencies, accuracies = [], []
+        for img, expected in images:
+            start = time.perf_counter()
+            text = engine.read_text(img)
+            latencies.append(time.perf_counter() - start)
+            accuracies.append(text_accuracy(text, expected))
+        results[name] = {
+            "samples": len(images),
+            "mean_latency_ms": round(1000 * float(np.mean(latencies)), 1) if latencies else None,
+            "accuracy": round(float(np.mean(accuracies)), 4) if accuracies else None,
+        }
+
+    measured = {n: r for n, r in results.items() if r["accuracy"] is not None}
+    passing = [n for n, r in measured.items() if r["accuracy"] >= accuracy_floor]
+    if passing:
+        choice = min(passing, key=lambda n: measured[n]["mean_latency_ms"])
+    else:
+        choice = max(measured, key=lambda n: measured[n]["accuracy"]) if measured else None
+    return {"accuracy_floor": accuracy_floor, "engines": results, "selected": choice}
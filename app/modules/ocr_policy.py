@@ -0,0 +1,114 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Kebijakan fallback OCR: halaman di-OCR (lalu diklasifikasi ulang via kata kunci)
+# hanya jika confidence model di bawah ambang kelas yang diprediksi. Ambang per
+# kelas di-fit oleh train_model.py pada split validasi dan disimpan di
+# class_thresholds.json, di samping class_names.json.
+THRESHOLDS_FILENAME = "class_thresholds.json"
+# Ambang student (distilasi): di bawahnya prediksi dieskalasi ke model teacher
+STUDENT_THRESHOLDS_FILENAME = "student_thresholds.json"
+# Ambang global lama; dipakai untuk kelas tanpa ambang hasil kalibrasi
+DEFAULT_OCR_THRESHOLD = float(os.getenv("OCR_FALLBACK_THRESHOLD", "0.80"))
+# Ambang kalibrasi tidak boleh lebih rendah dari ini, walau validasi mengizinkan
+MIN_OCR_THRESHOLD = 0.50
+
+
+def thresholds_path_for(class_names_path: str, filename: str = THRESHOLDS_FILENAME) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(class_names_path)), filename)
+
+
+def load_thresholds(path: str) -> Dict[str, float]:
+    """Ambang per kelas dari class_thresholds.json; dict kosong jika belum ada (pakai ambang default)."""
+    try:
+        with open(path, 'r') as f:
+            return {k: float(v) for k, v in json.load(f).get("thresholds", {}).items()}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def needs_ocr(class_name: str, confidence: float, thresholds: Optional[Dict[str, float]] = None) -> bool:
+    threshold = (thresholds or {}).get(class_name, DEFAULT_OCR_THRESHOLD)
+    return confidence < threshold
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def lowest_threshold_for_precision(conf: np.ndarray, correct: np.ndarray, target: float) -> Optional[float]:
+    """Confidence terendah t sehingga presisi prediksi dengan conf >= t masih >= target."""
+    order = np.argsort(-conf, kind="stable")
+    conf, correct = conf[order], correct[order]
+    precision = np.cumsum(correct) / np.arange(1, len(conf) + 1)
+    # Hanya titik potong di akhir grup nilai conf yang sama (semua yang sama ikut diterima)
+    cut = np.append(conf[1:] != conf[:-1], True)
+    ok = np.flatnonzero(cut & (precision >= target - 1e-12))
+    return float(conf[ok[-1]]) if len(ok) else None
+
+
+def fit_class_thresholds(probs: np.ndarray, labels: np.ndarray, class_names: List[str],
+                         baseline_threshold: float = DEFAULT_OCR_THRESHOLD, target_precision: Optional[float] = None,
+                         min_samples: int = 5) -> dict:
+    """
+    Mencari ambang per kelas dari probabilitas softmax validasi.
+
+    Untuk tiap kelas prediksi, ambang diturunkan serendah mungkin selama presisi
+    halaman yang diterima tanpa OCR tidak lebih buruk dari kebijakan lama
+    (ambang global `baseline_threshold`), atau dari `target_precision` jika diisi.
+    Kelas dengan sampel validasi < `min_samples` tetap memakai ambang lama.
+    `expected_ocr_rate` hanya mencakup OCR fallback klasifikasi; OCR ringkasan
+    dibatasi ke beberapa halaman per dokumen (summarizer.summary_page_indices).
+    Mengembalikan {"thresholds": {...}, "report": {...}} siap disimpan sebagai JSON.
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    labels = np.asarray(labels)
+    pred = probs.argmax(axis=1)
+    conf = probs.max(axis=1)
+    correct = pred == labels
+
+    thresholds, per_class = {}, {}
+    for idx, name in enumerate(class_names):
+        mask = pred == idx
+        n = int(mask.sum())
+        baseline_accepted = mask & (conf >= baseline_threshold)
+        baseline_precision = float(correct[baseline_accepted].mean()) if baseline_accepted.any() else None
+        target = target_precision if target_precision is not None else baseline_precision
+
+        threshold = baseline_threshold
+        if n >= min_samples and target is not None:
+            fitted = lowest_threshold_for_precision(conf[mask], correct[mask], target)
+            if fitted is not None:
+                threshold = min(max(fitted, MIN_OCR_THRESHOLD), baseline_threshold)
+        thresholds[name] = round(threshold, 4)
+        per_class[name] = {"samples": n, "threshold": thresholds[name],
+                           "baseline_precision": None if baseline_precision is None else round(baseline_precision, 4)}
+
+    per_sample_threshold = np.array([thresholds[class_names[p]] for p in pred]) if len(pred) else np.array([])
+    ocr_calibrated = conf < per_sample_threshold
+    ocr_flat = conf < baseline_threshold
+    # Kebijakan lama: softmax diterapkan dua kali sebelum dibandingkan dengan ambang
+    ocr_legacy = _softmax(probs).max(axis=1) <= baseline_threshold if len(pred) else ocr_flat
+
+    def _rate(mask):
+        return round(float(mask.mean()), 4) if len(mask) else None
+
+    def _accuracy(accepted):
+        return round(float(correct[accepted].mean()), 4) if accepted.any() else None
+
+    report = {
+        "validation_samples": int(len(labels)),
+        "model_accuracy": _rate(correct),
+        "baseline_threshold": baseline_threshold,
+        "ocr_rate_legacy_double_softmax": _rate(ocr_legacy),
+        "ocr_rate_flat_threshold": _rate(ocr_flat),
+        "expected_ocr_rate": _rate(ocr_calibrated),
+        "accepted_accuracy_flat_threshold": _accuracy(~ocr_flat),
+        "accepted_accuracy_calibrated": _accuracy(~ocr_calibrated),
+        "classes": per_class,
+    }
+    return {"thresholds": thresholds, "report": report}
@@ -0,0 +1,133 @@
+import hashlib
+import os
+from typing import List, Optional, Tuple
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+
+# Pra-filter halaman sebelum klasifikasi: halaman kosong (pemisah) dan halaman
+# yang hampir identik dengan halaman sebelumnya (mis. foto yang diulang) tidak
+# perlu melewati model maupun OCR lagi. Semuanya memakai thumbnail grayscale
+# seukuran input classifier, yang juga langsung dipakai untuk klasifikasi.
+MIN_CONTENT_RATIO = 0.005  # ambang batas isi halaman (0.5% pixel non-putih)
+PAGE_PREFILTER_ENABLED = os.getenv("PAGE_PREFILTER", "true").lower() in ("1", "true", "yes")
+# Sama dengan ukuran input dl_classifier (lebar, tinggi)
+THUMBNAIL_SIZE = (224, 224)
+# dHash 16x16 = 256 bit; halaman dianggap duplikat jika selisihnya <= ambang ini
+HASH_SIZE = 16
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "10"))
+# Thumbnail yang tampak kosong dikonfirmasi ulang pada DPI ini: di 224x224 goresan
+# tipis (satu baris teks, paraf, stempel kecil) memudar jadi hampir putih.
+BLANK_CONFIRM_DPI = int(os.getenv("BLANK_CONFIRM_DPI", "100"))
+# Halaman kosong jika total piksel tinta (di luar bintik noise scan) di bawah ini
+BLANK_MAX_INK_PIXELS = int(os.getenv("BLANK_MAX_INK_PIXELS", "60"))
+INK_THRESHOLD = 180
+SPECKLE_MAX_AREA = 3
+
+BLANK = "blank"
+DUPLICATE = "duplicate"
+
+
+def is_blank_page(image, min_content_ratio: float = MIN_CONTENT_RATIO) -> bool:
+    """
+    Deteksi apakah halaman kosong (terlalu putih / sedikit konten)
+    """
+    # Hitung proporsi piksel bukan putih
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+    non_white_ratio = np.count_nonzero(gray < 240) / gray.size
+    return non_white_ratio < min_content_ratio
+
+
+def has_ink(page: "fitz.Page", dpi: int = BLANK_CONFIRM_DPI, max_ink_pixels: int = BLANK_MAX_INK_PIXELS) -> bool:
+    """
+    Render halaman pada `dpi` dan cek apakah ada tinta nyata: piksel gelap yang
+    membentuk goresan, bukan bintik noise scan beberapa piksel saja.
+    """
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.stride)[:, :pix.w]
+    mask = (gray < INK_THRESHOLD).astype(np.uint8)
+    if not mask.any():
+        return False
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    return int(areas[areas > SPECKLE_MAX_AREA].sum()) >= max_ink_pixels
+
+
+def dhash(gray: np.ndarray, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: bandingkan kecerahan piksel bertetangga pada gambar yang dikecilkan."""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def render_thumbnail(page: "fitz.Page", size: Tuple[int, int] = THUMBNAIL_SIZE) -> np.ndarray:
+    """
+    Render halaman langsung ke ukuran target dalam grayscale lewat matrix skala
+    (bukan DPI), sehingga tidak ada pixmap resolusi penuh yang harus dikecilkan.
+    Seperti resize pada load_img, rasio aspek tidak dipertahankan.
+    """
+    matrix = fitz.Matrix(size[0] / page.rect.width, size[1] / page.rect.height)
+    pix = page.get_pixmap(matrix=matrix, colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.stride)[:, :pix.w]
+    if gray.shape != (size[1], size[0]):
+        # Pembulatan ukuran pixmap bisa meleset satu piksel
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(gray)
+
+
+def page_fingerprint(page: "fitz.Page", thumbnail: Optional[np.ndarray] = None, text: Optional[str] = None) -> Tuple[bool, int, Optional[str]]:
+    """
+    (kosong?, dHash, hash lapisan teks) satu halaman, dihitung dari thumbnail;
+    hash teks None jika halaman tidak punya lapisan teks (scan/foto).
+    """
+    gray = render_thumbnail(page) if thumbnail is None else thumbnail
+    words = (page.get_text("text") if text is None else text).split()
+    text_hash = hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest() if words else None
+    return is_blank_page(gray), dhash(gray), text_hash
+
+
+def plan_pages(doc: "fitz.Document", thumbnails: Optional[List[np.ndarray]] = None,
+               texts: Optional[List[str]] = None) -> List[Optional[Tuple[str, int]]]:
+    """
+    Menentukan halaman mana yang perlu diproses. Untuk setiap halaman:
+      None               -> proses normal
+      ("blank", -1)      -> halaman kosong, lewati
+      ("duplicate", i)   -> hampir identik dengan halaman i sebelumnya, pakai hasilnya
+    Hanya halaman berurutan yang dibandingkan (halaman kosong di antaranya diabaikan).
+    Halaman dengan lapisan teks baru dianggap duplikat jika teksnya juga sama, karena
+    halaman formulir bertemplate sama bisa punya dHash yang sangat mirip.
+    Halaman hanya dianggap kosong jika tidak punya lapisan teks dan render DPI
+    lebih tinggi juga tidak menunjukkan tinta (has_ink); halaman yang ternyata
+    berisi sedikit tinta selalu diproses.
+    """
+    plan: List[Optional[Tuple[str, int]]] = []
+    last_index, last_hash, last_text = None, None, None
+    for i in range(len(doc)):
+        if not PAGE_PREFILTER_ENABLED:
+            plan.append(None)
+            continue
+        page = doc.load_page(i)
+        blank, page_hash, text_hash = page_fingerprint(
+            page, thumbnails[i] if thumbnails else None, texts[i] if texts else None)
+        if blank and text_hash is None:
+            if not has_ink(page):
+                plan.append((BLANK, -1))
+                continue
+            # Halaman jarang isi: dHash thumbnail-nya hampir putih dan mirip satu sama
+            # lain, jadi tidak dipakai untuk deteksi duplikat ke mana pun
+            plan.append(None)
+            last_index, last_hash, last_text = None, None, None
+            continue
+        # Bandingkan dengan halaman sumber (bukan duplikat terakhir) agar tidak "bergeser" sedikit demi sedikit
+        if (last_hash is not None and text_hash == last_text
+                and hamming_distance(page_hash, last_hash) <= DUPLICATE_MAX_DISTANCE):
+            plan.append((DUPLICATE, last_index))
+        else:
+            plan.append(None)
+            last_index, last_hash, last_text = i, page_hash, text_hash
+    return plan
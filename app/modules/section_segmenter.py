@@ -0,0 +1,123 @@
+import os
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from rapidfuzz import fuzz
+
+from .page_classifier import normalize_text
+from .page_filter import dhash, hamming_distance, BLANK
+from .text_classifier import usable_text
+
+# Segmentasi dokumen menjadi seksi berurutan (BAUT, Surat Permintaan, BoQ, OTDR,
+# foto, ...). Hanya halaman awal (dan beberapa halaman "probe") tiap seksi yang
+# diklasifikasi; kelasnya diteruskan ke halaman lain di seksi yang sama, sehingga
+# jumlah panggilan model/OCR mengikuti jumlah seksi, bukan jumlah halaman.
+# Batas seksi: bookmark/outline PDF, halaman kosong, perubahan ada/tidaknya
+# lapisan teks, perubahan ukuran/orientasi halaman, dan header yang berbeda.
+SECTION_SEGMENTATION_ENABLED = os.getenv("SECTION_SEGMENTATION", "true").lower() in ("1", "true", "yes")
+# Jumlah halaman awal tiap seksi yang selalu diklasifikasi
+SECTION_HEAD_PAGES = int(os.getenv("SECTION_HEAD_PAGES", "2"))
+# Seksi panjang tetap diperiksa setiap N halaman; 0 = tanpa probe
+SECTION_PROBE_INTERVAL = int(os.getenv("SECTION_PROBE_INTERVAL", "10"))
+# Header halaman ber-teks: sejumlah kata pertama, dibandingkan dengan rapidfuzz (0-100)
+HEADER_WORDS = 12
+HEADER_MIN_SIMILARITY = 60
+# Header halaman tanpa teks: dHash bagian atas thumbnail (256 bit)
+HEADER_STRIP_RATIO = 0.2
+HEADER_MAX_DISTANCE = int(os.getenv("SECTION_HEADER_MAX_DISTANCE", "48"))
+# Selisih relatif ukuran halaman yang dianggap ganti seksi
+SIZE_TOLERANCE = 0.05
+
+
+class PageLayout(NamedTuple):
+    has_text: bool
+    landscape: bool
+    size: Tuple[float, float]
+    header_text: str
+    header_hash: int
+
+
+def header_text(text: str, n_words: int = HEADER_WORDS) -> str:
+    return " ".join(normalize_text(text).split()[:n_words])
+
+
+def page_layout(page: "fitz.Page", thumbnail: np.ndarray, text: str) -> PageLayout:
+    strip = thumbnail[:max(1, int(thumbnail.shape[0] * HEADER_STRIP_RATIO))]
+    has_text = usable_text(text)
+    return PageLayout(
+        has_text=has_text,
+        landscape=page.rect.width > page.rect.height,
+        size=(page.rect.width, page.rect.height),
+        header_text=header_text(text) if has_text else "",
+        header_hash=dhash(strip),
+    )
+
+
+def is_boundary(prev: PageLayout, cur: PageLayout) -> bool:
+    """True jika `cur` kemungkinan besar memulai seksi baru setelah `prev`."""
+    if prev.has_text != cur.has_text or prev.landscape != cur.landscape:
+        return True
+    if any(abs(a - b) > SIZE_TOLERANCE * max(a, b) for a, b in zip(prev.size, cur.size)):
+        return True
+    if cur.has_text:
+        return fuzz.ratio(prev.header_text, cur.header_text) < HEADER_MIN_SIMILARITY
+    return hamming_distance(prev.header_hash, cur.header_hash) > HEADER_MAX_DISTANCE
+
+
+def outline_starts(doc: "fitz.Document") -> Set[int]:
+    """Index halaman (0-based) yang ditunjuk bookmark/outline PDF."""
+    try:
+        return {page - 1 for _, _, page in doc.get_toc(simple=True) if page >= 1}
+    except Exception:
+        return set()
+
+
+def plan_sections(doc: "fitz.Document", thumbnails: List[np.ndarray], texts: List[str],
+                  page_plan: Optional[List[Optional[Tuple[str, int]]]] = None) -> List[List[int]]:
+    """
+    Membagi halaman yang perlu diproses (page_plan None) menjadi seksi berurutan.
+    Halaman kosong menutup seksi; halaman duplikat tidak dimasukkan (mengikuti
+    halaman sumbernya) dan tidak memutus seksi.
+    """
+    page_plan = page_plan or [None] * len(doc)
+    if not SECTION_SEGMENTATION_ENABLED:
+        return [[i] for i in range(len(doc)) if page_plan[i] is None]
+
+    starts = outline_starts(doc)
+    sections: List[List[int]] = []
+    current: List[int] = []
+    prev_layout: Optional[PageLayout] = None
+    for i in range(len(doc)):
+        skip = page_plan[i]
+        if skip is not None:
+            if skip[0] == BLANK and current:
+                sections.append(current)
+                current, prev_layout = [], None
+            continue
+        layout = page_layout(doc.load_page(i), thumbnails[i], texts[i])
+        if current and (i in starts or is_boundary(prev_layout, layout)):
+            sections.append(current)
+            current = []
+        current.append(i)
+        prev_layout = layout
+    if current:
+        sections.append(current)
+    return sections
+
+
+def sample_pages(section: List[int], head_pages: int = SECTION_HEAD_PAGES,
+                 probe_interval: int = SECTION_PROBE_INTERVAL) -> List[int]:
+    """
+    Halaman seksi yang diklasifikasi: halaman awal, probe setiap `probe_interval`
+    halaman, dan halaman terakhir (untuk batas seksi yang terlewat).
+    """
+    sampled = set(section[:max(1, head_pages)])
+    if probe_interval > 0 and len(section) > len(sampled):
+        sampled.update(section[len(sampled) - 1 + probe_interval::probe_interval])
+        sampled.add(section[-1])
+    return sorted(sampled)
+
+
+def section_map(sections: List[List[int]]) -> Dict[int, List[int]]:
+    return {i: section for section in sections for i in section}
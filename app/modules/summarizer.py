@@ -1,28 +1,96 @@
+import os
 import re
-from typing import List
+from typing import Dict, List, Optional, Sequence, Set
 
-def generate_summary(pages_text: List[str], page_classes: List[str]) -> str:
+# Kelas halaman yang teksnya dibaca extract_summary_fields (CONTEXT_CLASSES sesuai
+# urutan baut/bact/laporan_ut di bawah). Halaman hasil scan di luar kelas ini
+# tidak perlu di-OCR untuk ringkasan (lihat summary_page_indices).
+CONTEXT_CLASSES = ('BAUT', 'BACT', 'LAPORAN_UT')
+OPM_CLASSES = ('FORM_OPM', 'FOTO_PENGUKURAN_OPM')
+GROUNDING_CLASSES = ('LAPORAN_UT', 'BA_LAPANGAN')
+# Halaman pengukuran yang dicoba (di-OCR) jika redaman/grounding belum ditemukan
+REDAMAN_CLASSES = OPM_CLASSES + ('OTDR_REPORT',)
+CONTEXT_FIELDS = ("judul", "kontrak", "lokasi", "pelaksana", "tanggal", "kesimpulan")
+# Satu BAUT/BACT bisa beberapa halaman: teks kelas dibaca dari maksimal N halaman
+# berurutan pertamanya (halaman lanjutan mewarisi kelas kepala seksi).
+SUMMARY_CONTEXT_PAGES = int(os.getenv("SUMMARY_CONTEXT_PAGES", "3"))
+
+def class_run(page_classes: Sequence[Optional[str]], cls: str, limit: int = SUMMARY_CONTEXT_PAGES) -> List[int]:
+    """Indeks halaman berurutan pertama berkelas `cls` (maks `limit`)."""
+    if cls not in page_classes:
+        return []
+    start = page_classes.index(cls)
+    run = []
+    for i in range(start, len(page_classes)):
+        if page_classes[i] != cls or len(run) >= limit:
+            break
+        run.append(i)
+    return run
+
+def _context_class(page_classes: Sequence[Optional[str]]) -> Optional[str]:
+    return next((cls for cls in CONTEXT_CLASSES if cls in page_classes), None)
+
+def summary_page_indices(page_classes: Sequence[Optional[str]]) -> Set[int]:
     """
-    Menghasilkan ringkasan dokumen dengan mencari informasi pada halaman yang sudah 
-    diklasifikasikan dan dengan pola Regex yang lebih baik.
+    Indeks halaman yang selalu di-OCR untuk ringkasan: halaman pertama kelas
+    konteks berprioritas tertinggi (atau halaman 1 jika tidak ada), halaman OPM
+    pertama, dan halaman pertama tiap kelas grounding. Halaman lain hanya di-OCR
+    bila field-nya belum ditemukan (summary_fallback_pages).
+    Kelas None = halaman yang tidak boleh dipilih.
+    """
+    indices = set()
+    context = _context_class(page_classes)
+    if context:
+        indices.add(page_classes.index(context))
+    elif page_classes:
+        indices.add(0)
+    opm = next((cls for cls in OPM_CLASSES if cls in page_classes), None)
+    if opm:
+        indices.add(page_classes.index(opm))
+    for cls in GROUNDING_CLASSES:
+        if cls in page_classes:
+            indices.add(page_classes.index(cls))
+    return indices
+
+def summary_fallback_pages(page_classes: Sequence[Optional[str]], fields: Dict[str, Optional[str]]) -> List[int]:
+    """
+    Halaman tambahan (berurutan menurut prioritas) yang teksnya bisa mengisi field
+    ringkasan yang masih None: halaman lanjutan seksi konteks untuk judul/kontrak/
+    lokasi/dst., halaman OPM/OTDR untuk redaman, dan halaman grounding.
+    """
+    pages = []
+    if any(fields.get(name) is None for name in CONTEXT_FIELDS):
+        context = _context_class(page_classes)
+        run = class_run(page_classes, context) if context else list(range(min(SUMMARY_CONTEXT_PAGES, len(page_classes))))
+        pages += run[1:]
+    if fields.get("redaman") is None:
+        pages += [i for i, cls in enumerate(page_classes) if cls in REDAMAN_CLASSES]
+    if fields.get("grounding") is None:
+        pages += [i for i, cls in enumerate(page_classes) if cls in GROUNDING_CLASSES]
+    return list(dict.fromkeys(pages))
+
+def extract_summary_fields(pages_text: List[str], page_classes: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Mengekstrak informasi utama dokumen (judul, kontrak, lokasi, pelaksana, dst.)
+    dari halaman yang sudah diklasifikasikan. Nilai yang tidak ditemukan bernilai None.
+    Teks kosong (halaman scan yang tidak di-OCR) tidak ikut dicari.
     """
     
     def find_text_by_class(target_classes: List[str]):
         for cls in target_classes:
-            try:
-                index = page_classes.index(cls)
-                return pages_text[index]
-            except ValueError:
-                continue
+            run = class_run(page_classes, cls)
+            if run:
+                return "\n".join(pages_text[i] for i in run if pages_text[i])
         return None
 
-    full_text = " ".join(pages_text)
+    full_text = " ".join(t for t in pages_text if t)
     cleaned_full_text = re.sub(r'\s+', ' ', full_text).strip()
 
     baut_text = find_text_by_class(['BAUT'])
     bact_text = find_text_by_class(['BACT'])
     laporan_ut_text = find_text_by_class(['LAPORAN_UT'])
-    opm_text = find_text_by_class(['FORM_OPM', 'FOTO_PENGUKURAN_OPM'])
+    opm_text = find_text_by_class(list(OPM_CLASSES))
+    grounding_text = " ".join(t for t in (find_text_by_class([cls]) for cls in GROUNDING_CLASSES) if t)
     
     main_context_text = baut_text or bact_text or laporan_ut_text or (pages_text[0] if pages_text else "")
 
@@ -30,37 +98,60 @@ def generate_summary(pages_text: List[str], page_classes: List[str]) -> str:
 
     # Judul
     judul_match = re.search(r'(BERITA ACARA UJI TERIMA|PROYEK|PEKERJAAN)(.{0,250})', main_context_text, re.IGNORECASE | re.DOTALL)
-    judul = re.sub(r'\s+', ' ', judul_match.group(0).strip()) if judul_match else "Judul dokumen tidak ditemukan."
 
     # Kontrak
     kontrak_match = re.search(r'(?:KONTRAK|SURAT PESANAN|SP)\s*(?:No\.?|Nomor)?\s*:?\s*(.*?)(?:\n|WITEL|PELAKSANA)', main_context_text, re.IGNORECASE | re.DOTALL)
-    kontrak = f"Kontrak No. {re.sub(r'<[^>]+>', '', kontrak_match.group(1)).strip()}" if kontrak_match else "Nomor kontrak tidak ditemukan."
 
     # Lokasi
     lokasi_match = re.search(r'LOKASI\s*:?\s*(.*?)(?:\n|PELAKSANA|WITEL)', main_context_text, re.IGNORECASE | re.DOTALL)
-    lokasi = re.sub(r'\s+', ' ', lokasi_match.group(1)).strip() if lokasi_match else "tidak disebutkan."
 
     # Pelaksana (Dinamis)
     pelaksana_match = re.search(r'PELAKSANA\s*:?\s*(.*?)(?:\n|TANGGAL|PADA HARI INI)', main_context_text, re.IGNORECASE | re.DOTALL)
-    pelaksana = re.sub(r'\s+', ' ', pelaksana_match.group(1)).strip() if pelaksana_match else "PT. Telkom Akses"
-    pemilik_pekerjaan = "PT. Telkom Indonesia, Tbk." # Ini biasanya tetap
 
     # Tanggal
     tanggal_match = re.search(r'(\d{1,2}\s*(?:Januari|Februari|Maret|April|Mei|Juni|Juli|Agustus|September|Oktober|November|Desember)\s*\d{4})', main_context_text, re.IGNORECASE)
-    tanggal = tanggal_match.group(0) if tanggal_match else "tidak disebutkan."
 
     # Hasil Redaman
     search_text_redaman = opm_text or cleaned_full_text
     redaman_match = re.search(r'redaman.*?(\d+[.,]\d+)\s*dB', search_text_redaman, re.IGNORECASE)
-    redaman = f"Hasil uji redaman: {redaman_match.group(1)} dB" if redaman_match else "Data redaman tidak tersedia."
     
     # Hasil Grounding
-    grounding_match = re.search(r'(\d+[.,]\d+)\s*Ohm', cleaned_full_text, re.IGNORECASE)
-    grounding = f"Pengukuran grounding: {grounding_match.group(1)} Ohm" if grounding_match else "Data grounding tidak tersedia."
+    grounding_pattern = r'(\d+[.,]\d+)\s*Ohm'
+    grounding_match = re.search(grounding_pattern, grounding_text, re.IGNORECASE) \
+        or re.search(grounding_pattern, cleaned_full_text, re.IGNORECASE)
     
     # Kesimpulan
     kesimpulan_match = re.search(r'(DITERIMA|OK|BAIK|LULUS|SESUAI)', main_context_text, re.IGNORECASE)
-    kesimpulan = f"Hasil pekerjaan dinyatakan <strong>{kesimpulan_match.group(1).upper()}</strong>." if kesimpulan_match else "Status pekerjaan tidak dinyatakan secara eksplisit."
+
+    return {
+        "judul": re.sub(r'\s+', ' ', judul_match.group(0).strip()) if judul_match else None,
+        "kontrak": re.sub(r'<[^>]+>', '', kontrak_match.group(1)).strip() if kontrak_match else None,
+        "lokasi": re.sub(r'\s+', ' ', lokasi_match.group(1)).strip() if lokasi_match else None,
+        "pelaksana": re.sub(r'\s+', ' ', pelaksana_match.group(1)).strip() if pelaksana_match else None,
+        "tanggal": tanggal_match.group(0) if tanggal_match else None,
+        "redaman": redaman_match.group(1) if redaman_match else None,
+        "grounding": grounding_match.group(1) if grounding_match else None,
+        "kesimpulan": kesimpulan_match.group(1).upper() if kesimpulan_match else None,
+    }
+
+def generate_summary(pages_text: List[str], page_classes: List[str], fields: Optional[Dict[str, Optional[str]]] = None) -> str:
+    """
+    Menghasilkan ringkasan dokumen dengan mencari informasi pada halaman yang sudah 
+    diklasifikasikan dan dengan pola Regex yang lebih baik.
+    `fields` dapat diisi hasil extract_summary_fields agar ekstraksi tidak diulang.
+    """
+    if fields is None:
+        fields = extract_summary_fields(pages_text, page_classes)
+
+    judul = fields["judul"] or "Judul dokumen tidak ditemukan."
+    kontrak = f"Kontrak No. {fields['kontrak']}" if fields["kontrak"] is not None else "Nomor kontrak tidak ditemukan."
+    lokasi = fields["lokasi"] if fields["lokasi"] is not None else "tidak disebutkan."
+    pelaksana = fields["pelaksana"] if fields["pelaksana"] is not None else "PT. Telkom Akses"
+    pemilik_pekerjaan = "PT. Telkom Indonesia, Tbk." # Ini biasanya tetap
+    tanggal = fields["tanggal"] or "tidak disebutkan."
+    redaman = f"Hasil uji redaman: {fields['redaman']} dB" if fields["redaman"] else "Data redaman tidak tersedia."
+    grounding = f"Pengukuran grounding: {fields['grounding']} Ohm" if fields["grounding"] else "Data grounding tidak tersedia."
+    kesimpulan = f"Hasil pekerjaan dinyatakan <strong>{fields['kesimpulan']}</strong>." if fields["kesimpulan"] else "Status pekerjaan tidak dinyatakan secara eksplisit."
 
     # --- Format HTML ---
     summary_html = f"""
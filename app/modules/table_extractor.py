@@ -1,14 +1,233 @@
 import cv2
-import pytesseract
 import fitz  # PyMuPDF
 import os
 import re
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+from .ocr_engine import get_engine, group_lines, ocr_available
+from .page_classifier import normalize_text
+
+# Ekstraksi tabel BoQ & form OPM langsung dari vektor PDF (deteksi tabel, garis,
+# dan posisi kata PyMuPDF). OCR hanya untuk area gambar (hasil scan) di halaman,
+# dirender ke memori tanpa file sementara.
+TABLE_CLASSES = {"BOQ_UT": "boq", "BOQ_CT": "boq", "FORM_OPM": "opm"}
+TABLE_OCR_DPI = int(os.getenv("TABLE_OCR_DPI", "200"))
+# Gambar yang lebih kecil dari ini (relatif luas halaman), mis. logo/stempel, tidak di-OCR
+MIN_IMAGE_REGION_RATIO = 0.05
+
+# Kata kunci header kolom, urut prioritas (kata tunggal dicocokkan sebagai awalan kata)
+COLUMN_KEYWORDS = {
+    "item": ("designator", "uraian", "item", "material", "nama barang", "pekerjaan", "deskripsi", "description", "odp", "port", "lokasi", "nama"),
+    "volume": ("volume", "vol", "qty", "quantity", "kuantitas", "jumlah"),
+    "unit": ("satuan", "sat", "unit", "uom"),
+    "db": ("db", "redaman", "loss", "hasil ukur", "power", "daya"),
+}
+UNITS = {"m", "meter", "mtr", "bh", "buah", "unit", "set", "ls", "lot", "pcs", "core", "titik", "btg", "batang", "roll", "ea"}
+NUMBER_RE = re.compile(r"^-?\d[\d.,]*$")
+DB_RE = re.compile(r"(-?\d+(?:[.,]\d+)?)\s*dBm?\b", re.IGNORECASE)
+
+OcrFn = Callable[[np.ndarray], str]
+
+
+def parse_number(text: Optional[str], thousands: bool = True) -> Optional[float]:
+    """
+    Angka format Indonesia/Inggris: "1.234,5" -> 1234.5, "0,25" -> 0.25, "12.5" -> 12.5.
+    Dengan thousands=True, "1.234" dibaca sebagai ribuan (volume BoQ).
+    """
+    if not text:
+        return None
+    match = re.search(r"-?\d[\d.,]*", text.replace(" ", ""))
+    if not match:
+        return None
+    s = match.group(0).rstrip(".,")
+    if "," in s and "." in s:
+        decimal = "," if s.rfind(",") > s.rfind(".") else "."
+        s = s.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    elif "," in s:
+        s = s.replace(",", ".") if s.count(",") == 1 else s.replace(",", "")
+    elif "." in s and thousands and all(len(part) == 3 for part in s.split(".")[1:]):
+        s = s.replace(".", "")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def _clean(cell) -> str:
+    return re.sub(r"\s+", " ", cell or "").strip()
+
+
+def _match_columns(header: List[str]) -> Dict[str, int]:
+    """Index kolom item/volume/unit/db berdasarkan teks header."""
+    normalized = [normalize_text(h or "") for h in header]
+    columns: Dict[str, int] = {}
+    for key, keywords in COLUMN_KEYWORDS.items():
+        for kw in keywords:
+            for idx, cell in enumerate(normalized):
+                if idx in columns.values():
+                    continue
+                hit = kw in cell if " " in kw else any(tok.startswith(kw) for tok in cell.split())
+                if hit:
+                    columns[key] = idx
+                    break
+            if key in columns:
+                break
+    return columns
+
+
+def _row_from_cells(cells: List[str], columns: Dict[str, int]) -> Optional[dict]:
+    def cell(key):
+        idx = columns.get(key)
+        return _clean(cells[idx]) if idx is not None and idx < len(cells) else ""
+
+    row = {
+        "item": cell("item") or None,
+        "volume": parse_number(cell("volume")),
+        "unit": cell("unit") or None,
+        "db": parse_number(cell("db"), thousands=False),
+    }
+    if row["volume"] is None and row["db"] is None:
+        return None  # baris judul, subtotal kosong, atau pemisah
+    return row
+
+
+def _rows_from_tables(page: "fitz.Page") -> List[dict]:
+    """Tabel bergaris/berstruktur yang dideteksi PyMuPDF (page.find_tables)."""
+    rows = []
+    try:
+        tables = page.find_tables().tables
+    except Exception:
+        return rows
+    for table in tables:
+        data = table.extract()
+        candidates = ([table.header.names] if table.header else []) + data[:3]
+        columns, header_idx = {}, -1
+        for idx, candidate in enumerate(candidates):
+            found = _match_columns(candidate)
+            if ("volume" in found or "db" in found) and len(found) > len(columns):
+                columns, header_idx = found, idx
+        if not columns:
+            continue
+        # Baris data dimulai setelah baris header; header "eksternal" PyMuPDF berada di luar `data`
+        if table.header and header_idx == 0:
+            start = 0 if table.header.external else 1
+        else:
+            start = header_idx - (1 if table.header else 0) + 1
+        for cells in data[start:]:
+            row = _row_from_cells([_clean(c) for c in cells], columns)
+            if row:
+                rows.append(row)
+    return rows
+
+
+def _boq_row_from_line(tokens: List[str]) -> Optional[dict]:
+    """'1 Kabel drop core 150 m' / 'Tiang besi buah 3' -> item, volume, satuan."""
+    for j, token in enumerate(tokens):
+        if token.lower().rstrip(".") not in UNITS:
+            continue
+        if j > 0 and NUMBER_RE.match(tokens[j - 1]):
+            volume, item_tokens = tokens[j - 1], tokens[:j - 1]
+        elif j + 1 < len(tokens) and NUMBER_RE.match(tokens[j + 1]):
+            volume, item_tokens = tokens[j + 1], tokens[:j]
+        else:
+            continue
+        if item_tokens and item_tokens[0].rstrip(".").isdigit():
+            item_tokens = item_tokens[1:]  # nomor urut baris
+        item = " ".join(item_tokens)
+        if re.search(r"[A-Za-z]", item):
+            return {"item": item, "volume": parse_number(volume), "unit": token, "db": None}
+    return None
+
+
+def _opm_row_from_line(line: str) -> Optional[dict]:
+    match = DB_RE.search(line)
+    if not match:
+        return None
+    item = re.sub(r"^\d+[.)]?\s+", "", line[:match.start()].strip())
+    return {"item": item or None, "volume": None, "unit": None, "db": parse_number(match.group(1), thousands=False)}
+
+
+def rows_from_lines(lines: List[str], kind: str) -> List[dict]:
+    rows = []
+    for line in lines:
+        row = _opm_row_from_line(line) if kind == "opm" else _boq_row_from_line(line.split())
+        if row:
+            rows.append(row)
+    return rows
+
+
+def _word_lines(page: "fitz.Page", clip: Optional["fitz.Rect"] = None) -> List[str]:
+    """Kata di halaman dikelompokkan per baris visual (y berdekatan), urut kiri ke kanan."""
+    words = page.get_text("words", clip=clip)
+    return group_lines([((w[0], w[1], w[2], w[3]), w[4]) for w in words])
+
+
+def _image_regions(page: "fitz.Page") -> List["fitz.Rect"]:
+    page_area = abs(page.rect)
+    regions = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if abs(rect) >= MIN_IMAGE_REGION_RATIO * page_area:
+            regions.append(rect)
+    return regions
+
+
+def pixmap_to_gray(pix: "fitz.Pixmap") -> np.ndarray:
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.stride)[:, :pix.w]
+    return np.ascontiguousarray(gray)
+
+
+def ocr_array(gray: np.ndarray) -> str:
+    """OCR gambar di memori dengan engine call-site "table"; satu baris visual per baris teks."""
+    return "\n".join(get_engine("table").read_lines(gray))
+
+
+def extract_page_table(page: "fitz.Page", kind: str, ocr: Optional[OcrFn] = None) -> dict:
+    """
+    Baris terstruktur {item, volume, unit, db} dari satu halaman BoQ ("boq") atau OPM ("opm").
+    Urutan: tabel terdeteksi -> baris kata vektor -> OCR area gambar (jika ada fungsi OCR).
+    """
+    rows = _rows_from_tables(page)
+    if rows:
+        return {"rows": rows, "source": "vector"}
+    rows = rows_from_lines(_word_lines(page), kind)
+    if rows:
+        return {"rows": rows, "source": "words"}
+
+    ocr = ocr or (ocr_array if ocr_available() else None)
+    if ocr is None:
+        return {"rows": [], "source": None}
+    regions = _image_regions(page) or ([page.rect] if not page.get_text("text").strip() else [])
+    for rect in regions:
+        pix = page.get_pixmap(clip=rect, dpi=TABLE_OCR_DPI, colorspace=fitz.csGRAY, alpha=False)
+        rows.extend(rows_from_lines(ocr(pixmap_to_gray(pix)).splitlines(), kind))
+    return {"rows": rows, "source": "ocr" if rows else None}
+
+
+def extract_document_tables(doc: "fitz.Document", page_classes: List[Optional[str]], ocr: Optional[OcrFn] = None) -> Dict[str, List[dict]]:
+    """
+    Tabel seluruh halaman BoQ/OPM dokumen: {"boq": [...], "opm": [...]}; setiap baris
+    diberi nomor halaman. page_classes berisi None untuk halaman yang dilewati.
+    """
+    tables: Dict[str, List[dict]] = {"boq": [], "opm": []}
+    for index, page_class in enumerate(page_classes):
+        kind = TABLE_CLASSES.get(page_class)
+        if kind is None:
+            continue
+        try:
+            result = extract_page_table(doc.load_page(index), kind, ocr)
+        except Exception as e:
+            print(f"⚠️ Gagal mengekstrak tabel halaman {index + 1}: {e}")
+            continue
+        tables[kind].extend({**row, "page": index + 1, "source": result["source"]} for row in result["rows"])
+    return tables
+
 
 def ocr_image(image_path: str) -> str:
     img = cv2.imread(image_path)
-    gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) 
-    _, binary_img = cv2.threshold(gray_img, 150, 255, cv2.THRESH_BINARY)
-    return pytesseract.image_to_string(binary_img, lang='ind')
+    gray_img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return ocr_array(gray_img)
 
 def extract_data_from_document(doc_path: str) -> dict:
     raw_text = ""
@@ -21,11 +240,9 @@ def extract_data_from_document(doc_path: str) -> dict:
             for i, page in enumerate(doc):
                 text_from_page = page.get_text("text")
                 if not text_from_page.strip():
-                    pix = page.get_pixmap()
-                    temp_image_path = f"temp_page_{i+1}.png"
-                    pix.save(temp_image_path)
-                    text_from_page = ocr_image(temp_image_path)
-                    os.remove(temp_image_path)
+                    # Render ke memori, tanpa file temp_page_*.png di direktori kerja
+                    pix = page.get_pixmap(colorspace=fitz.csGRAY, alpha=False)
+                    text_from_page = ocr_array(pixmap_to_gray(pix))
                 full_text_from_pdf += text_from_page + "\n"
             raw_text = full_text_from_pdf
             doc.close()
@@ -38,7 +255,7 @@ def extract_data_from_document(doc_path: str) -> dict:
 
         pola_tanggal = re.search(r"Tanggal: (.*)", raw_text, re.IGNORECASE)
         if pola_tanggal: extracted_data['tanggal_dokumen'] = pola_tanggal.group(1).strip()
-            
+
         pola_nama = re.search(r"Nama: (.*)", raw_text, re.IGNORECASE)
         if pola_nama:
             nama_ditemukan = pola_nama.group(1).strip()
@@ -48,4 +265,4 @@ def extract_data_from_document(doc_path: str) -> dict:
 
     except Exception as e:
         print(f"[ERROR] Gagal memproses dokumen: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,113 @@
+import os
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .ocr_policy import lowest_threshold_for_precision
+from .page_classifier import normalize_text
+
+# Classifier teks ringan (TF-IDF char n-gram + kepala linear) untuk halaman yang
+# punya lapisan teks PDF atau teks OCR. Jauh lebih murah dari CNN; CNN hanya
+# dipakai untuk halaman tanpa teks atau prediksi teks yang margin-nya tipis.
+# Model dilatih dengan `python train_text_model.py` dari folder pdf_sources/.
+try:
+    import joblib
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TEXT_MODEL_PATH = os.getenv("TEXT_CLASSIFIER_PATH", os.path.join(BASE_DIR, "text_classifier.joblib"))
+# Teks (setelah normalisasi) lebih pendek dari ini dianggap tidak cukup informatif
+MIN_TEXT_CHARS = int(os.getenv("TEXT_CLASSIFIER_MIN_CHARS", "40"))
+# Presisi minimum prediksi teks yang diterima tanpa CNN, dipakai saat fit ambang margin
+TEXT_TARGET_PRECISION = 0.98
+
+
+class TextModel(NamedTuple):
+    pipeline: object
+    class_names: List[str]
+    # Selisih probabilitas kelas teratas dan kedua; di bawah ini CNN tetap dikonsultasikan
+    min_margin: float
+
+
+_model: Optional[TextModel] = None
+_load_attempted = False
+
+
+def _load_model() -> Optional[TextModel]:
+    global _model, _load_attempted
+    if _load_attempted:
+        return _model
+    _load_attempted = True
+    if not SKLEARN_AVAILABLE or not os.path.exists(TEXT_MODEL_PATH):
+        return None
+    try:
+        bundle = joblib.load(TEXT_MODEL_PATH)
+        _model = TextModel(bundle["pipeline"], bundle["class_names"], float(bundle["min_margin"]))
+        print(f"✅ Classifier teks dimuat ({len(_model.class_names)} kelas, margin minimum {_model.min_margin:.2f}).")
+    except Exception as e:
+        print(f"❌ Gagal memuat classifier teks: {e}")
+    return _model
+
+
+def usable_text(text: Optional[str]) -> bool:
+    return bool(text) and len(normalize_text(text)) >= MIN_TEXT_CHARS
+
+
+def predict_text_class(text: str) -> Optional[Tuple[str, float, bool]]:
+    """
+    (kelas, margin, yakin?) untuk satu halaman, atau None jika model teks tidak
+    tersedia / teks terlalu sedikit. `yakin` berarti margin >= ambang hasil training.
+    """
+    model = _load_model()
+    if model is None or not usable_text(text):
+        return None
+    probs = model.pipeline.predict_proba([text])[0]
+    top2 = np.argsort(probs)[-2:] if len(probs) > 1 else np.array([0, 0])
+    margin = float(probs[top2[-1]] - (probs[top2[0]] if len(probs) > 1 else 0.0))
+    return model.class_names[int(top2[-1])], margin, margin >= model.min_margin
+
+
+def build_pipeline():
+    return make_pipeline(
+        TfidfVectorizer(analyzer="char_wb", ngram_range=(3, 5), preprocessor=normalize_text,
+                        sublinear_tf=True, min_df=2, max_features=200000, dtype=np.float32),
+        LogisticRegression(max_iter=2000, C=10.0),
+    )
+
+
+def fit_text_classifier(train_texts: List[str], train_labels: List[str],
+                        val_texts: List[str], val_labels: List[str],
+                        target_precision: float = TEXT_TARGET_PRECISION) -> Tuple[dict, dict]:
+    """
+    Melatih pipeline TF-IDF + regresi logistik lalu mencari margin terendah yang
+    presisinya di split validasi masih >= target. Mengembalikan (bundle, laporan);
+    bundle siap disimpan dengan joblib.dump ke TEXT_MODEL_PATH.
+    """
+    pipeline = build_pipeline()
+    pipeline.fit(train_texts, train_labels)
+    class_names = [str(c) for c in pipeline.classes_]
+
+    report = {"train_pages": len(train_texts), "validation_pages": len(val_texts), "target_precision": target_precision}
+    min_margin = 1.0  # tanpa data validasi: jangan pernah melewati CNN
+    if val_texts:
+        probs = pipeline.predict_proba(val_texts)
+        ordered = np.sort(probs, axis=1)
+        margins = ordered[:, -1] - (ordered[:, -2] if probs.shape[1] > 1 else 0.0)
+        correct = np.array([class_names[i] for i in probs.argmax(axis=1)]) == np.asarray(val_labels)
+        fitted = lowest_threshold_for_precision(margins, correct, target_precision)
+        if fitted is not None:
+            min_margin = fitted
+        accepted = margins >= min_margin
+        report.update({
+            "accuracy": round(float(correct.mean()), 4),
+            "bypass_rate": round(float(accepted.mean()), 4),
+            "accepted_accuracy": round(float(correct[accepted].mean()), 4) if accepted.any() else None,
+        })
+    report["min_margin"] = round(float(min_margin), 4)
+    bundle = {"pipeline": pipeline, "class_names": class_names, "min_margin": float(min_margin)}
+    return bundle, report
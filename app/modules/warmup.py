@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from typing import Dict
+
+import cv2
+import numpy as np
+
+from . import dl_classifier
+from .ocr_engine import CALL_SITES, get_engine, ocr_available
+from .text_classifier import predict_text_class
+
+# Pemanasan saat startup: model CNN (forward pass dummy), classifier teks, dan
+# reader OCR dimuat sebelum request pertama, sehingga user pertama tidak
+# menanggung waktu muat bobot / tracing graph. Berjalan di thread latar; endpoint
+# /ready mengembalikan 503 sampai selesai agar load balancer menunggu, dan tetap
+# 503 jika langkah wajib (classifier, OCR) gagal: worker itu tidak bisa memverifikasi.
+# OCR opsional: tanpa engine terpasang langkahnya dilewati (pipeline tetap jalan
+# tanpa OCR), dan hanya dianggap gagal jika engine terpasang tapi error saat dimuat.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+REQUIRED_STEPS = ("classifier", "ocr")
+
+_state: Dict[str, object] = {"finished": not WARMUP_ENABLED, "started": False, "steps": {}, "errors": {}, "skipped": {}}
+_lock = threading.Lock()
+
+
+
+class StepSkipped(Exception):
+    """Langkah tidak relevan di worker ini (mis. tidak ada engine OCR terpasang)."""
+
+
+WARMUP_TEXT = "BERITA ACARA UJI TERIMA pekerjaan pembangunan jaringan fiber optik"
+
+
+def _synthetic_text_image() -> np.ndarray:
+    """Gambar putih berisi satu baris teks hitam, cukup untuk memicu deteksi + rekognisi OCR."""
+    img = np.full((80, 640, 3), 255, dtype=np.uint8)
+    cv2.putText(img, "UJI TERIMA 123", (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 0), 3)
+    return img
+
+
+def _warm_ocr():
+    if not ocr_available():
+        raise StepSkipped("tidak ada engine OCR terpasang")
+    image = _synthetic_text_image()
+    warmed = set()
+    for site in CALL_SITES:
+        engine = get_engine(site)
+        if engine.name not in warmed:
+            engine.read_text(image)
+            warmed.add(engine.name)
+    return ", ".join(sorted(warmed))
+
+
+STEPS = (
+    ("classifier", lambda: dl_classifier.warmup()),
+    ("text_classifier", lambda: predict_text_class(WARMUP_TEXT) is not None),
+    ("ocr", _warm_ocr),
+)
+
+
+def run_warmup():
+    """
+    Menjalankan semua langkah pemanasan; kegagalan satu langkah dicatat dan tidak
+    menghentikan yang lain. Langkah wajib yang mengembalikan None (model/engine
+    tidak termuat) dicatat sebagai error; langkah yang dilewati tidak.
+    """
+    total_start = time.perf_counter()
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            result = step()
+            _state["steps"][name] = {"seconds": round(time.perf_counter() - start, 3), "result": result}
+            if result is None and name in REQUIRED_STEPS:
+                _state["errors"][name] = "tidak termuat"
+                print(f"⚠️ Warm-up '{name}': model/engine tidak termuat.")
+        except StepSkipped as e:
+            _state["skipped"][name] = str(e)
+            print(f"ℹ️ Warm-up '{name}' dilewati: {e}")
+        except Exception as e:
+            _state["errors"][name] = str(e)
+            print(f"⚠️ Warm-up '{name}' gagal: {e}")
+    _state["seconds"] = round(time.perf_counter() - total_start, 3)
+    _state["finished"] = True
+    print(f"🔥 Warm-up selesai dalam {_state['seconds']} detik: "
+          + ", ".join(f"{n} {s['seconds']}s" for n, s in _state["steps"].items()))
+
+
+def start_warmup():
+    """Memulai warm-up di thread latar (sekali per proses)."""
+    with _lock:
+        if _state["started"] or not WARMUP_ENABLED:
+            return
+        _state["started"] = True
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
+
+
+def readiness() -> dict:
+    """ready = warm-up selesai dan tidak ada langkah wajib yang gagal."""
+    errors = dict(_state["errors"])
+    ready = _state["finished"] and not any(name in errors for name in REQUIRED_STEPS)
+    return {"ready": ready, "finished": _state["finished"], "steps": dict(_state["steps"]), "errors": errors,
+            "skipped": dict(_state["skipped"]), "seconds": _state.get("seconds")}
@@ -0,0 +1,180 @@
+import html
+import os
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text, or_
+from sqlalchemy.orm import Session, load_only
+
+from . import models
+from .database import engine, IS_SQLITE
+
+# Indeks pencarian full-text (SQLite FTS5) untuk riwayat verifikasi.
+# rowid tabel FTS = Dokumen.id, sehingga hasil bisa di-join langsung ke tabel dokumen.
+# Kolom `owner` berisi token pemilik "u<user_id>" dan ikut di ekspresi MATCH, sehingga
+# FTS hanya menelusuri dokumen milik user itu: biaya query mengikuti jumlah dokumen
+# user, bukan seluruh korpus, untuk kata umum seperti "BAUT" atau nama kota.
+FTS_TABLE = "dokumen_fts"
+FTS_COLUMNS = ("nama_dokumen", "judul", "kontrak", "lokasi", "pelaksana", "isi")
+OWNER_COLUMN = "owner"
+# Teks halaman hasil OCR bisa sangat panjang; batasi agar ukuran indeks terkendali.
+SEARCH_TEXT_MAX_CHARS = int(os.getenv("SEARCH_TEXT_MAX_CHARS", "50000"))
+
+_fts_available = None
+
+
+def fts_available() -> bool:
+    """True jika database adalah SQLite dengan modul FTS5 tersedia."""
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = False
+        if IS_SQLITE:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS temp._fts5_probe USING fts5(x)"))
+                    conn.execute(text("DROP TABLE temp._fts5_probe"))
+                _fts_available = True
+            except Exception as e:
+                print(f"⚠️ FTS5 tidak tersedia, pencarian memakai LIKE: {e}")
+    return _fts_available
+
+
+def owner_token(user_id: int) -> str:
+    return f"u{user_id}"
+
+
+def _create_fts_table(conn, name: str):
+    # owner diletakkan terakhir: snippet() memilih kolom pertama saat skor seri,
+    # sehingga cuplikan tidak pernah menampilkan token pemilik
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {name} USING fts5("
+        f"{', '.join(FTS_COLUMNS)}, {OWNER_COLUMN}, "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+
+
+def init_search_index():
+    """
+    Membuat tabel FTS (jika belum ada) dan mengisi ulang dari riwayat lama sekali saja.
+    Indeks format lama (kolom user_id UNINDEXED) disalin ke format per-pemilik.
+    """
+    if not fts_available():
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:n"), {"n": FTS_TABLE}).first()
+        if exists:
+            columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({FTS_TABLE})"))}
+            if OWNER_COLUMN in columns:
+                return
+            cols = ", ".join(FTS_COLUMNS)
+            _create_fts_table(conn, f"{FTS_TABLE}_baru")
+            conn.execute(text(
+                f"INSERT INTO {FTS_TABLE}_baru (rowid, {cols}, {OWNER_COLUMN}) "
+                f"SELECT rowid, {cols}, 'u' || user_id FROM {FTS_TABLE}"
+            ))
+            conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+            conn.execute(text(f"ALTER TABLE {FTS_TABLE}_baru RENAME TO {FTS_TABLE}"))
+            print("✅ Indeks pencarian dimigrasi ke kolom pemilik.")
+            return
+        _create_fts_table(conn, FTS_TABLE)
+        # Dokumen lama hanya punya ringkasan HTML; indeks nama + teks ringkasannya.
+        rows = conn.execute(text("SELECT id, user_id, nama_dokumen, ringkasan FROM dokumen")).all()
+        for row in rows:
+            conn.execute(_insert_sql(), {
+                "id": row.id, "owner": owner_token(row.user_id), "nama_dokumen": row.nama_dokumen or "",
+                "judul": "", "kontrak": "", "lokasi": "", "pelaksana": "",
+                "isi": re.sub(r"<[^>]+>", " ", row.ringkasan or ""),
+            })
+        if rows:
+            print(f"✅ Indeks pencarian dibuat untuk {len(rows)} dokumen lama.")
+
+
+def _insert_sql():
+    cols = ", ".join(FTS_COLUMNS)
+    params = ", ".join(f":{c}" for c in FTS_COLUMNS)
+    return text(f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, {cols}, {OWNER_COLUMN}) VALUES (:id, {params}, :owner)")
+
+
+def index_dokumen(db: Session, dokumen: models.Dokumen, fields: Optional[Dict[str, Optional[str]]], pages_text: List[str]):
+    """Menambahkan satu Dokumen ke indeks. Dipanggil dalam transaksi yang sama dengan insert-nya."""
+    if not fts_available():
+        return
+    fields = fields or {}
+    isi = " ".join(t for t in pages_text if t)[:SEARCH_TEXT_MAX_CHARS]
+    db.execute(_insert_sql(), {
+        "id": dokumen.id, "owner": owner_token(dokumen.user_id), "nama_dokumen": dokumen.nama_dokumen or "",
+        "judul": fields.get("judul") or "", "kontrak": fields.get("kontrak") or "",
+        "lokasi": fields.get("lokasi") or "", "pelaksana": fields.get("pelaksana") or "",
+        "isi": isi,
+    })
+
+
+def remove_dokumen(db: Session, dokumen_id: int):
+    if not fts_available():
+        return
+    db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {"id": dokumen_id})
+
+
+def build_match_query(query: str) -> str:
+    """
+    Mengubah input bebas user menjadi ekspresi MATCH FTS5 yang aman.
+    Setiap kata menjadi frasa ber-prefix, misal `K.TEL.12 makas` -> `"K TEL 12"* AND "makas"*`,
+    sehingga tanda baca di nomor kontrak tidak memicu syntax error.
+    """
+    phrases = []
+    for term in query.split():
+        tokens = re.findall(r"\w+", term)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"*')
+    return " AND ".join(phrases)
+
+
+def scoped_match(user_id: int, match: str) -> str:
+    """Ekspresi MATCH yang dibatasi ke dokumen milik user; kata user hanya dicari di kolom isi."""
+    return f'{OWNER_COLUMN}:"{owner_token(user_id)}" AND {{{" ".join(FTS_COLUMNS)}}}: ({match})'
+
+
+def search_dokumen(db: Session, user_id: int, query: str, limit: int = 20, offset: int = 0):
+    """
+    Mencari riwayat milik user, diurutkan berdasarkan relevansi (bm25).
+    Mengembalikan (list of (Dokumen, snippet), has_more).
+    """
+    match = build_match_query(query)
+    if not match:
+        return [], False
+
+    if not fts_available():
+        # Fallback untuk database selain SQLite: pencocokan LIKE sederhana.
+        like = f"%{query.strip()}%"
+        rows = (
+            db.query(models.Dokumen)
+            .filter(models.Dokumen.user_id == user_id)
+            .filter(or_(models.Dokumen.nama_dokumen.ilike(like), models.Dokumen.ringkasan.ilike(like)))
+            .order_by(models.Dokumen.timestamp.desc())
+            .offset(offset).limit(limit + 1).all()
+        )
+        return [(d, None) for d in rows[:limit]], len(rows) > limit
+
+    hits = db.execute(text(
+        f"SELECT rowid AS id, snippet({FTS_TABLE}, -1, char(2), char(3), '…', 12) AS snippet "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match "
+        f"ORDER BY bm25({FTS_TABLE}, 2.0, 3.0, 5.0, 3.0, 3.0, 1.0, 0.0) LIMIT :limit OFFSET :offset"
+    ), {"match": scoped_match(user_id, match), "limit": limit + 1, "offset": offset}).all()
+
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    if not hits:
+        return [], False
+
+    dokumen_by_id = {
+        d.id: d for d in db.query(models.Dokumen)
+        .options(load_only(models.Dokumen.id, models.Dokumen.nama_dokumen, models.Dokumen.tipe_dokumen,
+                           models.Dokumen.status, models.Dokumen.skor, models.Dokumen.timestamp))
+        .filter(models.Dokumen.id.in_([h.id for h in hits]), models.Dokumen.user_id == user_id)
+    }
+    return [(dokumen_by_id[h.id], _render_snippet(h.snippet)) for h in hits if h.id in dokumen_by_id], has_more
+
+
+def _render_snippet(snippet: str) -> str:
+    """Escape teks dokumen (hasil OCR) lalu ubah penanda match menjadi <mark>."""
+    return html.escape(snippet or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import SessionLocal
+from .metrics import STORAGE_GC_DELETED_TOTAL, STORAGE_UPLOADS_TOTAL
+
+# Penyimpanan PDF berbasis isi (content-addressed): file disimpan sekali per
+# SHA-256 di <STORAGE_DIR>/ab/cd/<sha256>.pdf, sehingga unggahan PDF yang sama
+# tidak menambah disk, dan tiap direktori shard tetap kecil berapa pun jumlah
+# riwayatnya. Referensi dihitung dari baris Dokumen (kolom content_hash); object
+# yang tidak dirujuk lagi dibuang oleh GC latar setelah masa tenggang.
+#
+#   DOCUMENT_STORAGE_DIR  root penyimpanan (default app/dokumen_tersimpan)
+#   STORAGE_GC_INTERVAL   detik antar sweep GC; 0 = GC latar mati
+#   STORAGE_GC_GRACE      umur minimum (detik, dari mtime) object/file sementara
+#                         sebelum boleh dihapus; harus > durasi verifikasi terlama,
+#                         karena object baru belum punya baris Dokumen selama diproses
+BASE_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STORAGE_DIR = os.getenv("DOCUMENT_STORAGE_DIR", os.path.join(BASE_APP_DIR, "dokumen_tersimpan"))
+STORAGE_GC_INTERVAL = float(os.getenv("STORAGE_GC_INTERVAL", "3600"))
+STORAGE_GC_GRACE = float(os.getenv("STORAGE_GC_GRACE", "3600"))
+
+TMP_DIR = os.path.join(STORAGE_DIR, "tmp")
+OBJECT_SUFFIX = ".pdf"
+SHARD_DEPTH = 2  # ab/cd/ -> 65536 direktori; cukup datar untuk jutaan object
+CHUNK_SIZE = 1024 * 1024
+GC_QUERY_BATCH = 500
+
+_gc_started = False
+_gc_lock = threading.Lock()
+
+
+def is_digest(value: Optional[str]) -> bool:
+    return bool(value) and len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def object_path(digest: str) -> str:
+    shards = [digest[2 * i:2 * i + 2] for i in range(SHARD_DEPTH)]
+    return os.path.join(STORAGE_DIR, *shards, digest + OBJECT_SUFFIX)
+
+
+def store_upload(fileobj: BinaryIO) -> Tuple[str, str]:
+    """
+    Menyalin unggahan ke file sementara sambil menghitung SHA-256, lalu
+    memindahkannya secara atomik ke path object. Mengembalikan (digest, path).
+    Jika object sudah ada, isinya identik: file sementara dibuang dan mtime
+    object diperbarui supaya GC tidak menghapusnya selama verifikasi berjalan.
+    """
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, f"{uuid.uuid4().hex}.part")
+    sha = hashlib.sha256()
+    try:
+        with open(tmp_path, "wb") as out:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                sha.update(chunk)
+                out.write(chunk)
+        digest = sha.hexdigest()
+        path = object_path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+            os.remove(tmp_path)
+            STORAGE_UPLOADS_TOTAL.inc(result="deduplicated")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            STORAGE_UPLOADS_TOTAL.inc(result="stored")
+        return digest, path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def reference_count(db: Session, digest: str) -> int:
+    return db.scalar(select(func.count()).select_from(models.Dokumen).where(models.Dokumen.content_hash == digest))
+
+
+def _remove_if_stale(path: str, now: float) -> bool:
+    """Hapus file jika mtime-nya lebih tua dari masa tenggang (dicek ulang tepat sebelum hapus)."""
+    try:
+        if now - os.stat(path).st_mtime < STORAGE_GC_GRACE:
+            return False
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def release(db: Session, digest: Optional[str]) -> bool:
+    """
+    Dipanggil setelah baris Dokumen dihapus & di-commit: hapus object jika tidak
+    ada lagi yang merujuk. Object yang baru diunggah/dipakai (masih dalam masa
+    tenggang) dibiarkan untuk GC.
+    """
+    if not is_digest(digest) or reference_count(db, digest) > 0:
+        return False
+    removed = _remove_if_stale(object_path(digest), time.time())
+    if removed:
+        STORAGE_GC_DELETED_TOTAL.inc(kind="object")
+        print(f"🗑️ Object dokumen dihapus (tanpa referensi): {digest}")
+    return removed
+
+
+def _iter_objects() -> Iterable[Tuple[str, str]]:
+    """(digest, path) untuk semua object di direktori shard; file lama di root diabaikan."""
+    def walk(directory: str, depth: int):
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if depth < SHARD_DEPTH:
+                if entry.is_dir() and len(entry.name) == 2:
+                    yield from walk(entry.path, depth + 1)
+            elif entry.is_file() and entry.name.endswith(OBJECT_SUFFIX):
+                digest = entry.name[:-len(OBJECT_SUFFIX)]
+                if is_digest(digest):
+                    yield digest, entry.path
+    yield from walk(STORAGE_DIR, 0)
+
+
+def _referenced(db: Session, digests) -> set:
+    return set(db.scalars(select(models.Dokumen.content_hash).where(models.Dokumen.content_hash.in_(digests)).distinct()))
+
+
+def collect_garbage(db: Session) -> Dict[str, int]:
+    """
+    Satu sweep GC: hapus object tanpa baris Dokumen yang merujuk dan file
+    sementara sisa unggahan yang gagal, selama keduanya lebih tua dari masa tenggang.
+    """
+    now = time.time()
+    stats = {"objects": 0, "deleted": 0, "tmp_deleted": 0, "bytes_freed": 0}
+    batch = {}
+
+    def sweep_batch():
+        referenced = _referenced(db, list(batch))
+        for digest, (path, size) in batch.items():
+            if digest not in referenced and _remove_if_stale(path, now):
+                stats["deleted"] += 1
+                stats["bytes_freed"] += size
+        batch.clear()
+
+    for digest, path in _iter_objects():
+        stats["objects"] += 1
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if now - stat.st_mtime >= STORAGE_GC_GRACE:
+            batch[digest] = (path, stat.st_size)
+        if len(batch) >= GC_QUERY_BATCH:
+            sweep_batch()
+    if batch:
+        sweep_batch()
+
+    if os.path.isdir(TMP_DIR):
+        for entry in os.scandir(TMP_DIR):
+            if entry.is_file() and _remove_if_stale(entry.path, now):
+                stats["tmp_deleted"] += 1
+
+    STORAGE_GC_DELETED_TOTAL.inc(stats["deleted"], kind="object")
+    STORAGE_GC_DELETED_TOTAL.inc(stats["tmp_deleted"], kind="tmp")
+    return stats
+
+
+def _gc_loop():
+    while True:
+        time.sleep(STORAGE_GC_INTERVAL)
+        try:
+            with SessionLocal() as db:
+                stats = collect_garbage(db)
+            if stats["deleted"] or stats["tmp_deleted"]:
+                print(f"🧹 GC penyimpanan: {stats['deleted']} object ({stats['bytes_freed'] / 1e6:.1f} MB) "
+                      f"dan {stats['tmp_deleted']} file sementara dihapus dari {stats['objects']} object.")
+        except Exception as e:
+            print(f"⚠️ GC penyimpanan gagal: {e}")
+
+
+def start_gc():
+    """Memulai sweeper GC di thread latar (sekali per proses). Sweep idempoten, aman di banyak worker."""
+    global _gc_started
+    with _gc_lock:
+        if _gc_started or STORAGE_GC_INTERVAL <= 0:
+            return
+        _gc_started = True
+    threading.Thread(target=_gc_loop, name="storage-gc", daemon=True).start()
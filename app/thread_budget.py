@@ -0,0 +1,178 @@
+import os
+import tempfile
+from typing import List, Optional
+
+# Anggaran thread CPU per proses worker. TensorFlow (classifier), PyTorch (EasyOCR)
+# dan OpenCV (deteksi tanda tangan) masing-masing membuat thread pool seukuran
+# semua core; dengan beberapa worker/verifikasi bersamaan, mesin jadi oversubscribed.
+# apply_thread_env() dipanggil paling awal (sebelum numpy/cv2/fitz diimpor) karena
+# OpenMP/BLAS membaca env saat dimuat; apply_thread_budget() sekali saat worker mulai,
+# SEBELUM TF/torch dipakai.
+#
+#   WEB_CONCURRENCY   jumlah proses worker (sama dengan --workers uvicorn/gunicorn)
+#   WORKER_THREADS    thread per worker; 0 = jumlah CPU / WEB_CONCURRENCY
+#   TF_INTER_OP_THREADS, TORCH_THREADS, CV2_THREADS  override per pustaka (opsional)
+#   CPU_AFFINITY      "false" (default), "auto" (tiap worker dapat blok core sendiri),
+#                     atau daftar eksplisit mis. "0-3,8"
+# Pembagian N worker x M thread yang optimal diukur dengan benchmarks/bench_threads.py.
+THREAD_BUDGET_ENABLED = os.getenv("THREAD_BUDGET", "true").lower() in ("1", "true", "yes")
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "0"))
+CPU_AFFINITY = os.getenv("CPU_AFFINITY", "false").lower()
+
+# Lock slot worker untuk CPU_AFFINITY=auto; tetap terbuka selama proses hidup
+_slot_lock = None
+_applied: Optional[dict] = None
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """"0-3,8" -> [0, 1, 2, 3, 8]"""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def _claim_worker_slot(n_workers: int) -> Optional[int]:
+    """Nomor slot worker unik (0..n-1) lewat file lock; None jika tidak didukung/semua terpakai."""
+    global _slot_lock
+    try:
+        import fcntl
+    except ImportError:
+        return None
+    for slot in range(n_workers):
+        path = os.path.join(tempfile.gettempdir(), f"verifikasi-worker-{os.getuid()}-{slot}.lock")
+        handle = open(path, "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            continue
+        _slot_lock = handle
+        return slot
+    return None
+
+
+def _resolve_affinity(threads: int, cpus: List[int]) -> Optional[List[int]]:
+    if CPU_AFFINITY in ("", "0", "false", "no"):
+        return None
+    if CPU_AFFINITY == "auto":
+        slot = _claim_worker_slot(WEB_CONCURRENCY)
+        if slot is None:
+            return None
+        # Jika N x M melebihi jumlah CPU, blok berputar kembali ke core awal
+        return sorted({cpus[(slot * threads + k) % len(cpus)] for k in range(threads)})
+    return parse_cpu_list(CPU_AFFINITY)
+
+
+def _worker_threads(cpus: List[int]) -> int:
+    threads = WORKER_THREADS or max(1, len(cpus) // WEB_CONCURRENCY)
+    if CPU_AFFINITY not in ("", "0", "false", "no", "auto"):
+        threads = min(threads, len(parse_cpu_list(CPU_AFFINITY)) or threads)
+    return threads
+
+
+def apply_thread_env() -> Optional[int]:
+    """
+    Mengisi OMP/MKL/OpenBLAS_NUM_THREADS (tanpa menimpa nilai operator). Harus
+    dipanggil sebelum numpy/cv2/fitz diimpor; pool yang sudah termuat dibatasi
+    belakangan oleh apply_thread_budget() lewat threadpoolctl.
+    """
+    if not THREAD_BUDGET_ENABLED:
+        return None
+    threads = _worker_threads(available_cpus())
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, str(threads))
+    return threads
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def apply_thread_budget() -> dict:
+    """
+    Mengatur affinity CPU (opsional) dan ukuran thread pool TF, torch, OpenCV, serta
+    OpenMP/BLAS untuk proses ini. Aman dipanggil berulang; hanya panggilan pertama berlaku.
+    """
+    global _applied
+    if _applied is not None:
+        return _applied
+    if not THREAD_BUDGET_ENABLED:
+        _applied = {"enabled": False}
+        return _applied
+
+    cpus = available_cpus()
+    threads = _worker_threads(cpus)
+    affinity = _resolve_affinity(threads, cpus)
+    if affinity and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, affinity)
+            threads = min(threads, len(affinity))
+        except OSError as e:
+            print(f"⚠️ Gagal mengatur CPU affinity {affinity}: {e}")
+            affinity = None
+
+    budget = {
+        "enabled": True,
+        "workers": WEB_CONCURRENCY,
+        "threads": threads,
+        "tf_intra_op": threads,
+        "tf_inter_op": _env_int("TF_INTER_OP_THREADS", min(2, threads)),
+        "torch": _env_int("TORCH_THREADS", threads),
+        "cv2": _env_int("CV2_THREADS", threads),
+        "affinity": affinity,
+    }
+
+    # Env OpenMP/BLAS idealnya sudah diisi apply_thread_env(); untuk pustaka yang
+    # terlanjur dimuat (numpy/OpenBLAS lewat cv2, dll.) pool-nya dibatasi threadpoolctl.
+    apply_thread_env()
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=_env_int("OMP_NUM_THREADS", threads))
+    except ImportError:
+        pass
+
+    try:
+        import cv2
+        cv2.setNumThreads(budget["cv2"])
+    except ImportError:
+        pass
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(budget["tf_intra_op"])
+        tf.config.threading.set_inter_op_parallelism_threads(budget["tf_inter_op"])
+    except ImportError:
+        pass
+    except RuntimeError as e:
+        # Runtime TF sudah terinisialisasi sebelum fungsi ini dipanggil
+        print(f"⚠️ Thread pool TensorFlow tidak bisa diubah lagi: {e}")
+    try:
+        import torch
+        torch.set_num_threads(budget["torch"])
+        try:
+            torch.set_num_interop_threads(budget["tf_inter_op"])
+        except RuntimeError:
+            pass  # hanya bisa diset sekali, sebelum kerja paralel pertama
+    except ImportError:
+        pass
+
+    print(f"⚙️ Anggaran thread: {threads} thread/worker ({WEB_CONCURRENCY} worker, {len(cpus)} CPU) | "
+          f"TF {budget['tf_intra_op']}/{budget['tf_inter_op']}, torch {budget['torch']}, cv2 {budget['cv2']}"
+          f"{f' | affinity {affinity}' if affinity else ''}")
+    _applied = budget
+    return budget
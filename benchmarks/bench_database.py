@@ -0,0 +1,250 @@
+"""
+Benchmark baca/tulis konkuren untuk lapisan database.
+
+Membandingkan engine SQLite "polos" (konfigurasi lama: journal DELETE, tanpa
+pragma) dengan engine hasil `app.database` (WAL, synchronous=NORMAL, mmap,
+cache, pool). Sejumlah thread penulis meng-commit baris Dokumen satu per satu
+(seperti akhir /verify-stream) sementara thread pembaca menjalankan query
+riwayat + hitungan status (seperti /home dan /riwayat).
+
+Dengan --search-docs N, yang diukur adalah latensi pencarian riwayat
+(app/search.py) atas N dokumen sintetis milik --search-users user: query
+ber-scope pemilik (implementasi sekarang) dibandingkan MATCH ke seluruh korpus
+lalu disaring per user.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_database --writers 4 --readers 8 --duration 10
+    python -m benchmarks.bench_database --search-docs 100000 --search-users 100
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app import database, models, search
+
+
+def _make_engine(path: str, tuned: bool):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        return create_engine(url, connect_args={"check_same_thread": False})
+    engine = database._build_engine(url)
+    event.listen(engine, "connect", database.apply_sqlite_pragmas)
+    return engine
+
+
+def _seed(Session, n_users: int, docs_per_user: int):
+    db = Session()
+    try:
+        for u in range(n_users):
+            user = models.User(email=f"bench{u}@gmail.com", username=f"Bench{u}", phone=f"08{u:09d}", password="x")
+            db.add(user)
+            db.flush()
+            for d in range(docs_per_user):
+                db.add(models.Dokumen(
+                    nama_dokumen=f"doc_{d}.pdf", nama_file_unik=f"{u}_{d}.pdf", tipe_dokumen="VERIFIKASI_BAUT",
+                    status="DITERIMA" if d % 3 else "DITOLAK", skor=80, hasil_verifikasi=[{"name": "x", "status": "OK"}],
+                    ringkasan="<div>ringkasan</div>" * 20, user_id=user.id,
+                ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _run(engine, writers: int, readers: int, duration: float, n_users: int):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    stop = threading.Event()
+    lat = {"write": [], "read": []}
+    errors = {"write": 0, "read": 0}
+    lock = threading.Lock()
+
+    def writer(idx):
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db = Session()
+            ok = True
+            try:
+                db.add(models.Dokumen(
+                    nama_dokumen="bench.pdf", nama_file_unik=f"w{idx}_{t0}.pdf", tipe_dokumen="VERIFIKASI_BACT",
+                    status="DITERIMA", skor=90, hasil_verifikasi=[], ringkasan="", user_id=(idx % n_users) + 1,
+                ))
+                db.commit()
+            except Exception:
+                db.rollback()
+                ok = False
+            finally:
+                db.close()
+            with lock:
+                if ok:
+                    lat["write"].append(time.perf_counter() - t0)
+                else:
+                    errors["write"] += 1
+
+    def reader(idx):
+        user_id = (idx % n_users) + 1
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            db = Session()
+            ok = True
+            try:
+                db.query(models.Dokumen).filter(models.Dokumen.user_id == user_id).order_by(models.Dokumen.timestamp.desc()).limit(5).all()
+                db.query(models.Dokumen).filter(models.Dokumen.user_id == user_id, models.Dokumen.status == "DITERIMA").count()
+            except Exception:
+                ok = False
+            finally:
+                db.close()
+            with lock:
+                if ok:
+                    lat["read"].append(time.perf_counter() - t0)
+                else:
+                    errors["read"] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    def _stats(values):
+        if not values:
+            return {"ops": 0}
+        values = sorted(values)
+        return {
+            "ops": len(values),
+            "ops_per_sec": round(len(values) / duration, 1),
+            "p50_ms": round(statistics.median(values) * 1000, 2),
+            "p95_ms": round(values[int(len(values) * 0.95) - 1] * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+
+    return {"write": _stats(lat["write"]), "read": _stats(lat["read"]), "errors": errors}
+
+
+KOTA = ["makassar", "jakarta", "surabaya", "medan", "bandung", "semarang", "palembang", "denpasar",
+        "balikpapan", "manado", "kendari", "ambon", "jayapura", "pontianak", "padang", "pekanbaru",
+        "mataram", "kupang", "palu", "gorontalo"]
+KATA = ("berita acara uji terima pekerjaan pembangunan jaringan fiber optik kabel odp odc tiang "
+        "pengukuran redaman opm otdr grounding pelaksana mitra lokasi kontrak tanggal kesimpulan "
+        "diterima ditolak catatan material terpasang sesuai spesifikasi teknis").split()
+
+
+def _seed_search(engine, n_docs: int, n_users: int, words_per_doc: int = 300):
+    """Dokumen + baris FTS sintetis; ~90% memuat "BAUT", tiap kota ~5%, nomor kontrak unik."""
+    rng = random.Random(n_docs)
+    with engine.begin() as conn:
+        search._create_fts_table(conn, search.FTS_TABLE)
+        conn.execute(models.User.__table__.insert(), [
+            {"id": u, "email": f"cari{u}@gmail.com", "username": f"Cari{u}", "password": "x"} for u in range(1, n_users + 1)])
+        batch_docs, batch_fts = [], []
+        for i in range(1, n_docs + 1):
+            user_id = (i % n_users) + 1
+            kota = rng.choice(KOTA)
+            tipe = "BAUT" if rng.random() < 0.9 else "BACT"
+            isi = " ".join([tipe, kota] + rng.choices(KATA, k=words_per_doc))
+            batch_docs.append({"id": i, "nama_dokumen": f"{tipe}_{kota}_{i}.pdf", "tipe_dokumen": f"VERIFIKASI_{tipe}",
+                               "status": "DITERIMA", "skor": 90, "hasil_verifikasi": [], "ringkasan": "", "user_id": user_id})
+            batch_fts.append({"id": i, "owner": search.owner_token(user_id), "nama_dokumen": f"{tipe}_{kota}_{i}.pdf",
+                              "judul": f"{tipe} {kota}", "kontrak": f"K.TEL.{i:06d}/HK.810/2024", "lokasi": kota,
+                              "pelaksana": f"PT Mitra {i % 50}", "isi": isi})
+            if len(batch_docs) >= 5000 or i == n_docs:
+                conn.execute(models.Dokumen.__table__.insert(), batch_docs)
+                conn.execute(search._insert_sql(), batch_fts)
+                batch_docs, batch_fts = [], []
+        conn.execute(text(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('optimize')"))
+
+
+def _search_global(db, user_id: int, query: str, limit: int = 20):
+    """
+    Pembanding (cara lama): MATCH ke seluruh korpus, saring pemilik sesudahnya,
+    bm25 atas semua match; snippet dan pemuatan Dokumen sama dengan search_dokumen.
+    """
+    match = "{%s}: (%s)" % (" ".join(search.FTS_COLUMNS), search.build_match_query(query))
+    hits = db.execute(text(
+        f"SELECT rowid AS id, snippet({search.FTS_TABLE}, -1, char(2), char(3), '…', 12) AS snippet "
+        f"FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH :match AND {search.OWNER_COLUMN} = :owner "
+        f"ORDER BY bm25({search.FTS_TABLE}, 2.0, 3.0, 5.0, 3.0, 3.0, 1.0, 0.0) LIMIT :limit"
+    ), {"match": match, "owner": search.owner_token(user_id), "limit": limit + 1}).all()
+    return db.query(models.Dokumen).filter(models.Dokumen.id.in_([h.id for h in hits])).all()
+
+
+def run_search(n_docs: int, n_users: int, repeats: int = 30):
+    queries = ["BAUT", "makassar", "BAUT makassar", "K.TEL.000042"]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _make_engine(os.path.join(tmp, "search.db"), tuned=True)
+        models.Base.metadata.create_all(bind=engine)
+        t0 = time.perf_counter()
+        _seed_search(engine, n_docs, n_users)
+        print(f"🌱 {n_docs} dokumen diindeks dalam {time.perf_counter() - t0:.1f} detik")
+        Session = sessionmaker(bind=engine)
+        results = {}
+        for query in queries:
+            for label, fn in (("per_user", lambda db, u, q: search.search_dokumen(db, u, q)),
+                              ("global", _search_global)):
+                lat = []
+                with Session() as db:
+                    for r in range(repeats):
+                        user_id = (r % n_users) + 1
+                        t0 = time.perf_counter()
+                        fn(db, user_id, query)
+                        lat.append(time.perf_counter() - t0)
+                lat.sort()
+                results.setdefault(query, {})[label] = {
+                    "p50_ms": round(statistics.median(lat) * 1000, 2),
+                    "p95_ms": round(lat[max(0, int(len(lat) * 0.95) - 1)] * 1000, 2),
+                }
+        engine.dispose()
+    return {"docs": n_docs, "users": n_users, "docs_per_user": n_docs // n_users, "queries": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--docs-per-user", type=int, default=500)
+    parser.add_argument("--search-docs", type=int, default=0, help="Ukur pencarian atas N dokumen (0 = tidak)")
+    parser.add_argument("--search-users", type=int, default=100)
+    parser.add_argument("--output", help="Simpan hasil JSON ke file ini")
+    args = parser.parse_args()
+
+    if args.search_docs:
+        if not search.fts_available():
+            raise SystemExit("SQLite tanpa FTS5; benchmark pencarian tidak bisa dijalankan.")
+        report = {"config": vars(args), "search": run_search(args.search_docs, args.search_users)}
+        text_report = json.dumps(report, indent=2)
+        print(text_report)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text_report)
+        return
+
+    report = {"config": vars(args), "results": {}}
+    for label, tuned in (("baseline", False), ("tuned", True)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = _make_engine(os.path.join(tmp, "bench.db"), tuned)
+            models.Base.metadata.create_all(bind=engine)
+            _seed(sessionmaker(bind=engine), args.users, args.docs_per_user)
+            print(f"⏱️  Menjalankan skenario '{label}'...")
+            report["results"][label] = _run(engine, args.writers, args.readers, args.duration, args.users)
+            engine.dispose()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark engine OCR (EasyOCR vs Tesseract) pada sampel berlabel, untuk mode
+OCR_ENGINE=auto / OCR_ENGINE_<SITE>=auto.
+
+Folder sampel berisi gambar halaman (.png/.jpg) dan teks acuan dengan nama yang
+sama (.txt). Untuk setiap engine yang terpasang diukur latensi rata-rata dan
+akurasi (kemiripan kata dengan teks acuan); engine tercepat yang akurasinya
+>= --floor dipilih dan disimpan ke ocr_engine_choice.json untuk call-site yang
+diberikan. Dengan --crop-top hanya bagian atas gambar yang di-OCR, sama seperti
+fallback klasifikasi dengan OCR_HEADING_CROP (teks acuan harus berisi heading saja).
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_ocr --samples ocr_samples/ --floor 0.85 --site page --crop-top 0.25
+"""
+import argparse
+import json
+import os
+
+import cv2
+
+from app.modules.ocr_engine import CALL_SITES, OCR_ENGINE_CHOICE_PATH, benchmark_engines
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+
+def load_samples(samples_dir, crop_top=1.0):
+    samples = []
+    for filename in sorted(os.listdir(samples_dir)):
+        stem, ext = os.path.splitext(filename)
+        label_path = os.path.join(samples_dir, stem + ".txt")
+        if ext.lower() not in IMAGE_EXTENSIONS or not os.path.exists(label_path):
+            continue
+        image = cv2.imread(os.path.join(samples_dir, filename), cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        if crop_top < 1.0:
+            image = image[:max(1, int(image.shape[0] * crop_top))]
+        with open(label_path, 'r', encoding='utf-8') as f:
+            samples.append((image, f.read()))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", required=True, help="Folder gambar + teks acuan (.txt)")
+    parser.add_argument("--floor", type=float, default=0.85, help="Akurasi minimum (0-1) engine yang boleh dipilih")
+    parser.add_argument("--engines", nargs="+", help="Batasi engine yang diuji (default: semua yang terpasang)")
+    parser.add_argument("--site", nargs="+", default=["default"], choices=("default",) + CALL_SITES,
+                        help="Call-site yang memakai hasil pilihan ini")
+    parser.add_argument("--crop-top", type=float, default=1.0, help="Proporsi atas gambar yang di-OCR")
+    parser.add_argument("--output", default=OCR_ENGINE_CHOICE_PATH, help="File pilihan engine untuk mode auto")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples, args.crop_top)
+    if not samples:
+        print(f"❌ Tidak ada pasangan gambar + .txt di '{args.samples}'.")
+        return
+    print(f"🔬 Menguji OCR pada {len(samples)} sampel (floor akurasi {args.floor})...")
+    result = benchmark_engines(samples, args.floor, args.engines)
+    result["crop_top"] = args.crop_top
+    for name, stats in result["engines"].items():
+        print(f"   {name:<10} {stats['mean_latency_ms']:>8} ms/gambar  akurasi {stats['accuracy']:.2%}")
+    if result["selected"] is None:
+        print("❌ Tidak ada engine OCR yang terpasang.")
+        return
+
+    # Gabungkan dengan pilihan call-site lain yang sudah ada
+    existing = {}
+    if os.path.exists(args.output):
+        with open(args.output, 'r') as f:
+            existing = json.load(f)
+    existing.setdefault("choice", {})
+    existing.setdefault("benchmarks", {})
+    for site in args.site:
+        existing["choice"][site] = result["selected"]
+        existing["benchmarks"][site] = result
+    with open(args.output, 'w') as f:
+        json.dump(existing, f, indent=2)
+    print(f"✅ Engine terpilih untuk {', '.join(args.site)}: {result['selected']} → '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Benchmark pembagian CPU: N proses worker x M thread per worker.
+
+Setiap konfigurasi menjalankan N proses (seperti `uvicorn --workers N`), masing-
+masing dengan anggaran thread M (app/thread_budget.py: TF intra-op, torch,
+OpenCV, OpenMP) dan opsional CPU affinity per worker. Semua worker memproses
+dokumen sintetis yang sama secara bersamaan setelah pemanasan (model dimuat);
+yang diukur adalah throughput total halaman/detik dari start bersama sampai
+worker terakhir selesai.
+
+Konfigurasi ditulis "NxM"; "Nx0" berarti anggaran thread dimatikan
+(THREAD_BUDGET=false), yaitu perilaku lama di mana tiap pustaka memakai semua core.
+Default: untuk N = 1, 2, 4, ... <= jumlah CPU dicoba M = CPU/N (pas) dan Nx0.
+
+Membaca hasil: pilih baris dengan pages_per_sec tertinggi, lalu jalankan server
+dengan WEB_CONCURRENCY=N WORKER_THREADS=M (dan CPU_AFFINITY=auto jika kolom
+affinity lebih cepat). Biasanya worker lebih banyak dengan thread sedikit
+menang untuk beban campuran CNN+OCR, karena banyak tahap (render, signature,
+kata kunci) berjalan single-thread.
+
+Jalankan dari root repo di mesin produksi, lalu commit tabelnya (--markdown)
+bersama default WEB_CONCURRENCY/WORKER_THREADS/CPU_AFFINITY yang dipilih:
+    python -m benchmarks.bench_threads --pages 20 --docs-per-worker 2 --affinity both \
+        --output threads.json --markdown benchmarks/results/threads.md
+
+Tanpa model terlatih (mis. di mesin dev), --untrained-model memakai arsitektur
+teacher produksi dengan bobot acak: biaya inferensinya sama, hanya kelasnya tidak
+bermakna (halaman jatuh ke jalur teks/kata kunci seperti saat confidence rendah).
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import queue
+import shutil
+import tempfile
+import time
+
+# bench_verification (numpy/cv2/fitz) diimpor di dalam fungsi: proses worker hasil
+# spawn harus mengisi env thread sebelum pustaka tersebut dimuat.
+
+
+def _worker(config, slot, pdf_path, doc_type, docs, db_url, barrier, results, extra_env):
+    n_workers, threads, affinity = config
+    os.environ.update({
+        **extra_env,
+        "DATABASE_URL": db_url,
+        "MODEL_RELOAD_INTERVAL": "0",
+        "WEB_CONCURRENCY": str(n_workers),
+        "THREAD_BUDGET": "true" if threads else "false",
+        "WORKER_THREADS": str(threads),
+    })
+    if affinity and threads:
+        cpus = sorted(os.sched_getaffinity(0))
+        block = [cpus[(slot * threads + k) % len(cpus)] for k in range(threads)]
+        os.environ["CPU_AFFINITY"] = ",".join(map(str, block))
+    from app.thread_budget import apply_thread_env
+    apply_thread_env()
+    from benchmarks.bench_verification import _run_pipeline
+    from app import main as main_module
+
+    _run_pipeline(main_module, pdf_path, doc_type)  # pemanasan: muat model & reader OCR
+    barrier.wait()
+    start = time.perf_counter()
+    for _ in range(docs):
+        _run_pipeline(main_module, pdf_path, doc_type)
+    results.put({"slot": slot, "start": start, "end": time.perf_counter(), "budget": main_module.THREAD_BUDGET})
+
+
+def run_config(config, pdf_path, n_pages, doc_type, docs, db_url, extra_env=None):
+    n_workers, threads, affinity = config
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(n_workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(config, slot, pdf_path, doc_type, docs, db_url, barrier, results,
+                                               extra_env or {}))
+             for slot in range(n_workers)]
+    for p in procs:
+        p.start()
+    outputs = []
+    while len(outputs) < len(procs):
+        try:
+            outputs.append(results.get(timeout=5))
+        except queue.Empty:
+            # Worker yang crash tidak pernah mengirim hasil; jangan menunggu selamanya
+            crashed = [p.exitcode for p in procs if p.exitcode not in (None, 0)]
+            if crashed:
+                for p in procs:
+                    p.terminate()
+                raise RuntimeError(f"Worker berhenti dengan exit code {crashed} pada konfigurasi {config}")
+    for p in procs:
+        p.join()
+    # Worker mulai hampir bersamaan setelah barrier; pakai selisih start paling awal & end paling akhir
+    elapsed = max(o["end"] for o in outputs) - min(o["start"] for o in outputs)
+    total_pages = n_workers * docs * n_pages
+    return {
+        "workers": n_workers,
+        "threads_per_worker": threads or "tanpa anggaran",
+        "affinity": bool(affinity and threads),
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(total_pages / elapsed, 2),
+        "docs_per_sec": round(n_workers * docs / elapsed, 3),
+    }
+
+
+# Kelas keluaran model bobot acak: kelas yang dikenali classify_page_by_keywords
+UNTRAINED_CLASS_NAMES = (
+    "BACT", "BAUT", "BA_LAPANGAN", "BERITA_ACARA_BARANG_TIBA", "BOQ_CT", "BOQ_UT", "DAFTAR_HADIR_CT",
+    "DAFTAR_HADIR_UT", "EVIDENCE_PHOTO_UMUM", "FORM_OPM", "FOTO_KEGIATAN", "FOTO_MATERIAL",
+    "FOTO_PENGUKURAN_OPM", "FOTO_ROLL_METER", "FOTO_SURVEY_ADDRESS", "LAPORAN_UT", "NOTA_DINAS",
+    "OTDR_REPORT", "RLD", "SK_TEAM", "SURAT_PERMINTAAN",
+)
+
+
+def build_untrained_registry(registry_dir: str) -> str:
+    """
+    Registry sementara berisi teacher produksi (backbone default train_model.py)
+    dengan bobot acak, untuk mengukur biaya inferensi tanpa artefak training.
+    """
+    import tensorflow as tf
+    from app.modules.model_registry import register_model
+    import train_model
+
+    class_names = list(UNTRAINED_CLASS_NAMES)
+    os.makedirs(registry_dir, exist_ok=True)
+    feature_extractor, _ = train_model.build_feature_extractor(train_model.DEFAULT_BACKBONE, weights=None)
+    head = train_model.build_head(feature_extractor.output_shape[-1], len(class_names))
+    model = train_model.build_classifier(feature_extractor, head)
+    model_path = os.path.join(registry_dir, "untrained.keras")
+    class_names_path = os.path.join(registry_dir, "untrained_class_names.json")
+    tf.keras.models.save_model(model, model_path)
+    with open(class_names_path, "w") as f:
+        json.dump(class_names, f)
+    return register_model(model_path, class_names_path, version="untrained", registry_dir=registry_dir,
+                          metadata={"backbone": train_model.DEFAULT_BACKBONE, "weights": "acak"})
+
+
+def median_run(runs):
+    """Putaran median (menurut hal/detik) plus rentang min-maks semua putaran."""
+    ordered = sorted(runs, key=lambda r: r["pages_per_sec"])
+    return {**ordered[len(ordered) // 2], "repeat": len(runs),
+            "pages_per_sec_range": [ordered[0]["pages_per_sec"], ordered[-1]["pages_per_sec"]]}
+
+
+def default_configs(cpus):
+    configs, n = [], 1
+    while n <= cpus:
+        configs += [f"{n}x{max(1, cpus // n)}", f"{n}x0"]
+        n *= 2
+    return configs
+
+
+def markdown_report(report) -> str:
+    """Tabel hasil + pembagian terpilih, untuk di-commit sebagai dasar default deployment."""
+    best = report["best"]
+    lines = [
+        f"# Pembagian worker x thread ({report['cpu_count']} CPU, {report['platform']})",
+        "",
+        f"Commit `{report['git_commit']}`, dokumen sintetis {report['config']['pages']} halaman, "
+        f"{report['config']['docs_per_worker']} dokumen per worker"
+        f"{', teacher bobot acak (--untrained-model)' if report['config'].get('untrained_model') else ''}.",
+        "",
+        f"Median dari {report['config'].get('repeat', 1)} putaran per konfigurasi.",
+        "",
+        "| worker | thread/worker | affinity | detik | hal/detik | rentang hal/detik | dok/detik |",
+        "|---:|---:|:---:|---:|---:|---:|---:|",
+    ]
+    for r in report["results"]:
+        marker = " **terbaik**" if r is best else ""
+        low, high = r.get("pages_per_sec_range", [r["pages_per_sec"]] * 2)
+        lines.append(f"| {r['workers']} | {r['threads_per_worker']} | {'ya' if r['affinity'] else '-'} | "
+                     f"{r['seconds']} | {r['pages_per_sec']}{marker} | {low}–{high} | {r['docs_per_sec']} |")
+    if best:
+        affinity = "auto" if best["affinity"] else "false"
+        threads = best["threads_per_worker"] if isinstance(best["threads_per_worker"], int) else 0
+        lines += ["", "Default terpilih:", "", "```",
+                  f"WEB_CONCURRENCY={best['workers']}", f"WORKER_THREADS={threads}", f"CPU_AFFINITY={affinity}", "```"]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", help='Konfigurasi "NxM" (default: lihat di atas)')
+    parser.add_argument("--pages", type=int, default=20, help="Jumlah halaman dokumen sintetis")
+    parser.add_argument("--docs-per-worker", type=int, default=2)
+    parser.add_argument("--affinity", choices=["off", "on", "both"], default="off",
+                        help="Uji dengan CPU affinity per worker, tanpa, atau keduanya")
+    parser.add_argument("--doc-type", choices=["VERIFIKASI_BAUT", "VERIFIKASI_BACT"], default="VERIFIKASI_BAUT")
+    parser.add_argument("--output", help="Simpan hasil JSON ke file ini")
+    parser.add_argument("--repeat", type=int, default=1, help="Putaran per konfigurasi (dilaporkan median)")
+    parser.add_argument("--untrained-model", action="store_true",
+                        help="Pakai teacher berbobot acak di registry sementara (tanpa artefak training)")
+    parser.add_argument("--markdown", help="Simpan tabel hasil + default terpilih (Markdown) ke file ini")
+    args = parser.parse_args()
+    from benchmarks.bench_verification import _git_commit, synthesize_pdf
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    affinity_modes = {"off": [False], "on": [True], "both": [False, True]}[args.affinity]
+    configs = []
+    for spec in args.configs or default_configs(cpus):
+        n_workers, threads = (int(x) for x in spec.lower().split("x"))
+        for affinity in affinity_modes:
+            if affinity and not threads:
+                continue
+            configs.append((n_workers, threads, affinity))
+
+    work_dir = tempfile.mkdtemp(prefix="bench_threads_")
+    try:
+        pdf_path = synthesize_pdf(os.path.join(work_dir, "sintetis.pdf"), args.pages, args.doc_type, seed=args.pages)
+        db_url = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+        extra_env = {}
+        if args.untrained_model:
+            registry_dir = os.path.join(work_dir, "registry")
+            build_untrained_registry(registry_dir)
+            extra_env["MODEL_REGISTRY_DIR"] = registry_dir
+        # Putaran diselang-seling antar konfigurasi agar gangguan mesin (VM bersama,
+        # turbo) tersebar merata; tiap baris memakai putaran median
+        runs = {config: [] for config in configs}
+        for round_no in range(1, args.repeat + 1):
+            for config in configs:
+                print(f"⏱️  [{round_no}/{args.repeat}] {config[0]} worker x {config[1] or 'semua'} thread"
+                      f"{' + affinity' if config[2] else ''}...")
+                runs[config].append(run_config(config, pdf_path, args.pages, args.doc_type, args.docs_per_worker,
+                                               db_url, extra_env))
+        rows = [median_run(runs[config]) for config in configs]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    best = max(rows, key=lambda r: r["pages_per_sec"]) if rows else None
+    print(f"\n{'worker':>6} {'thread':>15} {'affinity':>9} {'hal/detik':>10}")
+    for r in rows:
+        marker = "  ← terbaik" if r is best else ""
+        print(f"{r['workers']:>6} {str(r['threads_per_worker']):>15} {str(r['affinity']):>9} {r['pages_per_sec']:>10}{marker}")
+
+    report = {"git_commit": _git_commit(), "cpu_count": cpus, "platform": platform.platform(),
+              "config": vars(args), "results": rows, "best": best}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.markdown:
+        os.makedirs(os.path.dirname(args.markdown) or ".", exist_ok=True)
+        with open(args.markdown, "w") as f:
+            f.write(markdown_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Benchmark throughput pipeline verifikasi dokumen.
+
+Membuat PDF sintetis mirip BAUT/BACT secara lokal dengan PyMuPDF (halaman
+teks, halaman gambar tanpa teks, coretan mirip tanda tangan) lalu mengukur:
+
+  * `process_verification_stream` langsung: waktu per tahap (render,
+    classify, ocr, signature, summary), halaman/detik, peak RSS, dan jumlah
+    panggilan OCR per dokumen per call-site (page/summary/table);
+  * skala konkurensi: beberapa dokumen diproses bersamaan di thread terpisah;
+  * endpoint `/verify-stream` lewat TestClient (upload + SSE + simpan DB).
+
+Hasil dicetak sebagai JSON (beserta commit git) agar bisa dibandingkan antar
+commit. Database dan folder sementara dipakai supaya data asli tidak tersentuh.
+
+Jalankan dari root repo:
+    python -m benchmarks.bench_verification --pages 10 50 200 --concurrency 1 2 4 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import cv2
+import fitz
+import numpy as np
+
+STAGES = ("render", "classify", "ocr", "signature", "summary")
+
+PARAGRAF = [
+    "Pada hari ini telah dilaksanakan uji terima pekerjaan pembangunan jaringan fiber optik "
+    "sesuai dengan kontrak dan amandemen yang berlaku.",
+    "Hasil pengukuran redaman optik dan grounding telah diperiksa bersama oleh tim uji terima "
+    "dan dinyatakan memenuhi spesifikasi teknis.",
+    "Material terpasang telah dicocokkan dengan Bill of Quantity dan dokumentasi foto kegiatan "
+    "terlampir pada laporan ini.",
+]
+
+
+# ------------------------------------------------------------------------------
+# PDF sintetis
+# ------------------------------------------------------------------------------
+def _text_page(page, doc_type: str, index: int, rng: random.Random):
+    judul = "BERITA ACARA UJI TERIMA" if doc_type == "VERIFIKASI_BAUT" else "BERITA ACARA TEST COMMISSIONING"
+    y = 72
+    page.insert_text((72, y), judul, fontsize=16)
+    y += 28
+    for label, value in (
+        ("Nomor Kontrak", f"K.TEL.{rng.randint(100, 999)}/HK.810/TA-{rng.randint(1000, 9999)}/2025"),
+        ("Lokasi", f"STO Makassar {index}"),
+        ("Pelaksana", "PT Mitra Telekomunikasi"),
+        ("Tanggal", f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2025"),
+    ):
+        page.insert_text((72, y), f"{label:<14}: {value}", fontsize=11)
+        y += 18
+    y += 10
+    for _ in range(12):
+        page.insert_text((72, y), rng.choice(PARAGRAF)[:95], fontsize=10)
+        y += 16
+
+
+def _image_page(page, rng: random.Random):
+    """Halaman tanpa lapisan teks (seperti hasil scan/foto), memaksa jalur OCR."""
+    h, w = 1100, 850
+    img = np.full((h, w, 3), 235, np.uint8)
+    noise = np.random.default_rng(rng.randint(0, 2 ** 31)).integers(0, 25, (h, w, 1), dtype=np.uint8)
+    img = cv2.subtract(img, np.repeat(noise, 3, axis=2))
+    for _ in range(6):
+        x, y = rng.randint(40, w - 300), rng.randint(40, h - 200)
+        color = tuple(rng.randint(40, 200) for _ in range(3))
+        cv2.rectangle(img, (x, y), (x + rng.randint(100, 260), y + rng.randint(60, 160)), color, -1)
+    for i in range(8):
+        cv2.putText(img, f"FOTO MATERIAL TERPASANG {i + 1}", (60, 120 + i * 110),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (20, 20, 20), 2)
+    _, png = cv2.imencode(".png", img)
+    page.insert_image(page.rect, stream=png.tobytes())
+
+
+def _signature_strokes(page, rng: random.Random):
+    """Coretan melengkung lebar di bagian bawah halaman, mirip tanda tangan."""
+    base_x, base_y = rng.randint(320, 380), page.rect.height - 140
+    points = [fitz.Point(base_x + i * 9, base_y + 18 * np.sin(i / 2.3 + rng.random())) for i in range(22)]
+    shape = page.new_shape()
+    shape.draw_polyline(points)
+    shape.finish(color=(0, 0, 0.4), width=2.5, closePath=False)
+    shape.commit()
+    page.insert_text((base_x, base_y + 40), "( Manager Konstruksi )", fontsize=10)
+
+
+def synthesize_pdf(path: str, n_pages: int, doc_type: str = "VERIFIKASI_BAUT", seed: int = 0) -> str:
+    """Membuat PDF `n_pages` halaman: campuran halaman teks, gambar, dan tanda tangan."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for i in range(n_pages):
+        page = doc.new_page(width=595, height=842)  # A4
+        if i % 3 == 2:
+            _image_page(page, rng)
+        else:
+            _text_page(page, doc_type, i, rng)
+        if i == n_pages - 1 or i % 10 == 0:
+            _signature_strokes(page, rng)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+
+# ------------------------------------------------------------------------------
+# Pengukuran
+# ------------------------------------------------------------------------------
+class PeakRSS:
+    """Mencatat RSS tertinggi selama blok `with` dengan sampling /proc (Linux)."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_bytes() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # Non-Linux: ru_maxrss adalah puncak sepanjang umur proses (KiB di Linux, byte di macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maxrss if platform.system() == "Darwin" else maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+
+    def __enter__(self):
+        self.peak_bytes = self.current_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+
+    @property
+    def peak_mib(self) -> float:
+        return round(self.peak_bytes / (1024 * 1024), 1)
+
+
+class StageTimer:
+    """
+    Mengukur waktu per tahap dengan membungkus fungsi yang dipanggil
+    `process_verification_stream` di namespace app.main. Tahap render (thumbnail
+    + pra-filter) tidak punya fungsi sendiri, jadi dihitung dari jeda antara update
+    "Total halaman" dan "PDF selesai dikonversi" dikurangi waktu deteksi tanda tangan.
+    """
+
+    WRAPPED = {
+        "check_signatures_in_pdf": "signature",
+        "predict_page_image": "classify",
+        "predict_text_class": "classify",
+        "ocr_extract_text": "ocr",
+        "compare_with_template_smart": "summary",
+        "extract_summary_fields": "summary",
+        "generate_summary": "summary",
+    }
+
+    def __init__(self, main_module):
+        self.main = main_module
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        # Jumlah panggilan OCR per call-site (page/summary/table), terlepas dari engine terpasang
+        self.ocr_calls = defaultdict(int)
+        self._lock = threading.Lock()
+        self._originals = {}
+
+    def _wrap(self, name, stage):
+        original = getattr(self.main, name)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - t0
+                    self.calls[stage] += 1
+                    if name == "ocr_extract_text":
+                        self.ocr_calls[kwargs.get("site", "page")] += 1
+        return original, timed
+
+    def _count_table_ocr(self, original):
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.ocr_calls["table"] += 1
+            return original(*args, **kwargs)
+        return counted
+
+    @contextmanager
+    def installed(self):
+        from app.modules import table_extractor
+
+        for name, stage in self.WRAPPED.items():
+            self._originals[name], timed = self._wrap(name, stage)
+            setattr(self.main, name, timed)
+        table_ocr = table_extractor.ocr_array
+        table_extractor.ocr_array = self._count_table_ocr(table_ocr)
+        try:
+            yield self
+        finally:
+            for name, original in self._originals.items():
+                setattr(self.main, name, original)
+            self._originals.clear()
+            table_extractor.ocr_array = table_ocr
+
+    def report(self, render_seconds: float):
+        stages = {stage: {"seconds": round(self.seconds[stage], 3), "calls": self.calls[stage]} for stage in STAGES}
+        stages["render"] = {"seconds": round(max(render_seconds - self.seconds["signature"], 0.0), 3), "calls": 1}
+        return stages
+
+
+def _run_pipeline(main_module, pdf_path: str, doc_type: str):
+    """Menjalankan generator sampai selesai; mengembalikan (hasil akhir, detik render+signature)."""
+    final, marks = None, {}
+    for update in main_module.process_verification_stream(pdf_path, doc_type):
+        progress = update.get("progress")
+        if progress == 5:
+            marks["opened"] = time.perf_counter()
+        elif progress == 10:
+            marks["rendered"] = time.perf_counter()
+        if update.get("status") == "done":
+            final = update["data"]
+        elif update.get("status") == "error":
+            raise RuntimeError(update.get("message"))
+    return final, marks.get("rendered", 0.0) - marks.get("opened", 0.0)
+
+
+def bench_pipeline(main_module, pdf_path: str, n_pages: int, doc_type: str):
+    timer = StageTimer(main_module)
+    with timer.installed(), PeakRSS() as rss:
+        t0 = time.perf_counter()
+        final, render_and_signature = _run_pipeline(main_module, pdf_path, doc_type)
+        elapsed = time.perf_counter() - t0
+    return {
+        "pages": n_pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(n_pages / elapsed, 2),
+        "peak_rss_mib": rss.peak_mib,
+        "stages": timer.report(render_and_signature),
+        # Satu dokumen per pengukuran: jumlah panggilan OCR = OCR per dokumen
+        "ocr_calls_per_doc": {**timer.ocr_calls, "total": sum(timer.ocr_calls.values())},
+        "score": final.get("score") if final else None,
+        "model_version": final.get("model_version") if final else None,
+    }
+
+
+def bench_concurrency(main_module, pdf_path: str, n_pages: int, doc_type: str, levels):
+    """Memproses `n` salinan dokumen bersamaan untuk setiap tingkat konkurensi n."""
+    results, baseline = [], None
+    for n in sorted(levels):
+        with PeakRSS() as rss, ThreadPoolExecutor(max_workers=n) as pool:
+            t0 = time.perf_counter()
+            list(pool.map(lambda _: _run_pipeline(main_module, pdf_path, doc_type), range(n)))
+            elapsed = time.perf_counter() - t0
+        pages_per_sec = n * n_pages / elapsed
+        baseline = baseline or pages_per_sec / n
+        results.append({
+            "concurrency": n,
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round(n / elapsed, 3),
+            "pages_per_sec": round(pages_per_sec, 2),
+            # 1.0 = throughput naik linear terhadap jumlah dokumen bersamaan
+            "scaling_efficiency": round(pages_per_sec / (baseline * n), 2),
+            "peak_rss_mib": rss.peak_mib,
+        })
+    return results
+
+
+def bench_endpoint(main_module, pdf_path: str, n_pages: int, doc_type: str):
+    """POST /verify-stream lewat TestClient sebagai user benchmark, membaca SSE sampai selesai."""
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+
+    db = main_module.SessionLocal()
+    try:
+        user = db.query(main_module.models.User).filter_by(email="bench@mail.com").first()
+        if user is None:
+            user = main_module.models.User(email="bench@mail.com", username="Bench", password="-")
+            db.add(user)
+            db.commit()
+        user_id = user.id
+    finally:
+        db.close()
+
+    async def bench_user(db=Depends(main_module.get_async_db)):
+        return main_module.CurrentUser.from_model(await db.get(main_module.models.User, user_id))
+
+    unique_filename = f"bench_{os.getpid()}_{time.time_ns()}.pdf"
+    main_module.app.dependency_overrides[main_module.get_current_user_async] = bench_user
+    try:
+        with TestClient(main_module.app) as client, PeakRSS() as rss, open(pdf_path, "rb") as f:
+            t0 = time.perf_counter()
+            first_event, events, done = None, 0, False
+            with client.stream("POST", "/verify-stream",
+                               data={"doc_type": doc_type, "unique_filename": unique_filename},
+                               files={"file": (os.path.basename(pdf_path), f, "application/pdf")}) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    events += 1
+                    first_event = first_event or time.perf_counter() - t0
+                    done = done or json.loads(line[5:]).get("status") == "done"
+            elapsed = time.perf_counter() - t0
+    finally:
+        main_module.app.dependency_overrides.pop(main_module.get_current_user_async, None)
+
+    return {
+        "pages": n_pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(n_pages / elapsed, 2),
+        "first_event_ms": round((first_event or 0.0) * 1000, 1),
+        "events": events,
+        "completed": done,
+        "peak_rss_mib": rss.peak_mib,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency-pages", type=int, default=10, help="Jumlah halaman dokumen untuk uji konkurensi")
+    parser.add_argument("--doc-type", choices=["VERIFIKASI_BAUT", "VERIFIKASI_BACT"], default="VERIFIKASI_BAUT")
+    parser.add_argument("--skip-endpoint", action="store_true", help="Lewati pengukuran /verify-stream")
+    parser.add_argument("--keep-pdfs", help="Simpan PDF sintetis ke folder ini")
+    parser.add_argument("--output", help="Simpan hasil JSON ke file ini")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_verifikasi_")
+    pdf_dir = args.keep_pdfs or work_dir
+    os.makedirs(pdf_dir, exist_ok=True)
+    # Database terpisah agar benchmark tidak mengotori database.db; harus diset sebelum app diimpor.
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+    os.environ.setdefault("MODEL_RELOAD_INTERVAL", "0")
+    # Warm-up latar dari lifespan TestClient akan berebut CPU dengan pengukuran endpoint
+    os.environ.setdefault("WARMUP_ENABLED", "false")
+    # Object PDF hasil unggahan endpoint ikut terhapus bersama work_dir
+    os.environ["DOCUMENT_STORAGE_DIR"] = os.path.join(work_dir, "dokumen")
+    os.environ.setdefault("STORAGE_GC_INTERVAL", "0")
+
+    try:
+        t0 = time.perf_counter()
+        with PeakRSS() as rss:
+            from app import main as main_module
+            main_module.acquire_model()
+        startup = {"seconds": round(time.perf_counter() - t0, 3), "peak_rss_mib": rss.peak_mib}
+
+        report = {
+            "config": vars(args),
+            "environment": {
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "startup": startup,
+            "pipeline": [],
+            "concurrency": [],
+            "endpoint": [],
+        }
+
+        pdfs = {}
+        for n_pages in sorted(set(args.pages + [args.concurrency_pages])):
+            pdfs[n_pages] = synthesize_pdf(os.path.join(pdf_dir, f"sintetis_{n_pages}.pdf"), n_pages, args.doc_type, seed=n_pages)
+
+        for n_pages in args.pages:
+            print(f"⏱️  Pipeline {n_pages} halaman...")
+            report["pipeline"].append(bench_pipeline(main_module, pdfs[n_pages], n_pages, args.doc_type))
+
+        print(f"⏱️  Konkurensi {args.concurrency} x {args.concurrency_pages} halaman...")
+        report["concurrency"] = bench_concurrency(
+            main_module, pdfs[args.concurrency_pages], args.concurrency_pages, args.doc_type, args.concurrency)
+
+        if not args.skip_endpoint:
+            for n_pages in args.pages:
+                print(f"⏱️  /verify-stream {n_pages} halaman...")
+                report["endpoint"].append(bench_endpoint(main_module, pdfs[n_pages], n_pages, args.doc_type))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
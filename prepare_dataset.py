@@ -1,30 +1,38 @@
 import os
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import fitz  # PyMuPDF
 from tqdm import tqdm
 import cv2
 import numpy as np
+# Deteksi halaman kosong dipakai bersama pipeline verifikasi (app/modules/page_filter.py)
+from app.modules.page_filter import is_blank_page
 
 # === KONFIGURASI ===
 PDF_SOURCE_DIR = 'pdf_sources'
 DATASET_DIR = 'dataset'
 DPI = 350  # detail tinggi
 IMG_SIZE = (224, 224)  # konsisten dengan model
-MIN_CONTENT_RATIO = 0.005  # ambang batas isi halaman (0.5% pixel non-putih)
 SAVE_GRAYSCALE = True  # simpan dalam grayscale agar efisien untuk AI
+# Manifest berisi pasangan (hash PDF, halaman) yang sudah diproses, agar run ulang inkremental
+MANIFEST_PATH = os.path.join(DATASET_DIR, '.manifest.jsonl')
+# Jika True, gambar dikecilkan dulu ke DENOISE_SIZE sebelum fastNlMeansDenoising.
+# Denoise pada resolusi 350 DPI (~2900x4100) sangat lambat padahal hasilnya tetap di-resize ke 224x224.
+DOWNSCALE_BEFORE_DENOISE = False
+DENOISE_SIZE = (IMG_SIZE[0] * 4, IMG_SIZE[1] * 4)
+# Dataset packed: shard NumPy uint8 (N, H, W, 1) + label, dibaca train_model.py lewat memmap
+PACKED_DIR = 'dataset_packed'
+SHARD_SIZE = 4096  # gambar per shard (~200 MB untuk 224x224 grayscale)
 
-def is_blank_page(image):
-    """
-    Deteksi apakah halaman kosong (terlalu putih / sedikit konten)
-    """
-    # Hitung proporsi piksel bukan putih
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
-    non_white_ratio = np.count_nonzero(gray < 240) / gray.size
-    return non_white_ratio < MIN_CONTENT_RATIO
-
-def preprocess_image(pix):
+def preprocess_image(pix, downscale_first=None):
     """
     Membersihkan dan meningkatkan kualitas gambar hasil konversi PDF.
     """
+    if downscale_first is None:
+        downscale_first = DOWNSCALE_BEFORE_DENOISE
+
     # Konversi ke numpy array
     img_np = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
     if img_np.shape[2] == 4:  # hilangkan alpha channel
@@ -33,6 +41,10 @@ def preprocess_image(pix):
     # Grayscale
     gray = cv2.cvtColor(img_np, cv2.COLOR_BGR2GRAY)
 
+    # Opsional: kecilkan dulu (INTER_AREA menjaga detail teks) agar denoise jauh lebih cepat
+    if downscale_first and gray.shape[1] > DENOISE_SIZE[0]:
+        gray = cv2.resize(gray, DENOISE_SIZE, interpolation=cv2.INTER_AREA)
+
     # Denoise halus
     denoised = cv2.fastNlMeansDenoising(gray, h=10, templateWindowSize=7, searchWindowSize=21)
 
@@ -48,27 +60,84 @@ def preprocess_image(pix):
     return resized
 
 
-def convert_pdfs_to_images():
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash isi file PDF, sehingga PDF yang diganti nama tidak diproses ulang."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Membaca manifest → dict {(pdf_hash, page_num): entry}."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                done[(entry['pdf_hash'], entry['page'])] = entry
+            except (ValueError, KeyError):
+                continue  # baris terpotong akibat proses terhenti
+    return done
+
+
+def _is_done(entry):
+    if entry is None or entry['status'] == 'error':
+        return False
+    # Halaman tersimpan dianggap selesai hanya jika file hasilnya masih ada
+    return entry['status'] == 'blank' or os.path.exists(entry['output'])
+
+
+# Cache dokumen terbuka per proses worker: task dikirim berurutan per PDF,
+# jadi satu PDF cukup dibuka sekali oleh setiap worker.
+_open_doc = {"path": None, "doc": None}
+
+def _get_doc(pdf_path):
+    if _open_doc["path"] != pdf_path:
+        if _open_doc["doc"] is not None:
+            _open_doc["doc"].close()
+        _open_doc["doc"], _open_doc["path"] = fitz.open(pdf_path), pdf_path
+    return _open_doc["doc"]
+
+
+def process_page(task):
     """
-    Mengubah semua PDF di dalam PDF_SOURCE_DIR menjadi dataset gambar siap latih.
+    Worker: render, filter halaman kosong, preprocess, dan simpan satu halaman PDF.
+    Mengembalikan entry manifest untuk halaman tersebut.
     """
-    if not os.path.exists(PDF_SOURCE_DIR):
-        print(f"❌ Folder sumber '{PDF_SOURCE_DIR}' tidak ditemukan.")
-        return
+    pdf_path, pdf_hash, page_num, output_path, downscale_first = task
+    entry = {"pdf_hash": pdf_hash, "page": page_num, "pdf": pdf_path, "output": output_path}
+    try:
+        page = _get_doc(pdf_path).load_page(page_num)
+        pix = page.get_pixmap(dpi=DPI)
 
-    os.makedirs(DATASET_DIR, exist_ok=True)
+        img_np = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
+        if pix.n == 4:
+            img_np = img_np[:, :, :3]
 
-    category_dirs = [d for d in os.listdir(PDF_SOURCE_DIR) if os.path.isdir(os.path.join(PDF_SOURCE_DIR, d))]
-    if not category_dirs:
-        print("⚠️ Tidak ada subfolder kategori di dalam 'pdf_sources'.")
-        print("Buat struktur seperti: pdf_sources/ktp/, pdf_sources/ijazah/, dst.")
-        return
+        # Skip halaman kosong
+        if is_blank_page(img_np):
+            entry["status"] = "blank"
+            return entry
+
+        processed = preprocess_image(pix, downscale_first)
 
-    total_saved = 0
-    total_skipped = 0
+        if SAVE_GRAYSCALE:
+            cv2.imwrite(output_path, processed)
+        else:
+            cv2.imwrite(output_path, cv2.cvtColor(processed, cv2.COLOR_GRAY2BGR))
+        entry["status"] = "saved"
+    except Exception as e:
+        entry["status"], entry["error"] = "error", str(e)
+    return entry
 
-    print(f"🚀 Mulai konversi PDF dari '{PDF_SOURCE_DIR}' → '{DATASET_DIR}'")
 
+def _collect_tasks(category_dirs, manifest, downscale_first):
+    """Membuat daftar task (satu per halaman) yang belum tercatat di manifest."""
+    tasks, already_done = [], 0
     for category_name in category_dirs:
         category_source = os.path.join(PDF_SOURCE_DIR, category_name)
         category_output = os.path.join(DATASET_DIR, category_name)
@@ -79,48 +148,155 @@ def convert_pdfs_to_images():
             print(f"⚠️ Tidak ada PDF di folder kategori '{category_name}'")
             continue
 
-        for pdf_filename in tqdm(pdf_files, desc=f"  → {category_name}", colour="green"):
+        for pdf_filename in tqdm(pdf_files, desc=f"  🔎 {category_name}", colour="blue"):
             pdf_path = os.path.join(category_source, pdf_filename)
-
             try:
-                doc = fitz.open(pdf_path)
-                for page_num in range(len(doc)):
-                    page = doc.load_page(page_num)
-                    pix = page.get_pixmap(dpi=DPI)
+                pdf_hash = file_sha256(pdf_path)
+                with fitz.open(pdf_path) as doc:
+                    page_count = len(doc)
+            except Exception as e:
+                print(f"⚠️ Gagal membuka '{pdf_filename}': {e}")
+                continue
 
-                    img_np = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.h, pix.w, pix.n)
-                    if pix.n == 4:
-                        img_np = img_np[:, :, :3]
+            for page_num in range(page_count):
+                if _is_done(manifest.get((pdf_hash, page_num))):
+                    already_done += 1
+                    continue
+                output_name = f"{os.path.splitext(pdf_filename)[0]}_page_{page_num + 1}.png"
+                tasks.append((pdf_path, pdf_hash, page_num, os.path.join(category_output, output_name), downscale_first))
+    return tasks, already_done
 
-                    # Skip halaman kosong
-                    if is_blank_page(img_np):
-                        total_skipped += 1
-                        continue
 
-                    processed = preprocess_image(pix)
+def convert_pdfs_to_images(workers=None, downscale_first=None, force=False):
+    """
+    Mengubah semua PDF di dalam PDF_SOURCE_DIR menjadi dataset gambar siap latih.
+    Setiap halaman diproses paralel oleh `workers` proses; halaman yang sudah
+    tercatat di manifest dilewati kecuali `force=True`.
+    """
+    if not os.path.exists(PDF_SOURCE_DIR):
+        print(f"❌ Folder sumber '{PDF_SOURCE_DIR}' tidak ditemukan.")
+        return
 
-                    # Simpan
-                    output_name = f"{os.path.splitext(pdf_filename)[0]}_page_{page_num + 1}.png"
-                    output_path = os.path.join(category_output, output_name)
+    os.makedirs(DATASET_DIR, exist_ok=True)
+
+    category_dirs = [d for d in os.listdir(PDF_SOURCE_DIR) if os.path.isdir(os.path.join(PDF_SOURCE_DIR, d))]
+    if not category_dirs:
+        print("⚠️ Tidak ada subfolder kategori di dalam 'pdf_sources'.")
+        print("Buat struktur seperti: pdf_sources/ktp/, pdf_sources/ijazah/, dst.")
+        return
 
-                    if SAVE_GRAYSCALE:
-                        cv2.imwrite(output_path, processed)
-                    else:
-                        cv2.imwrite(output_path, cv2.cvtColor(processed, cv2.COLOR_GRAY2BGR))
+    workers = workers or os.cpu_count() or 1
+    if downscale_first is None:
+        downscale_first = DOWNSCALE_BEFORE_DENOISE
+    if force and os.path.exists(MANIFEST_PATH):
+        os.remove(MANIFEST_PATH)
+    manifest = load_manifest()
 
-                    total_saved += 1
+    print(f"🚀 Mulai konversi PDF dari '{PDF_SOURCE_DIR}' → '{DATASET_DIR}' ({workers} proses)")
+    tasks, already_done = _collect_tasks(category_dirs, manifest, downscale_first)
+    print(f"🧾 {len(tasks)} halaman baru akan diproses, {already_done} halaman sudah ada di manifest.")
 
-                doc.close()
-            except Exception as e:
-                print(f"⚠️ Gagal memproses '{pdf_filename}': {e}")
+    counts = {"saved": 0, "blank": 0, "error": 0}
+    # Manifest ditulis oleh proses utama saja, satu baris per halaman selesai,
+    # sehingga proses yang terhenti di tengah jalan bisa dilanjutkan.
+    with open(MANIFEST_PATH, 'a') as manifest_file, ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(process_page, tasks, chunksize=4)
+        for entry in tqdm(results, total=len(tasks), desc="  → Halaman", colour="green"):
+            counts[entry["status"]] += 1
+            if entry["status"] == "error":
+                print(f"⚠️ Gagal memproses '{entry['pdf']}' halaman {entry['page'] + 1}: {entry['error']}")
+            manifest_file.write(json.dumps(entry) + "\n")
+            manifest_file.flush()
 
     print("\n========================================================")
     print(f"✅ Dataset selesai dibuat!")
-    print(f"📊 Total gambar tersimpan : {total_saved}")
-    print(f"🧹 Halaman kosong dilewati : {total_skipped}")
+    print(f"📊 Total gambar tersimpan : {counts['saved']}")
+    print(f"🧹 Halaman kosong dilewati : {counts['blank']}")
+    print(f"⏭️  Halaman dari run sebelumnya : {already_done}")
+    if counts['error']:
+        print(f"⚠️ Halaman gagal : {counts['error']}")
     print(f"📁 Lokasi dataset: '{DATASET_DIR}'")
     print("========================================================")
 
 
+def pack_dataset(dataset_dir=DATASET_DIR, packed_dir=PACKED_DIR, shard_size=SHARD_SIZE):
+    """
+    Mengemas seluruh PNG di dataset_dir menjadi shard `images_XXXXX.npy` (uint8) dan
+    `labels_XXXXX.npy` (int32) plus `index.json` (nama kelas, ukuran, daftar shard).
+    Urutan kelas sama dengan image_dataset_from_directory (alfabetis).
+    """
+    if not os.path.isdir(dataset_dir):
+        print(f"❌ Folder dataset '{dataset_dir}' tidak ditemukan.")
+        return
+
+    class_names = sorted(d for d in os.listdir(dataset_dir) if os.path.isdir(os.path.join(dataset_dir, d)))
+    files = [
+        (os.path.join(dataset_dir, class_name, f), label)
+        for label, class_name in enumerate(class_names)
+        for f in sorted(os.listdir(os.path.join(dataset_dir, class_name)))
+        if f.lower().endswith(('.png', '.jpg', '.jpeg'))
+    ]
+    if not files:
+        print(f"⚠️ Tidak ada gambar di '{dataset_dir}' untuk dikemas.")
+        return
+
+    os.makedirs(packed_dir, exist_ok=True)
+    for old in os.listdir(packed_dir):
+        if old.startswith(('images_', 'labels_')) and old.endswith('.npy'):
+            os.remove(os.path.join(packed_dir, old))
+
+    def _read(path):
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError(f"Gagal membaca gambar '{path}'")
+        if img.shape != (IMG_SIZE[1], IMG_SIZE[0]):
+            img = cv2.resize(img, IMG_SIZE, interpolation=cv2.INTER_AREA)
+        return img
+
+    print(f"📦 Mengemas {len(files)} gambar dari '{dataset_dir}' → '{packed_dir}'")
+    shards = []
+    # cv2.imread melepas GIL, jadi decode PNG paralel cukup dengan thread
+    with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        for shard_idx, start in enumerate(range(0, len(files), shard_size)):
+            chunk = files[start:start + shard_size]
+            images_name, labels_name = f"images_{shard_idx:05d}.npy", f"labels_{shard_idx:05d}.npy"
+            images = np.lib.format.open_memmap(
+                os.path.join(packed_dir, images_name), mode='w+', dtype=np.uint8,
+                shape=(len(chunk), IMG_SIZE[1], IMG_SIZE[0], 1),
+            )
+            decoded = executor.map(_read, [path for path, _ in chunk])
+            for i, img in enumerate(tqdm(decoded, total=len(chunk), desc=f"  → shard {shard_idx}", colour="green")):
+                images[i, :, :, 0] = img
+            images.flush()
+            del images
+            np.save(os.path.join(packed_dir, labels_name), np.array([label for _, label in chunk], dtype=np.int32))
+            shards.append({"images": images_name, "labels": labels_name, "count": len(chunk)})
+
+    index = {
+        "class_names": class_names,
+        "img_size": list(IMG_SIZE),
+        "channels": 1,
+        "count": len(files),
+        "shards": shards,
+        "files": [os.path.relpath(path, dataset_dir) for path, _ in files],
+    }
+    # Tulis index terakhir dan secara atomik, supaya pembaca tidak melihat pack setengah jadi
+    tmp_path = os.path.join(packed_dir, 'index.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(packed_dir, 'index.json'))
+    print(f"✅ {len(shards)} shard disimpan di '{packed_dir}'")
+
+
 if __name__ == "__main__":
-    convert_pdfs_to_images()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Konversi PDF di pdf_sources/ menjadi dataset gambar.")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah proses paralel (default: jumlah core CPU)")
+    parser.add_argument("--downscale-first", action="store_true", help="Kecilkan gambar sebelum denoise (jauh lebih cepat)")
+    parser.add_argument("--force", action="store_true", help="Abaikan manifest dan proses ulang semua halaman")
+    parser.add_argument("--pack", action="store_true", help=f"Setelah konversi, kemas dataset menjadi shard di '{PACKED_DIR}'")
+    parser.add_argument("--pack-only", action="store_true", help="Hanya kemas dataset yang sudah ada, tanpa konversi PDF")
+    args = parser.parse_args()
+    if not args.pack_only:
+        convert_pdfs_to_images(workers=args.workers, downscale_first=args.downscale_first or None, force=args.force)
+    if args.pack or args.pack_only:
+        pack_dataset()
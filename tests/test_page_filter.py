@@ -0,0 +1,55 @@
+import cv2
+import fitz
+import numpy as np
+import pytest
+
+from app.modules.page_filter import BLANK, is_blank_page, plan_pages, render_thumbnail
+
+A4 = (595, 842)
+SCAN_SIZE = (1240, 1754)  # A4 pada 150 dpi
+
+
+def _scan(draw=None) -> bytes:
+    """PNG halaman scan putih; `draw(img)` menambahkan isi."""
+    img = np.full((SCAN_SIZE[1], SCAN_SIZE[0]), 255, dtype=np.uint8)
+    if draw:
+        draw(img)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def _one_line(img):
+    cv2.putText(img, "Lampiran 1", (120, 900), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 0, 2)
+
+
+def _stamp(img):
+    cv2.circle(img, (1000, 1500), 45, 0, 3)
+
+
+def _speckles(img):
+    rng = np.random.default_rng(0)
+    ys = rng.integers(0, SCAN_SIZE[1], 400)
+    xs = rng.integers(0, SCAN_SIZE[0], 400)
+    img[ys, xs] = 0
+
+
+@pytest.fixture
+def scanned_doc():
+    doc = fitz.open()
+    for draw in (None, _one_line, _stamp, _speckles):
+        page = doc.new_page(width=A4[0], height=A4[1])
+        page.insert_image(page.rect, stream=_scan(draw))
+    yield doc
+    doc.close()
+
+
+def test_sparse_scanned_pages_are_not_blank(scanned_doc):
+    thumbnails = [render_thumbnail(page) for page in scanned_doc]
+    # Prasyarat: di thumbnail 224x224 halaman jarang isi memang terlihat kosong
+    assert is_blank_page(thumbnails[1]) and is_blank_page(thumbnails[2])
+
+    plan = plan_pages(scanned_doc, thumbnails, [""] * len(scanned_doc))
+
+    assert plan[0] == (BLANK, -1)
+    assert plan[1] is None  # satu baris teks
+    assert plan[2] is None  # stempel kecil
+    assert plan[3] == (BLANK, -1)  # hanya bintik noise scan
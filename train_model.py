@@ -1,14 +1,20 @@
 import os
 import json
+import time
+import hashlib
+import argparse
+import numpy as np
 import tensorflow as tf
 import keras
 import matplotlib.pyplot as plt
-from tensorflow.keras.applications import EfficientNetV2S
-from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
+from tensorflow.keras.applications import EfficientNetV2S, EfficientNetV2B0, MobileNetV3Small, MobileNetV3Large
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint, Callback
+from app.modules.model_registry import register_model, STUDENT_MODEL_FILENAME
+from app.modules.ocr_policy import fit_class_thresholds, thresholds_path_for, STUDENT_THRESHOLDS_FILENAME
 
-# 🧩 Mixed precision untuk RTX 3050 (lebih cepat & efisien)
+# 🧩 Mixed precision hanya dipakai di GPU (lihat apply_training_profile);
+# di CPU float16 justru lebih lambat.
 from tensorflow.keras import mixed_precision
-mixed_precision.set_global_policy('mixed_float16')
 
 @keras.saving.register_keras_serializable()
 def grayscale_to_rgb(x):
@@ -23,26 +29,580 @@ EPOCHS = 35
 FINE_TUNE_EPOCHS = 15
 MODEL_SAVE_PATH = 'document_classifier_model.keras'
 CLASS_NAMES_SAVE_PATH = 'class_names.json'
+TIMING_REPORT_PATH = 'training_timing.json'
+# Cache embedding backbone (per backbone, per hash gambar) untuk mode training "head"
+EMBEDDING_CACHE_DIR = 'embedding_cache'
+HEAD_EPOCHS = 100
+HEAD_BATCH_SIZE = 64
 
-def train():
-    """Melatih model klasifikasi dokumen dengan optimasi GPU RTX 3050."""
+# --- Distilasi: student CNN kecil sebagai jalur cepat dl_classifier ---
+STUDENT_MODEL_SAVE_PATH = STUDENT_MODEL_FILENAME
+STUDENT_IMG_SIZE = (128, 128)
+DISTILL_EPOCHS = 60
+DISTILL_TEMPERATURE = 4.0
+DISTILL_ALPHA = 0.7  # bobot loss soft label teacher; sisanya loss label asli
+DISTILLATION_REPORT_PATH = 'distillation_report.json'
 
-    if not os.path.exists(DATASET_PATH) or not os.listdir(DATASET_PATH):
+# --- Profil Training ---
+# "gpu": mixed precision, thread pool bawaan TF.
+# "cpu": float32, intra-op = jumlah core, inter-op kecil agar tidak oversubscribe.
+TRAINING_PROFILES = {
+    "gpu": {"precision": "mixed_float16", "intra_op_threads": 0, "inter_op_threads": 0},
+    "cpu": {"precision": "float32", "intra_op_threads": os.cpu_count() or 1, "inter_op_threads": 2},
+}
+
+# Backbone yang bisa dipilih: (kelas aplikasi Keras, fungsi preprocess_input)
+BACKBONES = {
+    "efficientnetv2s": (EfficientNetV2S, tf.keras.applications.efficientnet_v2.preprocess_input),
+    "efficientnetv2b0": (EfficientNetV2B0, tf.keras.applications.efficientnet_v2.preprocess_input),
+    "mobilenetv3small": (MobileNetV3Small, tf.keras.applications.mobilenet_v3.preprocess_input),
+    "mobilenetv3large": (MobileNetV3Large, tf.keras.applications.mobilenet_v3.preprocess_input),
+}
+DEFAULT_BACKBONE = "efficientnetv2s"
+
+def apply_training_profile(profile="auto", threads=None):
+    """
+    Mendeteksi device, memilih precision policy, dan mengatur ukuran thread pool TF.
+    Harus dipanggil sebelum operasi TF pertama dijalankan.
+    """
+    gpus = tf.config.list_physical_devices('GPU')
+    if profile == "auto":
+        profile = "gpu" if gpus else "cpu"
+    settings = dict(TRAINING_PROFILES[profile])
+    if threads:
+        settings["intra_op_threads"] = threads
+
+    tf.config.threading.set_intra_op_parallelism_threads(settings["intra_op_threads"])
+    tf.config.threading.set_inter_op_parallelism_threads(settings["inter_op_threads"])
+    mixed_precision.set_global_policy(settings["precision"])
+
+    print(f"⚙️ Profil training: {profile} (GPU terdeteksi: {len(gpus)}) | precision={settings['precision']} | "
+          f"intra_op={settings['intra_op_threads'] or 'default'} inter_op={settings['inter_op_threads'] or 'default'}")
+    return {"profile": profile, **settings}
+
+class EpochTimer(Callback):
+    """Mencatat durasi dan throughput setiap epoch."""
+
+    def __init__(self, images_per_epoch=None):
+        super().__init__()
+        self.images_per_epoch = images_per_epoch
+        self.records = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        duration = time.perf_counter() - self._start
+        record = {"epoch": epoch + 1, "seconds": round(duration, 2)}
+        if self.images_per_epoch:
+            record["images_per_sec"] = round(self.images_per_epoch / duration, 1)
+        record.update({k: round(float(v), 4) for k, v in (logs or {}).items() if k in ("loss", "accuracy", "val_loss", "val_accuracy")})
+        self.records.append(record)
+        rate = f" ({record['images_per_sec']} img/s)" if "images_per_sec" in record else ""
+        print(f"⏱️ Epoch {epoch + 1}: {duration:.1f} detik{rate}")
+
+def build_feature_extractor(backbone, weights='imagenet'):
+    """Gambar grayscale 224x224x1 → embedding hasil GlobalAveragePooling backbone (beku)."""
+    backbone_cls, preprocess_input = BACKBONES[backbone]
+    base_model = backbone_cls(
+        input_shape=(224, 224, 3),
+        include_top=False,
+        weights=weights
+    )
+    base_model.trainable = False
+
+    inputs = tf.keras.Input(shape=(224, 224, 1))
+    x = tf.keras.layers.Lambda(grayscale_to_rgb)(inputs)
+    x = tf.keras.layers.Resizing(IMG_SIZE[0], IMG_SIZE[1])(x)
+    x = preprocess_input(x)
+
+    x = base_model(x, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    return tf.keras.Model(inputs, x, name="feature_extractor"), base_model
+
+def build_head(embedding_dim, num_classes):
+    """Kepala klasifikasi (dense) di atas embedding."""
+    inputs = tf.keras.Input(shape=(embedding_dim,))
+    x = tf.keras.layers.Dense(256, activation='relu')(inputs)
+    x = tf.keras.layers.Dropout(0.4)(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation='softmax', dtype='float32')(x)
+    return tf.keras.Model(inputs, outputs, name="classifier_head")
+
+def build_classifier(feature_extractor, head):
+    inputs = tf.keras.Input(shape=(224, 224, 1))
+    return tf.keras.Model(inputs, head(feature_extractor(inputs)))
+
+class EmbeddingCache:
+    """
+    Penyimpanan embedding append-only: setiap run menulis shard baru
+    `shard_<ts>.npy` (float16) + `shard_<ts>.json` (daftar hash gambar).
+    Gambar yang hash-nya sudah ada tidak perlu melewati backbone lagi.
+    """
+
+    def __init__(self, backbone, cache_dir=EMBEDDING_CACHE_DIR):
+        self.dir = os.path.join(cache_dir, backbone)
+        os.makedirs(self.dir, exist_ok=True)
+        self._shards = []
+        self._index = {}
+        for name in sorted(os.listdir(self.dir)):
+            # File .json ditulis setelah .npy, jadi keberadaannya menandai shard lengkap
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(self.dir, name), 'r') as f:
+                keys = json.load(f)
+            self._shards.append(np.load(os.path.join(self.dir, name[:-5] + '.npy'), mmap_mode='r'))
+            for row, key in enumerate(keys):
+                self._index[key] = (len(self._shards) - 1, row)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def add(self, keys, embeddings):
+        if not keys:
+            return
+        name = f"shard_{time.time_ns()}"
+        np.save(os.path.join(self.dir, name + '.npy'), np.asarray(embeddings, dtype=np.float16))
+        with open(os.path.join(self.dir, name + '.json'), 'w') as f:
+            json.dump(list(keys), f)
+        self._shards.append(np.load(os.path.join(self.dir, name + '.npy'), mmap_mode='r'))
+        for row, key in enumerate(keys):
+            self._index[key] = (len(self._shards) - 1, row)
+
+    def get_many(self, keys):
+        return np.stack([self._shards[s][r] for s, r in (self._index[k] for k in keys)]).astype(np.float32)
+
+def _collect_samples():
+    """
+    Mengumpulkan seluruh gambar training sebagai (keys, labels, class_names, load_batch).
+    Key = SHA-256 isi gambar, sehingga gambar yang sama tidak dihitung ulang.
+    Memakai dataset packed jika ada, jika tidak folder dataset/.
+    """
+    index_path = os.path.join(PACKED_DATASET_PATH, 'index.json')
+    if os.path.exists(index_path):
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+        images = [np.load(os.path.join(PACKED_DATASET_PATH, s['images']), mmap_mode='r') for s in index['shards']]
+        labels = np.concatenate([np.load(os.path.join(PACKED_DATASET_PATH, s['labels'])) for s in index['shards']])
+        rows = [(i, r) for i, s in enumerate(index['shards']) for r in range(s['count'])]
+        keys = [hashlib.sha256(images[i][r].tobytes()).hexdigest() for i, r in rows]
+
+        def load_batch(batch_indices):
+            return np.stack([images[rows[k][0]][rows[k][1]] for k in batch_indices]).astype(np.float32)
+
+        return keys, labels, index['class_names'], load_batch
+
+    class_names = sorted(d for d in os.listdir(DATASET_PATH) if os.path.isdir(os.path.join(DATASET_PATH, d)))
+    files = [
+        (os.path.join(DATASET_PATH, class_name, f), label)
+        for label, class_name in enumerate(class_names)
+        for f in sorted(os.listdir(os.path.join(DATASET_PATH, class_name)))
+        if f.lower().endswith(('.png', '.jpg', '.jpeg'))
+    ]
+    keys = []
+    for path, _ in files:
+        with open(path, 'rb') as f:
+            keys.append(hashlib.sha256(f.read()).hexdigest())
+    labels = np.array([label for _, label in files], dtype=np.int32)
+
+    def load_batch(batch_indices):
+        batch = []
+        for k in batch_indices:
+            img = tf.io.decode_image(tf.io.read_file(files[k][0]), channels=1, expand_animations=False)
+            batch.append(tf.image.resize(img, IMG_SIZE).numpy())
+        return np.stack(batch).astype(np.float32)
+
+    return keys, labels, class_names, load_batch
+
+def train_head_from_embeddings(profile="auto", backbone=DEFAULT_BACKBONE, threads=None, register=False):
+    """
+    Mode "head": hitung embedding backbone hanya untuk gambar yang belum ada di cache,
+    lalu latih kepala dense di atas embedding tersebut. Hasilnya digabung dengan
+    backbone menjadi model penuh di MODEL_SAVE_PATH (format sama dengan mode full).
+    Catatan: augmentasi tidak dipakai di mode ini karena embedding sudah tetap.
+    """
+    if backbone not in BACKBONES:
+        print(f"❌ Backbone '{backbone}' tidak dikenal. Pilihan: {', '.join(BACKBONES)}")
+        return
+    profile_settings = apply_training_profile(profile, threads)
+
+    if not os.path.exists(os.path.join(PACKED_DATASET_PATH, 'index.json')) and (not os.path.exists(DATASET_PATH) or not os.listdir(DATASET_PATH)):
         print(f"❌ Error: Folder '{DATASET_PATH}' kosong atau tidak ditemukan.")
         return
 
+    print("📦 Mengumpulkan gambar & hash...")
+    keys, labels, class_names, load_batch = _collect_samples()
+    if not class_names or not keys:
+        print("❌ Tidak ada gambar/kelas di dataset.")
+        return
+    print(f"✅ {len(keys)} gambar, kelas terdeteksi: {class_names}")
+    with open(CLASS_NAMES_SAVE_PATH, 'w') as f:
+        json.dump(class_names, f)
+
+    feature_extractor, _ = build_feature_extractor(backbone)
+    cache = EmbeddingCache(backbone)
+    missing = [i for i, key in enumerate(keys) if key not in cache]
+    # Gambar duplikat (hash sama) cukup dihitung sekali
+    missing = list({keys[i]: i for i in missing}.values())
+    print(f"🧮 Embedding di cache: {len(cache)} | perlu dihitung: {len(missing)}")
+
+    start = time.perf_counter()
+    chunk = BATCH_SIZE * 8
+    for offset in range(0, len(missing), chunk):
+        batch_indices = missing[offset:offset + chunk]
+        embeddings = feature_extractor.predict(load_batch(batch_indices), batch_size=BATCH_SIZE, verbose=0)
+        cache.add([keys[i] for i in batch_indices], embeddings)
+        print(f"  → {min(offset + chunk, len(missing))}/{len(missing)} embedding")
+    embed_seconds = time.perf_counter() - start
+
+    X = cache.get_many(keys)
+    order = np.random.default_rng(SEED).permutation(len(keys))
+    n_val = int(len(keys) * VALIDATION_SPLIT)
+    val_idx, train_idx = order[:n_val], order[n_val:]
+    train_ds = tf.data.Dataset.from_tensor_slices((X[train_idx], labels[train_idx])).shuffle(len(train_idx), seed=SEED).batch(HEAD_BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+    val_ds = tf.data.Dataset.from_tensor_slices((X[val_idx], labels[val_idx])).batch(HEAD_BATCH_SIZE)
+
+    head = build_head(X.shape[1], len(class_names))
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        loss='sparse_categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    epoch_timer = EpochTimer(images_per_epoch=len(train_idx))
+    print(f"\n🚀 Melatih kepala klasifikasi di atas embedding ({HEAD_EPOCHS} epochs maks)...")
+    head.fit(
+        train_ds,
+        validation_data=val_ds if n_val else None,
+        epochs=HEAD_EPOCHS,
+        callbacks=[EarlyStopping(monitor='val_loss' if n_val else 'loss', patience=10, restore_best_weights=True), epoch_timer],
+        verbose=2
+    )
+
+    model = build_classifier(feature_extractor, head)
+    print(f"\n💾 Menyimpan model final ke '{MODEL_SAVE_PATH}'...")
+    model.save(MODEL_SAVE_PATH)
+    print("✅ Model berhasil disimpan!")
+    remove_stale_student()
+
+    head_seconds = sum(r["seconds"] for r in epoch_timer.records)
+    with open(TIMING_REPORT_PATH, 'w') as f:
+        json.dump({"mode": "head", "backbone": backbone, **profile_settings,
+                   "embedded_images": len(missing), "embedding_seconds": round(embed_seconds, 2),
+                   "total_seconds": round(embed_seconds + head_seconds, 2), "epochs": epoch_timer.records}, f, indent=2)
+    print(f"⏱️ Embedding {len(missing)} gambar: {embed_seconds:.1f} detik | training head: {head_seconds:.1f} detik")
+
+    val_probs = head.predict(X[val_idx], batch_size=HEAD_BATCH_SIZE, verbose=0) if n_val else np.empty((0, len(class_names)))
+    ocr_report = calibrate_ocr_thresholds(val_probs, labels[val_idx], class_names)
+
+    if register:
+        register_trained_model({"mode": "head", "backbone": backbone, "classes": len(class_names),
+                                "expected_ocr_rate": ocr_report["expected_ocr_rate"] if ocr_report else None})
+
+def calibrate_ocr_thresholds(probs, labels, class_names):
+    """
+    Fit ambang fallback OCR per kelas dari prediksi split validasi, simpan di
+    samping class_names.json, dan cetak perkiraan porsi halaman yang akan di-OCR.
+    """
+    path = thresholds_path_for(CLASS_NAMES_SAVE_PATH)
+    if len(labels) == 0:
+        # Tanpa data validasi jangan tinggalkan ambang milik model sebelumnya
+        if os.path.exists(path):
+            os.remove(path)
+        print("⚠️ Tidak ada data validasi, ambang OCR memakai nilai default.")
+        return None
+
+    result = fit_class_thresholds(np.asarray(probs), np.asarray(labels), class_names)
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    report = result["report"]
+    print(f"🎯 Ambang OCR per kelas disimpan di '{path}'")
+    print(f"   Perkiraan halaman yang di-OCR: {report['ocr_rate_legacy_double_softmax']:.1%} (kebijakan lama) → "
+          f"{report['ocr_rate_flat_threshold']:.1%} (ambang {report['baseline_threshold']}) → {report['expected_ocr_rate']:.1%} (terkalibrasi)")
+    print(f"   Akurasi halaman tanpa OCR: {report['accepted_accuracy_flat_threshold']} → {report['accepted_accuracy_calibrated']}")
+    return report
+
+def remove_stale_student():
+    """Student hasil distilasi teacher lama tidak boleh ikut terdaftar bersama teacher baru."""
+    for path in (STUDENT_MODEL_SAVE_PATH, thresholds_path_for(CLASS_NAMES_SAVE_PATH, STUDENT_THRESHOLDS_FILENAME)):
+        if os.path.exists(path):
+            os.remove(path)
+            print(f"🧹 '{path}' dihapus karena teacher berubah; jalankan --mode distill untuk student baru.")
+
+def register_trained_model(metadata):
+    """Mendaftarkan model & class_names hasil training sebagai versi baru yang aktif di registry."""
+    candidates = [
+        thresholds_path_for(CLASS_NAMES_SAVE_PATH),
+        STUDENT_MODEL_SAVE_PATH,
+        thresholds_path_for(CLASS_NAMES_SAVE_PATH, STUDENT_THRESHOLDS_FILENAME),
+    ]
+    extra_files = [path for path in candidates if os.path.exists(path)]
+    version = register_model(MODEL_SAVE_PATH, CLASS_NAMES_SAVE_PATH, extra_files=extra_files, metadata=metadata)
+    print(f"📚 Model didaftarkan ke registry sebagai versi '{version}' (aktif, hot-reload oleh server)")
+    return version
+
+def build_student(num_classes, img_size=STUDENT_IMG_SIZE):
+    """
+    CNN kecil (~0,3 juta parameter) untuk input grayscale 128x128: stem konvolusi
+    lalu blok depthwise-separable. Output berupa logits (softmax ditambahkan saat disimpan).
+    """
+    def conv_bn_relu(x, layer):
+        x = layer(x)
+        x = tf.keras.layers.BatchNormalization()(x)
+        return tf.keras.layers.ReLU()(x)
+
+    inputs = tf.keras.Input(shape=(img_size[0], img_size[1], 1))
+    x = tf.keras.layers.Rescaling(1.0 / 255)(inputs)
+    x = conv_bn_relu(x, tf.keras.layers.Conv2D(32, 3, strides=2, padding='same', use_bias=False))
+    for filters in (48, 96, 192, 384):
+        x = conv_bn_relu(x, tf.keras.layers.SeparableConv2D(filters, 3, padding='same', use_bias=False))
+        x = conv_bn_relu(x, tf.keras.layers.SeparableConv2D(filters, 3, padding='same', use_bias=False))
+        x = tf.keras.layers.MaxPooling2D()(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    x = tf.keras.layers.Dropout(0.3)(x)
+    logits = tf.keras.layers.Dense(num_classes, dtype='float32', name='logits')(x)
+    return tf.keras.Model(inputs, logits, name="student")
+
+def build_student_serving(student):
+    """Student + softmax, format output sama dengan teacher (probabilitas)."""
+    probabilities = tf.keras.layers.Softmax(dtype='float32', name='probabilities')(student.output)
+    return tf.keras.Model(student.input, probabilities, name="student_classifier")
+
+def resize_for_student(images):
+    # INTER_AREA di dl_classifier setara dengan metode 'area' di sini
+    return tf.image.resize(images, STUDENT_IMG_SIZE, method='area')
+
+class Distiller(tf.keras.Model):
+    """
+    Membungkus student & teacher (beku). Loss = alpha * cross-entropy terhadap soft
+    label teacher pada temperature T (dikali T^2) + (1 - alpha) * cross-entropy label asli.
+    Teacher menerima gambar 224x224, student versi yang dikecilkan ke 128x128.
+    """
+
+    def __init__(self, student, teacher, temperature=DISTILL_TEMPERATURE, alpha=DISTILL_ALPHA):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def call(self, x, training=False):
+        return self.student(resize_for_student(x), training=training)
+
+    def compute_loss(self, x=None, y=None, y_pred=None, sample_weight=None, **kwargs):
+        t = self.temperature
+        # Output teacher sudah softmax; log-nya setara logits untuk pelunakan dengan T
+        teacher_probs = tf.cast(self.teacher(x, training=False), tf.float32)
+        soft_targets = tf.nn.softmax(tf.math.log(teacher_probs + 1e-8) / t)
+        soft_loss = -tf.reduce_mean(tf.reduce_sum(soft_targets * tf.nn.log_softmax(y_pred / t), axis=-1)) * (t * t)
+        hard_loss = tf.reduce_mean(tf.keras.losses.sparse_categorical_crossentropy(y, y_pred, from_logits=True))
+        return self.alpha * soft_loss + (1 - self.alpha) * hard_loss
+
+def _latency_ms(model, sample, repeats=50):
+    """Rata-rata latensi satu gambar (batch 1), setelah pemanasan."""
+    model(sample, training=False)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model(sample, training=False)
+    return round((time.perf_counter() - start) / repeats * 1000, 2)
+
+def compare_teacher_student(teacher, student, validation_dataset):
+    """Akurasi, kesepakatan, ukuran, dan latensi teacher vs student pada split validasi."""
+    teacher_probs, student_probs, labels = [], [], []
+    for images, batch_labels in validation_dataset:
+        teacher_probs.append(teacher.predict_on_batch(images))
+        student_probs.append(student.predict_on_batch(resize_for_student(images)))
+        labels.append(batch_labels.numpy())
+    teacher_probs, student_probs, labels = np.concatenate(teacher_probs), np.concatenate(student_probs), np.concatenate(labels)
+    teacher_pred, student_pred = teacher_probs.argmax(axis=1), student_probs.argmax(axis=1)
+
+    sample = next(iter(validation_dataset))[0][:1]
+    report = {
+        "validation_samples": int(len(labels)),
+        "teacher": {"accuracy": round(float((teacher_pred == labels).mean()), 4), "params": int(teacher.count_params()),
+                    "latency_ms": _latency_ms(teacher, sample)},
+        "student": {"accuracy": round(float((student_pred == labels).mean()), 4), "params": int(student.count_params()),
+                    "latency_ms": _latency_ms(student, resize_for_student(sample)), "input_size": list(STUDENT_IMG_SIZE)},
+        "agreement": round(float((teacher_pred == student_pred).mean()), 4),
+    }
+    return report, student_probs, labels
+
+def distill_student(profile="auto", threads=None, register=False, epochs=DISTILL_EPOCHS):
+    """
+    Mode "distill": melatih student CNN kecil dari soft label teacher (MODEL_SAVE_PATH)
+    lalu menyimpan student, ambang eskalasi ke teacher per kelas, dan laporan perbandingan.
+    """
+    if not os.path.exists(MODEL_SAVE_PATH) or not os.path.exists(CLASS_NAMES_SAVE_PATH):
+        print(f"❌ Teacher '{MODEL_SAVE_PATH}' belum ada. Latih dulu dengan --mode full atau --mode head.")
+        return
+    profile_settings = apply_training_profile(profile, threads)
+
+    datasets = load_train_val_datasets()
+    if datasets is None:
+        return
+    train_dataset, validation_dataset, class_names = datasets
+    with open(CLASS_NAMES_SAVE_PATH, 'r') as f:
+        teacher_classes = json.load(f)
+    if list(class_names) != teacher_classes:
+        print("❌ Kelas di dataset berbeda dengan kelas teacher; latih ulang teacher terlebih dahulu.")
+        return
+
+    print(f"🧑‍🏫 Memuat teacher dari '{MODEL_SAVE_PATH}'...")
+    teacher = tf.keras.models.load_model(MODEL_SAVE_PATH)
+    teacher.trainable = False
+
+    AUTOTUNE = tf.data.AUTOTUNE
+    data_augmentation = build_augmentation()
+    train_dataset = train_dataset.map(
+        lambda x, y: (data_augmentation(x, training=True), y),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
+
+    student = build_student(len(class_names))
+    print(f"🧒 Student: {student.count_params():,} parameter, input {STUDENT_IMG_SIZE[0]}x{STUDENT_IMG_SIZE[1]} grayscale")
+    distiller = Distiller(student, teacher)
+    distiller.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=1e-3), metrics=['accuracy'])
+
+    steps_per_epoch = int(train_dataset.cardinality())
+    epoch_timer = EpochTimer(images_per_epoch=steps_per_epoch * BATCH_SIZE if steps_per_epoch > 0 else None)
+    print(f"\n🚀 Distilasi ({epochs} epochs maks, T={DISTILL_TEMPERATURE}, alpha={DISTILL_ALPHA})...")
+    distiller.fit(
+        train_dataset,
+        validation_data=validation_dataset,
+        epochs=epochs,
+        callbacks=[
+            EarlyStopping(monitor='val_accuracy', mode='max', patience=10, restore_best_weights=True),
+            ReduceLROnPlateau(monitor='val_loss', factor=0.3, patience=5, verbose=1),
+            epoch_timer,
+        ],
+        verbose=2
+    )
+
+    serving = build_student_serving(student)
+    serving.save(STUDENT_MODEL_SAVE_PATH)
+    print(f"💾 Student disimpan ke '{STUDENT_MODEL_SAVE_PATH}'")
+
+    report, student_probs, labels = compare_teacher_student(teacher, serving, validation_dataset)
+    # Prediksi student diterima tanpa teacher hanya jika sama presisinya dengan akurasi teacher
+    thresholds_path = thresholds_path_for(CLASS_NAMES_SAVE_PATH, STUDENT_THRESHOLDS_FILENAME)
+    escalation = fit_class_thresholds(student_probs, labels, class_names, target_precision=report["teacher"]["accuracy"])
+    with open(thresholds_path, 'w') as f:
+        json.dump(escalation, f, indent=2)
+    report["expected_teacher_rate"] = escalation["report"]["expected_ocr_rate"]
+    report["accepted_student_accuracy"] = escalation["report"]["accepted_accuracy_calibrated"]
+    report.update({"profile": profile_settings, "epochs": epoch_timer.records})
+    with open(DISTILLATION_REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    t, st = report["teacher"], report["student"]
+    print(f"\n📊 {'':<8} {'akurasi':>8} {'parameter':>12} {'latensi':>10}")
+    print(f"   {'teacher':<8} {t['accuracy']:>8.2%} {t['params']:>12,} {t['latency_ms']:>8} ms")
+    print(f"   {'student':<8} {st['accuracy']:>8.2%} {st['params']:>12,} {st['latency_ms']:>8} ms")
+    print(f"   Kesepakatan {report['agreement']:.2%} | halaman yang masih butuh teacher ≈ {report['expected_teacher_rate']:.1%} "
+          f"| laporan di '{DISTILLATION_REPORT_PATH}'")
+
+    if register:
+        register_trained_model({"mode": "distill", "classes": len(class_names),
+                                "student_accuracy": st["accuracy"], "teacher_accuracy": t["accuracy"]})
+
+def build_augmentation():
+    return tf.keras.Sequential([
+        tf.keras.layers.RandomRotation(0.3),
+        tf.keras.layers.RandomZoom(0.3),
+        tf.keras.layers.RandomContrast(0.3),
+        tf.keras.layers.RandomTranslation(0.1, 0.1),
+    ], name="data_augmentation")
+
+# Dataset packed hasil `python prepare_dataset.py --pack`; dipakai otomatis jika ada
+PACKED_DATASET_PATH = 'dataset_packed'
+VALIDATION_SPLIT = 0.2
+SEED = 123
+
+def load_packed_datasets(packed_dir=PACKED_DATASET_PATH):
+    """
+    Membuat pipeline tf.data dari shard memmap uint8 (lihat prepare_dataset.pack_dataset).
+    Gambar dibaca per batch langsung dari file (page cache OS), tanpa .cache() di RAM.
+    """
+    with open(os.path.join(packed_dir, 'index.json'), 'r') as f:
+        index = json.load(f)
+
+    images = [np.load(os.path.join(packed_dir, s['images']), mmap_mode='r') for s in index['shards']]
+    labels = np.concatenate([np.load(os.path.join(packed_dir, s['labels'])) for s in index['shards']])
+    shard_of = np.concatenate([np.full(s['count'], i, dtype=np.int32) for i, s in enumerate(index['shards'])])
+    offset_of = np.concatenate([np.arange(s['count'], dtype=np.int64) for s in index['shards']])
+    width, height = index['img_size']
+
+    order = np.random.default_rng(SEED).permutation(index['count'])
+    n_val = int(index['count'] * VALIDATION_SPLIT)
+    val_indices, train_indices = np.sort(order[:n_val]), order[n_val:]
+    print(f"Found {index['count']} files belonging to {len(index['class_names'])} classes (packed).")
+    print(f"Using {len(train_indices)} files for training, {len(val_indices)} files for validation.")
+
+    def _gather(batch_indices):
+        batch = np.empty((len(batch_indices), height, width, 1), dtype=np.uint8)
+        for j, k in enumerate(batch_indices):
+            batch[j] = images[shard_of[k]][offset_of[k]]
+        return batch, labels[batch_indices]
+
+    def _load(batch_indices):
+        x, y = tf.numpy_function(_gather, [batch_indices], [tf.uint8, tf.int32])
+        x = tf.ensure_shape(tf.cast(x, tf.float32), [None, height, width, 1])
+        return x, tf.ensure_shape(y, [None])
+
+    AUTOTUNE = tf.data.AUTOTUNE
+
+    def _make(indices, training):
+        ds = tf.data.Dataset.from_tensor_slices(indices)
+        if training:
+            ds = ds.shuffle(len(indices), seed=SEED, reshuffle_each_iteration=True)
+        ds = ds.batch(BATCH_SIZE)
+        ds = ds.map(_load, num_parallel_calls=AUTOTUNE, deterministic=not training)
+        return ds.prefetch(AUTOTUNE)
+
+    return _make(train_indices, True), _make(val_indices, False), index['class_names']
+
+
+def load_train_val_datasets():
+    """(train, validasi, class_names) dari dataset packed jika ada, jika tidak dari folder dataset/."""
+    AUTOTUNE = tf.data.AUTOTUNE
+    if os.path.exists(os.path.join(PACKED_DATASET_PATH, 'index.json')):
+        print(f"📦 Memuat dataset packed dari '{PACKED_DATASET_PATH}'...")
+        return load_packed_datasets()
+
+    if not os.path.exists(DATASET_PATH) or not os.listdir(DATASET_PATH):
+        print(f"❌ Error: Folder '{DATASET_PATH}' kosong atau tidak ditemukan.")
+        return None
+
     print("📦 Memuat dataset gambar...")
     train_dataset, validation_dataset = tf.keras.utils.image_dataset_from_directory(
         DATASET_PATH,
-        validation_split=0.2,
+        validation_split=VALIDATION_SPLIT,
         subset="both",
-        seed=123,
+        seed=SEED,
         image_size=IMG_SIZE,
         batch_size=BATCH_SIZE,
         color_mode='grayscale'
     )
-
     class_names = train_dataset.class_names
+    train_dataset = train_dataset.cache().prefetch(buffer_size=AUTOTUNE)
+    validation_dataset = validation_dataset.cache().prefetch(buffer_size=AUTOTUNE)
+    return train_dataset, validation_dataset, class_names
+
+def train(profile="auto", backbone=DEFAULT_BACKBONE, threads=None, register=False):
+    """Melatih model klasifikasi dokumen dengan profil device (GPU/CPU) dan backbone pilihan."""
+
+    if backbone not in BACKBONES:
+        print(f"❌ Backbone '{backbone}' tidak dikenal. Pilihan: {', '.join(BACKBONES)}")
+        return
+    profile_settings = apply_training_profile(profile, threads)
+
+    AUTOTUNE = tf.data.AUTOTUNE
+    datasets = load_train_val_datasets()
+    if datasets is None:
+        return
+    train_dataset, validation_dataset, class_names = datasets
+
     if not class_names:
         print("❌ Tidak ada subfolder kelas di dalam folder dataset.")
         return
@@ -53,38 +613,18 @@ def train():
         json.dump(class_names, f)
     print(f"📁 Nama kelas disimpan di '{CLASS_NAMES_SAVE_PATH}'")
 
-    AUTOTUNE = tf.data.AUTOTUNE
-    train_dataset = train_dataset.cache().prefetch(buffer_size=AUTOTUNE)
-    validation_dataset = validation_dataset.cache().prefetch(buffer_size=AUTOTUNE)
-
-    data_augmentation = tf.keras.Sequential([
-        tf.keras.layers.RandomRotation(0.3),
-        tf.keras.layers.RandomZoom(0.3),
-        tf.keras.layers.RandomContrast(0.3),
-        tf.keras.layers.RandomTranslation(0.1, 0.1),
-    ], name="data_augmentation")
-
-    print("🧠 Membangun model EfficientNetV2S (GPU Optimized)...")
-    base_model = EfficientNetV2S(
-        input_shape=(224, 224, 3),
-        include_top=False,
-        weights='imagenet'
-    )
-    base_model.trainable = False
+    # Augmentasi dijalankan di pipeline tf.data (paralel, di CPU host) alih-alih
+    # di dalam graph model, sehingga tidak membebani device utama tiap step.
+    data_augmentation = build_augmentation()
+    train_dataset = train_dataset.map(
+        lambda x, y: (data_augmentation(x, training=True), y),
+        num_parallel_calls=AUTOTUNE
+    ).prefetch(AUTOTUNE)
 
-    inputs = tf.keras.Input(shape=(224, 224, 1))
-    x = tf.keras.layers.Lambda(grayscale_to_rgb)(inputs)
-    x = data_augmentation(x)
-    x = tf.keras.layers.Resizing(IMG_SIZE[0], IMG_SIZE[1])(x)
-    x = tf.keras.applications.efficientnet_v2.preprocess_input(x)
-
-    x = base_model(x, training=False)
-    x = tf.keras.layers.GlobalAveragePooling2D()(x)
-    x = tf.keras.layers.Dense(256, activation='relu')(x)
-    x = tf.keras.layers.Dropout(0.4)(x)
-    outputs = tf.keras.layers.Dense(len(class_names), activation='softmax', dtype='float32')(x)
-
-    model = tf.keras.Model(inputs, outputs)
+    print(f"🧠 Membangun model {BACKBONES[backbone][0].__name__} (profil {profile_settings['profile']})...")
+    feature_extractor, base_model = build_feature_extractor(backbone)
+    head = build_head(feature_extractor.output_shape[-1], len(class_names))
+    model = build_classifier(feature_extractor, head)
 
     # --- [PERBAIKAN] Hapus lr_schedule ---
     # lr_schedule = tf.keras.optimizers.schedules.ExponentialDecay(
@@ -103,10 +643,13 @@ def train():
     model.summary()
 
     # Callback sudah benar, biarkan seperti ini
+    steps_per_epoch = int(train_dataset.cardinality())
+    epoch_timer = EpochTimer(images_per_epoch=steps_per_epoch * BATCH_SIZE if steps_per_epoch > 0 else None)
     callbacks = [
         EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True),
         ReduceLROnPlateau(monitor='val_loss', factor=0.3, patience=5, verbose=1),
-        ModelCheckpoint(MODEL_SAVE_PATH, save_best_only=True, monitor='val_accuracy', mode='max')
+        ModelCheckpoint(MODEL_SAVE_PATH, save_best_only=True, monitor='val_accuracy', mode='max'),
+        epoch_timer
     ]
 
     print(f"\n🚀 Mulai training awal ({EPOCHS} epochs)...")
@@ -142,6 +685,26 @@ def train():
     print(f"\n💾 Menyimpan model final ke '{MODEL_SAVE_PATH}'...")
     model.save(MODEL_SAVE_PATH)
     print("✅ Model berhasil disimpan!")
+    remove_stale_student()
+
+    if epoch_timer.records:
+        total_seconds = sum(r["seconds"] for r in epoch_timer.records)
+        with open(TIMING_REPORT_PATH, 'w') as f:
+            json.dump({"backbone": backbone, "batch_size": BATCH_SIZE, **profile_settings,
+                       "total_seconds": round(total_seconds, 2), "epochs": epoch_timer.records}, f, indent=2)
+        print(f"⏱️ Total waktu training {total_seconds / 60:.1f} menit "
+              f"(rata-rata {total_seconds / len(epoch_timer.records):.1f} detik/epoch), laporan di '{TIMING_REPORT_PATH}'")
+
+    # Label & prediksi dikumpulkan per batch yang sama agar urutannya pasti cocok
+    val_probs, val_labels = [np.empty((0, len(class_names)))], [np.empty((0,), dtype=np.int32)]
+    for images, batch_labels in validation_dataset:
+        val_probs.append(model.predict_on_batch(images))
+        val_labels.append(batch_labels.numpy())
+    ocr_report = calibrate_ocr_thresholds(np.concatenate(val_probs), np.concatenate(val_labels), class_names)
+
+    if register:
+        register_trained_model({"mode": "full", "backbone": backbone, "classes": len(class_names),
+                                "expected_ocr_rate": ocr_report["expected_ocr_rate"] if ocr_report else None})
 
     try:
         acc = history.history.get('accuracy', []) + history_fine.history.get('accuracy', [])
@@ -172,4 +735,18 @@ def train():
         print(f"⚠️ Tidak bisa membuat grafik: {e}")
 
 if __name__ == '__main__':
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Latih model klasifikasi halaman dokumen.")
+    parser.add_argument("--profile", choices=["auto", "cpu", "gpu"], default="auto", help="Profil device (default: deteksi otomatis)")
+    parser.add_argument("--backbone", choices=sorted(BACKBONES), default=DEFAULT_BACKBONE, help="Arsitektur backbone")
+    parser.add_argument("--threads", type=int, default=None, help="Jumlah thread intra-op TF (override profil)")
+    parser.add_argument("--mode", choices=["full", "head", "distill"], default="full",
+                        help="full: training + fine-tuning backbone; head: hanya kepala dense di atas cache embedding; "
+                             "distill: latih student kecil dari model yang sudah ada")
+    parser.add_argument("--register", action="store_true", help="Daftarkan hasil training ke model registry sebagai versi aktif")
+    args = parser.parse_args()
+    if args.mode == "head":
+        train_head_from_embeddings(profile=args.profile, backbone=args.backbone, threads=args.threads, register=args.register)
+    elif args.mode == "distill":
+        distill_student(profile=args.profile, threads=args.threads, register=args.register)
+    else:
+        train(profile=args.profile, backbone=args.backbone, threads=args.threads, register=args.register)
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import json
+import argparse
+import numpy as np
+import fitz  # PyMuPDF
+import joblib
+from tqdm import tqdm
+
+from app.modules.text_classifier import (
+    TEXT_MODEL_PATH, TEXT_TARGET_PRECISION, fit_text_classifier, usable_text,
+)
+
+# --- Konfigurasi Utama ---
+# Sumber data sama dengan prepare_dataset.py: pdf_sources/<kategori>/*.pdf
+PDF_SOURCE_DIR = 'pdf_sources'
+REPORT_PATH = 'text_classifier_report.json'
+VALIDATION_SPLIT = 0.2
+SEED = 123
+
+def collect_pages(source_dir=PDF_SOURCE_DIR):
+    """
+    Mengambil lapisan teks tiap halaman PDF per kategori.
+    Mengembalikan (texts, labels, groups); group = path PDF, agar halaman dari
+    dokumen yang sama tidak terpecah antara data latih dan validasi.
+    """
+    texts, labels, groups = [], [], []
+    categories = sorted(d for d in os.listdir(source_dir) if os.path.isdir(os.path.join(source_dir, d)))
+    for category in categories:
+        category_dir = os.path.join(source_dir, category)
+        pdf_files = sorted(f for f in os.listdir(category_dir) if f.lower().endswith('.pdf'))
+        for pdf_filename in tqdm(pdf_files, desc=f"  🔎 {category}", colour="blue"):
+            pdf_path = os.path.join(category_dir, pdf_filename)
+            try:
+                with fitz.open(pdf_path) as doc:
+                    for page in doc:
+                        text = page.get_text("text")
+                        if usable_text(text):
+                            texts.append(text)
+                            labels.append(category)
+                            groups.append(pdf_path)
+            except Exception as e:
+                print(f"⚠️ Gagal membaca '{pdf_filename}': {e}")
+    return texts, labels, groups
+
+def split_by_document(groups, validation_split=VALIDATION_SPLIT, seed=SEED):
+    """Index train/validasi dengan pembagian per dokumen PDF."""
+    unique_groups = sorted(set(groups))
+    order = np.random.default_rng(seed).permutation(len(unique_groups))
+    n_val = int(len(unique_groups) * validation_split)
+    val_groups = {unique_groups[i] for i in order[:n_val]}
+    train_idx = [i for i, g in enumerate(groups) if g not in val_groups]
+    val_idx = [i for i, g in enumerate(groups) if g in val_groups]
+    return train_idx, val_idx
+
+def train(output_path=TEXT_MODEL_PATH, target_precision=TEXT_TARGET_PRECISION):
+    if not os.path.exists(PDF_SOURCE_DIR):
+        print(f"❌ Folder sumber '{PDF_SOURCE_DIR}' tidak ditemukan.")
+        return
+
+    print(f"📦 Mengambil lapisan teks dari '{PDF_SOURCE_DIR}'...")
+    texts, labels, groups = collect_pages()
+    if len(set(labels)) < 2:
+        print("❌ Butuh minimal 2 kategori dengan halaman ber-teks untuk melatih classifier teks.")
+        return
+    print(f"✅ {len(texts)} halaman ber-teks dari {len(set(groups))} PDF, kategori: {sorted(set(labels))}")
+
+    train_idx, val_idx = split_by_document(groups)
+    print(f"🚀 Melatih TF-IDF char n-gram + regresi logistik ({len(train_idx)} latih / {len(val_idx)} validasi)...")
+    bundle, report = fit_text_classifier(
+        [texts[i] for i in train_idx], [labels[i] for i in train_idx],
+        [texts[i] for i in val_idx], [labels[i] for i in val_idx],
+        target_precision=target_precision,
+    )
+
+    joblib.dump(bundle, output_path)
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Model teks disimpan ke '{output_path}', laporan di '{REPORT_PATH}'")
+    if "accuracy" in report:
+        print(f"📊 Akurasi validasi {report['accuracy']:.1%} | halaman yang melewati CNN {report['bypass_rate']:.1%} "
+              f"(akurasi {report['accepted_accuracy']}) | margin minimum {report['min_margin']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latih classifier teks (TF-IDF) dari pdf_sources/.")
+    parser.add_argument("--output", default=TEXT_MODEL_PATH, help="Lokasi file model .joblib")
+    parser.add_argument("--target-precision", type=float, default=TEXT_TARGET_PRECISION,
+                        help="Presisi minimum prediksi teks yang boleh melewati CNN")
+    args = parser.parse_args()
+    train(args.output, args.target_precision)